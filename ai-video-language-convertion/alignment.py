@@ -0,0 +1,58 @@
+import functools
+
+from instrumentation import span
+
+
+@functools.lru_cache(maxsize=4)
+def load_align_model(language: str, device: str, model_name: str | None = None):
+    """Load (and keep) the WhisperX alignment model of a language, so every chunk and rerun in the process reuses it."""
+    import whisperx  # type: ignore
+    with span("align_model_load", language=language, model=model_name):
+        return whisperx.load_align_model(language_code=language, device=device, model_name=model_name)
+
+
+def align_segments(segments, audio, language: str, device: str | None = None, model_name: str | None = None):
+    """
+    Adds word timings to transcribed segments with a forced (CTC) alignment of their text to the audio.
+
+    All the segments go through one `whisperx.align` call. The aligned words are then distributed back to the original
+    segments in order, so the segments stay as they are (whisperx would re-split them into sentences); each gets a `words`
+    list of {"word", "start", "end", "score"} and its start/end tightened to its first/last timed word. Words that couldn't be
+    aligned (e.g. numbers missing from the model's alphabet) have no start/end.
+
+    Args:
+        segments (list[TranscribedSegment]): Segments with times in seconds from the start of `audio`.
+        audio (np.ndarray): 16 kHz mono float32 audio the segments were transcribed from.
+        language (str): Language code ("pl", "en", ...) selecting the alignment model.
+        device (str | None): "cuda" or "cpu", detected if None.
+        model_name (str | None): Custom wav2vec2 model instead of the default one of the language.
+
+    Returns:
+        The same list of segments, updated in place.
+    """
+    if not segments:
+        return segments
+
+    import torch
+    import whisperx  # type: ignore
+
+    device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+    model, metadata = load_align_model(language, device, model_name)
+
+    with span("alignment", language=language, segments=len(segments)):
+        transcript = [{"start": s.start, "end": s.end, "text": s.text} for s in segments]
+        result = whisperx.align(transcript, model, metadata, audio, device, return_char_alignments=False)
+
+    words = result.get("word_segments", [])
+    i = 0
+    for n, segment in enumerate(segments):
+        last = n == len(segments) - 1
+        segment.words = []
+        # words come in order: take them while they start before the end of this segment (untimed words stay with their neighbours)
+        while i < len(words) and (last or words[i].get("start", segment.start) < segment.end):
+            segment.words.append({k: words[i][k] for k in ("word", "start", "end", "score") if k in words[i]})
+            i += 1
+        timed = [w for w in segment.words if "start" in w]
+        if timed:
+            segment.start, segment.end = timed[0]["start"], timed[-1]["end"]
+    return segments
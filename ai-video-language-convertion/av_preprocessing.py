@@ -1,8 +1,19 @@
+import os
 import json
 import importlib
 import hashlib
+import subprocess
+import numpy as np
+
+from instrumentation import span, annotate, count, audio_seconds
+
+SAMPLE_RATE = 16000
 
 def preprocess_w_pipeline(input_path, pipeline, skip_if_exists=None, kwargs=None):
+    with span("preprocess_pipeline", input=input_path, stages=len(pipeline)):
+        return _run_pipeline(input_path, pipeline, skip_if_exists)
+
+def _run_pipeline(input_path, pipeline, skip_if_exists):
 
     stage_result_path = input_path
     prev_cksum = ""
@@ -27,7 +38,79 @@ def preprocess_w_pipeline(input_path, pipeline, skip_if_exists=None, kwargs=None
             module_name, func_name = processor_name, processor_name
         module = importlib.import_module(f"preprocessors.{module_name}")
         func = getattr(module, func_name)
-        stage_result_path = func(stage_result_path, skip_if_exists, cksum, **params)
+        with span(f"preprocess.{processor_name}", checksum=cksum, input_bytes=_file_size(stage_result_path)):
+            stage_result_path = func(stage_result_path, skip_if_exists, cksum, **params)
+            annotate(output_bytes=_file_size(stage_result_path), audio_seconds=audio_seconds(stage_result_path))
 
         prev_cksum = cksum
-    return stage_result_path
\ No newline at end of file
+    return stage_result_path
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+def get_media_duration(path):
+    """ Duration of an audio/video file in seconds (ffprobe), 0.0 if it can't be read."""
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT
+        )
+        return float(result.stdout)
+    except Exception:
+        return 0.0
+
+def file_hash(path, block_size=1 << 20):
+    """ blake2b hash of the file content (hex), used as the key of the decoded audio cache."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while block := f.read(block_size):
+            h.update(block)
+    return h.hexdigest()
+
+def decode_audio(path, sample_rate=SAMPLE_RATE):
+    """ Decodes any audio/video file to a mono float32 array at `sample_rate` with ffmpeg (same as whisper/whisperx load_audio)."""
+    cmd = ["ffmpeg", "-nostdin", "-threads", "0", "-i", path, "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-"]
+    result = subprocess.run(cmd, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Failed to decode audio {path}: {result.stderr.decode(errors='replace')}")
+    return np.frombuffer(result.stdout, np.int16).astype(np.float32) / 32768.0
+
+def load_audio(path, cache_dir=None, sample_rate=SAMPLE_RATE):
+    """
+    Returns the audio of `path` as a mono float32 array at `sample_rate` (16 kHz, what Whisper and WhisperX expect).
+
+    Args:
+        path (str): Audio or video file.
+        cache_dir (str | None): If set, the decoded audio is stored there as `<content hash>_<sample_rate>.npy` and later
+            opened as a read-only memmap instead of running ffmpeg again, also by other processes (batch workers) and runs.
+
+    Example:
+        audio = load_audio("movie_normalize_0123456789abcdef.wav", cache_dir=".audio_cache")
+        segment = audio[int(12.5 * SAMPLE_RATE):int(17.0 * SAMPLE_RATE)]
+    """
+    with span("decode_audio", input=path):
+        if not cache_dir:
+            audio = decode_audio(path, sample_rate)
+            annotate(audio_seconds=round(len(audio) / sample_rate, 3))
+            return audio
+
+        cache_path = os.path.join(cache_dir, f"{file_hash(path)}_{sample_rate}.npy")
+        if os.path.exists(cache_path):
+            annotate(cache="hit")
+            count("decode_audio.cache_hit")
+            return np.load(cache_path, mmap_mode="r")
+
+        annotate(cache="miss")
+        count("decode_audio.cache_miss")
+        audio = decode_audio(path, sample_rate)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, audio)
+        os.replace(tmp_path, cache_path)
+        annotate(audio_seconds=round(len(audio) / sample_rate, 3))
+        return np.load(cache_path, mmap_mode="r")
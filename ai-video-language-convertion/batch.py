@@ -0,0 +1,293 @@
+import os
+import re
+import json
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from pathlib import Path
+
+from av_preprocessing import preprocess_w_pipeline
+from transcribe import Transcription, ExecutorPool
+from srt_processing import extend_w_llm
+from translate import translate_srt
+from instrumentation import span
+from cpu_profile import resolve_cpu_profile, worker_core_sets, init_worker_process
+
+MEDIA_EXTENSIONS = ['.mp4', '.mkv', '.mov', '.avi', '.webm', '.m4v', '.wav', '.mp3', '.m4a', '.flac']
+PREPROCESSED_FILE = re.compile(r'_[0-9a-f]{16}$')
+STAGES = ["preprocess", "transcribe", "correct", "translate"]
+
+_worker_executor_pool = None  # warm model of a CPU worker process
+
+
+def scan_inputs(source: str, extensions: list[str] | None = None) -> list[str]:
+    """
+    Returns the list of media files to process.
+
+    Args:
+        source (str): A directory (scanned recursively for `extensions`) or a manifest file: either a JSON list of paths
+            or a text file with one path per line (empty lines and lines starting with '#' are ignored).
+            Relative paths in a manifest are resolved against the manifest location.
+        extensions (list[str] | None): Media extensions to look for in a directory.
+    """
+    extensions = [e.lower() for e in (extensions or MEDIA_EXTENSIONS)]
+    source_path = Path(source)
+
+    if source_path.is_dir():
+        return sorted(
+            str(p.resolve()) for p in source_path.rglob("*")
+            # skip the intermediate files the preprocessors write next to their inputs (<name>_<stage>_<checksum>.wav)
+            if p.is_file() and p.suffix.lower() in extensions and not PREPROCESSED_FILE.search(p.stem)
+        )
+
+    content = source_path.read_text(encoding="utf-8")
+    if source_path.suffix == ".json":
+        entries = json.loads(content)
+    else:
+        entries = [line.strip() for line in content.splitlines() if line.strip() and not line.strip().startswith("#")]
+    return [str((source_path.parent / entry).resolve()) for entry in entries]
+
+
+class JobStore:
+    """
+    Persistent state of the batch jobs, stored as JSON.
+
+    Every input file has an entry with its size/mtime fingerprint and the output of each finished stage. A stage is
+    considered finished only if its output still exists and the input file didn't change since, so reruns skip finished work
+    and redo only what's missing or failed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.jobs: dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.jobs = json.load(f)
+
+    @staticmethod
+    def fingerprint(input_file: str) -> dict:
+        st = os.stat(input_file)
+        return {"size": st.st_size, "mtime": st.st_mtime}
+
+    def _job(self, input_file: str) -> dict:
+        fingerprint = self.fingerprint(input_file)
+        job = self.jobs.get(input_file)
+        if job is None or job.get("fingerprint") != fingerprint:
+            job = self.jobs[input_file] = {"fingerprint": fingerprint, "stages": {}}
+        return job
+
+    def output(self, input_file: str, stage: str) -> str | None:
+        """ Returns the output of a finished stage or None if it has to be (re)done."""
+        with self._lock:
+            entry = self._job(input_file)["stages"].get(stage)
+        if entry and entry.get("status") == "done" and os.path.exists(entry["output"]):
+            return entry["output"]
+        return None
+
+    def mark(self, input_file: str, stage: str, status: str, output: str | None = None, error: str | None = None):
+        with self._lock:
+            entry = {"status": status, "output": output}
+            if error:
+                entry["error"] = error
+            self._job(input_file)["stages"][stage] = entry
+            self._save()
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.jobs, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class BatchRunner:
+    """
+    Runs preprocessing, transcription, LLM correction and translation for many files.
+
+    Files go through the stages independently, while every stage is limited by the resource it uses:
+        - cpu_workers: ffmpeg/denoise preprocessing,
+        - gpu_workers: Whisper transcription (warm models are shared through an `ExecutorPool` of the same size) and MarianMT translation,
+        - llm_workers: requests to the Ollama endpoint (correction and LLM translation).
+    So preprocessing of file N+1 runs while file N is being transcribed, and its correction waits only for the LLM.
+    Job state is kept in a `JobStore`, so an interrupted or repeated run continues where it stopped.
+
+    Without a GPU the files are transcribed in worker processes instead (one per `cpu_threads` cores, placed within NUMA nodes),
+    each with its own warm model and pinned cores, as torch and CTranslate2 scale better over several processes than over many threads.
+
+    Args:
+        inputs (list[str]): Media files to process (see `scan_inputs`).
+        state_file (str): Path of the persistent job state (JSON).
+        output_dir (str | None): Where to put SRT files. If None, they are saved next to the input files.
+        cpu_workers (int), gpu_workers (int), llm_workers (int): Concurrency limits per resource.
+        max_in_flight (int | None): Number of files processed at once. Defaults to the sum of all the limits.
+        transcription_params (dict | None): Keyword arguments for `Transcription` (preprocess_pipeline, whisper_params, ...).
+        correction_params (dict | None): Keyword arguments for `extend_w_llm`, or None to skip the correction.
+        translation_params (dict | None): Keyword arguments for `translate_srt`, or None to skip the translation.
+        cpu_processes (bool | None): Transcribe in worker processes. None (default) = only when no GPU is available.
+        cpu_threads (int): Cores (torch threads) per transcription worker process.
+
+    Example:
+        runner = BatchRunner(scan_inputs("recordings/"), "recordings/batch_state.json",
+                             transcription_params={"preprocess_pipeline": PREPROCESSING_PIPELINE, "whisper_implementation": "whisperx"},
+                             correction_params={"window": 7.0, "language": "polish"},
+                             translation_params={"method": "marian"})
+        failed = runner.run()
+    """
+
+    def __init__(self,
+        inputs: list[str],
+        state_file: str,
+        output_dir: str | None = None,
+        cpu_workers: int = 2,
+        gpu_workers: int = 1,
+        llm_workers: int = 1,
+        max_in_flight: int | None = None,
+        transcription_params: dict | None = None,
+        correction_params: dict | None = None,
+        translation_params: dict | None = None,
+        cpu_processes: bool | None = None,
+        cpu_threads: int = 4,
+        ):
+
+        self.inputs = inputs
+        self.store = JobStore(state_file)
+        self.output_dir = output_dir
+        self.max_in_flight = max_in_flight or (cpu_workers + gpu_workers + llm_workers)
+        self.transcription_params = dict(transcription_params or {})
+        self.correction_params = correction_params
+        self.translation_params = translation_params
+
+        self.process_pool = None
+        if cpu_processes or (cpu_processes is None and resolve_cpu_profile() is not None):
+            core_sets = worker_core_sets(cpu_threads)
+            gpu_workers = len(core_sets)  # the transcription slots are the worker processes
+            self.max_in_flight = max_in_flight or (cpu_workers + gpu_workers + llm_workers)
+            self.process_pool = _start_worker_processes(core_sets, cpu_threads)
+            # each worker uses its own cores only
+            if self.transcription_params.get("cpu_profile") is not False:
+                self.transcription_params["cpu_profile"] = {**(self.transcription_params.get("cpu_profile") or {}), "threads": cpu_threads}
+            print(f"[Batch] Transcribing on CPU in {gpu_workers} processes with {cpu_threads} threads each")
+
+        self.cpu_slots = threading.BoundedSemaphore(cpu_workers)
+        self.gpu_slots = threading.BoundedSemaphore(gpu_workers)
+        self.llm_slots = threading.BoundedSemaphore(llm_workers)
+        # an adaptive transcription checks its probe model out of the pool next to the main one
+        adaptive = self.transcription_params.get("adaptive", False) is not False
+        self.executor_pool = ExecutorPool(size=gpu_workers * (2 if adaptive else 1))
+
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+    def run(self) -> dict[str, str]:
+        """ Processes all the inputs. Returns {input_file: error} for the files that failed."""
+        failed = {}
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            futures = {pool.submit(self.process, input_file): input_file for input_file in self.inputs}
+            for future, input_file in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    failed[input_file] = str(e)
+        if self.process_pool:
+            self.process_pool.shutdown()
+
+        print(f"[Batch] Finished {len(self.inputs) - len(failed)}/{len(self.inputs)} files.")
+        for input_file, error in failed.items():
+            print(f"[Batch] FAILED {input_file}: {error}")
+        return failed
+
+    def process(self, input_file: str):
+        """ Runs all the stages for one file, skipping the ones already finished in previous runs."""
+        output = input_file
+        for stage in STAGES:
+            if (done := self.store.output(input_file, stage)) is not None:
+                print(f"[Batch] {stage} already done for {input_file}, skipping.")
+                output = done
+                continue
+
+            try:
+                with span(f"batch.{stage}", input=input_file):
+                    stage_output = getattr(self, f"_{stage}")(input_file, output)
+            except Exception as e:
+                self.store.mark(input_file, stage, "failed", error=str(e))
+                raise
+            if stage_output is None:
+                continue  # stage disabled, not recorded so it runs once enabled
+            output = stage_output
+            self.store.mark(input_file, stage, "done", output)
+        return output
+
+    def _preprocess(self, input_file: str, _):
+        pipeline = self.transcription_params.get("preprocess_pipeline")
+        if not pipeline:
+            return None
+        with self.cpu_slots:
+            return preprocess_w_pipeline(input_file, pipeline, True, {})
+
+    def _transcribe(self, input_file: str, _):
+        params = dict(self.transcription_params)
+        # preprocessing was done in the previous stage, its outputs are reused
+        params["skip_preprocessing_if_file_exists"] = True
+
+        output_srt = params.pop("output_srt", None)
+        if self.output_dir:
+            output_srt = os.path.join(self.output_dir, Path(input_file).stem + ".srt")
+
+        if self.process_pool:
+            with self.gpu_slots:
+                return self.process_pool.submit(_transcribe_in_worker, input_file, output_srt, params).result()
+
+        with self.gpu_slots, self.executor_pool.executor(
+            params.get("whisper_implementation"), params.get("model_name", "large-v2"), params.get("whisper_params"), params.get("cpu_profile")
+        ) as executor:
+            transcription = Transcription(input_file, output_srt=output_srt, whisper_executor=executor, executor_pool=self.executor_pool, **params)
+        return transcription.write_srt()
+
+    def _correct(self, _, srt_path: str):
+        if self.correction_params is None:
+            return None
+        with self.llm_slots:
+            return extend_w_llm(srt_path, **self.correction_params)
+
+    def _translate(self, _, srt_path: str):
+        if self.translation_params is None:
+            return None
+        slots = self.gpu_slots if self.translation_params.get("method") == "marian" else self.llm_slots
+        with slots:
+            return translate_srt(srt_path, **self.translation_params)
+
+
+def _start_worker_processes(core_sets: list[list[int]], threads: int) -> ProcessPoolExecutor:
+    ctx = multiprocessing.get_context("spawn")
+    core_sets_queue = ctx.Queue()
+    for cores in core_sets:
+        core_sets_queue.put(cores)
+    return ProcessPoolExecutor(len(core_sets), mp_context=ctx, initializer=_init_transcription_worker, initargs=(core_sets_queue, threads))
+
+
+def _init_transcription_worker(core_sets_queue, threads: int):
+    global _worker_executor_pool
+    init_worker_process(core_sets_queue, threads)
+    _worker_executor_pool = ExecutorPool(size=2)  # the model, and the probe of an adaptive transcription
+
+
+def _transcribe_in_worker(input_file: str, output_srt: str | None, params: dict) -> str:
+    """ Transcription stage run inside a CPU worker process, the model stays loaded for the next file."""
+    with _worker_executor_pool.executor(
+        params.get("whisper_implementation"), params.get("model_name", "large-v2"), params.get("whisper_params"), params.get("cpu_profile")
+    ) as executor:
+        transcription = Transcription(input_file, output_srt=output_srt, whisper_executor=executor, executor_pool=_worker_executor_pool, **params)
+    return transcription.write_srt()
+
+
+def run_batch(source: str, state_file: str | None = None, extensions: list[str] | None = None, **kwargs) -> dict[str, str]:
+    """
+    Scans `source` (directory or manifest) and runs a `BatchRunner` over the found files.
+    The job state is kept in `batch_state.json` in the output directory (or next to the source) unless `state_file` is given.
+    """
+    inputs = scan_inputs(source, extensions)
+    if state_file is None:
+        state_dir = kwargs.get("output_dir") or (source if os.path.isdir(source) else os.path.dirname(os.path.abspath(source)))
+        state_file = os.path.join(state_dir, "batch_state.json")
+    print(f"[Batch] {len(inputs)} files to process, job state: {state_file}")
+    return BatchRunner(inputs, state_file, **kwargs).run()
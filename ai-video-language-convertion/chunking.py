@@ -0,0 +1,85 @@
+import numpy as np
+
+from av_preprocessing import SAMPLE_RATE
+
+
+def plan_chunks(
+    audio: np.ndarray,
+    chunk_seconds: float = 30.0,
+    overlap_seconds: float = 2.0,
+    search_seconds: float = 5.0,
+    silence_db: float = -40.0,
+    frame_seconds: float = 0.02,
+    sample_rate: int = SAMPLE_RATE,
+) -> list[tuple[int, int]]:
+    """
+    Splits long audio into chunks of at most `chunk_seconds` that can be decoded independently.
+
+    Each cut is placed at the quietest frame of the last `search_seconds` before the chunk limit. If that frame is
+    silence (RMS below `silence_db`), the chunks just meet there. Otherwise (continuous speech or music) the cut falls at the
+    limit and the next chunk starts `overlap_seconds` earlier, so a word on the boundary is complete in at least one of them;
+    `stitch_chunks` removes the duplicates.
+
+    Returns:
+        list[tuple[int, int]]: (start_sample, end_sample) of each chunk.
+
+    Example:
+        audio = whisper.load_audio("movie.wav")
+        chunks = plan_chunks(audio, chunk_seconds=30.0)  # e.g. [(0, 451200), (451200, 929600), ...]
+    """
+    chunk = int(chunk_seconds * sample_rate)
+    overlap = min(int(overlap_seconds * sample_rate), chunk // 2)
+    search = min(int(search_seconds * sample_rate), chunk // 2)
+    frame = max(1, int(frame_seconds * sample_rate))
+
+    n_frames = len(audio) // frame
+    power = np.square(audio[:n_frames * frame].astype(np.float32, copy=False)).reshape(n_frames, frame).mean(axis=1)
+    energy_db = 10 * np.log10(power + 1e-10)
+
+    chunks = []
+    start = 0
+    while start + chunk < len(audio):
+        limit = start + chunk
+        f_lo, f_hi = (limit - search) // frame, limit // frame
+        quietest = f_lo + int(np.argmin(energy_db[f_lo:f_hi])) if f_hi > f_lo else None
+
+        if quietest is not None and energy_db[quietest] <= silence_db:
+            cut = quietest * frame + frame // 2
+            chunks.append((start, cut))
+            start = cut
+        else:
+            chunks.append((start, limit))
+            start = limit - overlap
+    chunks.append((start, len(audio)))
+    return chunks
+
+
+def stitch_chunks(chunk_results: list[tuple[float, float, list[dict]]]) -> list[dict]:
+    """
+    Joins the segments of consecutive chunks into one continuous list.
+
+    Where two chunks overlap, the overlap is split in the middle: a segment is kept by the chunk its midpoint falls into, so
+    the words decoded twice are kept once. A segment repeating the text of the previous one across the boundary is dropped,
+    and starts are clamped to the previous end, so timestamps never go back.
+
+    Args:
+        chunk_results: (chunk_start, chunk_end, segments) per chunk in order, segment times already in seconds from the start of the file.
+    """
+    stitched = []
+    for i, (chunk_start, chunk_end, segments) in enumerate(chunk_results):
+        # only overlapping boundaries limit the segments, after a silence cut everything the chunk decoded is kept
+        lower, upper = float("-inf"), float("inf")
+        if i > 0 and chunk_results[i - 1][1] > chunk_start:
+            lower = (chunk_start + chunk_results[i - 1][1]) / 2
+        if i + 1 < len(chunk_results) and chunk_results[i + 1][0] < chunk_end:
+            upper = (chunk_results[i + 1][0] + chunk_end) / 2
+
+        for segment in segments:
+            if not lower <= (segment["start"] + segment["end"]) / 2 < upper:
+                continue
+            if stitched and segment["start"] < stitched[-1]["end"]:
+                if segment["text"].strip() == stitched[-1]["text"].strip():
+                    continue
+                segment = dict(segment, start=min(stitched[-1]["end"], segment["end"]))
+            stitched.append(segment)
+    return stitched
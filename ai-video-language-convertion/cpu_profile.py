@@ -0,0 +1,146 @@
+import os
+import glob
+from dataclasses import dataclass, field, asdict
+
+# faster-whisper (WhisperX) and OpenAI Whisper names of the large models tuned for speed,
+# distil-large-v3 is English only, turbo is multilingual
+DISTIL_MODEL = "distil-large-v3"
+TURBO_MODELS = {"whisperx": "large-v3-turbo", "whisper": "turbo", "whisper_chunked": "turbo"}
+
+
+@dataclass
+class CpuProfile:
+    """
+    Inference settings for machines without a GPU, applied automatically when CUDA isn't available.
+
+        - compute_type: "int8" for CTranslate2 (WhisperX) instead of float16, which CPUs can't run efficiently,
+        - threads / interop_threads: torch intra-op and inter-op threads (and CTranslate2 threads for WhisperX),
+        - swap_model: large models are replaced with their CPU-friendly versions (distil-large-v3 for English, large-v3-turbo otherwise),
+        - numa_nodes: NUMA layout used to place the worker processes of batch runs (see `worker_core_sets`).
+
+    All fields can be overridden, e.g. `Transcription(..., cpu_profile={"threads": 8, "swap_model": False})`.
+    """
+    compute_type: str = "int8"
+    threads: int = 0  # 0 = all the cores available to the process
+    interop_threads: int = 1
+    swap_model: bool = True
+    numa_nodes: int = field(default=1, init=False)
+
+    def __post_init__(self):
+        self.numa_nodes = len(numa_nodes())
+        if not self.threads:
+            self.threads = len(available_cores())
+
+    def model_for(self, model_name: str, whisper_implementation: str | None, language: str | None = None) -> str:
+        if not self.swap_model or not model_name.startswith("large"):
+            return model_name
+        if language == "en" and whisper_implementation == "whisperx":
+            return DISTIL_MODEL
+        return TURBO_MODELS.get(whisper_implementation or "whisper", model_name)
+
+    def apply(self, whisper_implementation: str | None, model_name: str, whisper_params: dict | None) -> tuple[str, dict]:
+        """ Returns (model_name, whisper_params) adjusted for the CPU. Values set explicitly in whisper_params are kept."""
+        whisper_params = dict(whisper_params or {})
+        whisper_params.setdefault("threads", self.threads)
+        whisper_params.setdefault("interop_threads", self.interop_threads)
+        if whisper_implementation == "whisperx":
+            whisper_params.setdefault("compute_type", self.compute_type)
+        else:
+            whisper_params.setdefault("fp16", False)  # whisper would warn and fall back to fp32 anyway
+        return self.model_for(model_name, whisper_implementation, whisper_params.get("language")), whisper_params
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def resolve_cpu_profile(cpu_profile=None) -> CpuProfile | None:
+    """
+    Turns the `cpu_profile` argument into a profile: None (auto) gives the default profile on CPU-only machines,
+    a dict overrides its fields, False disables it. Always None when a GPU is available.
+    """
+    if cpu_profile is False or _cuda_available():
+        return None
+    if isinstance(cpu_profile, CpuProfile):
+        return cpu_profile
+    return CpuProfile(**(cpu_profile or {}))
+
+
+def apply_cpu_profile(whisper_implementation: str | None, model_name: str, whisper_params: dict | None, cpu_profile=None):
+    """ Returns (model_name, whisper_params, profile), unchanged (and profile None) when running on a GPU."""
+    profile = resolve_cpu_profile(cpu_profile)
+    if profile is None:
+        return model_name, whisper_params, None
+    model_name, whisper_params = profile.apply(whisper_implementation, model_name, whisper_params)
+    return model_name, whisper_params, profile
+
+
+def _cuda_available() -> bool:
+    try:
+        import torch
+        return torch.cuda.is_available()
+    except ImportError:
+        return False
+
+
+def available_cores() -> list[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _parse_cpulist(cpulist: str) -> list[int]:
+    cores = []
+    for part in cpulist.strip().split(","):
+        if "-" in part:
+            lo, hi = part.split("-")
+            cores.extend(range(int(lo), int(hi) + 1))
+        elif part:
+            cores.append(int(part))
+    return cores
+
+
+def numa_nodes() -> list[list[int]]:
+    """ Cores of each NUMA node (limited to the cores this process may use), a single node where sysfs isn't available."""
+    allowed = set(available_cores())
+    nodes = []
+    for path in sorted(glob.glob("/sys/devices/system/node/node[0-9]*/cpulist")):
+        with open(path) as f:
+            cores = [c for c in _parse_cpulist(f.read()) if c in allowed]
+        if cores:
+            nodes.append(cores)
+    return nodes or [sorted(allowed)]
+
+
+def worker_core_sets(threads: int, workers: int | None = None) -> list[list[int]]:
+    """
+    Splits the cores into groups of `threads` for worker processes, never spreading a group over two NUMA nodes, so each
+    worker's model stays in the memory local to its cores.
+
+    Example:
+        worker_core_sets(4)  # 2 nodes x 8 cores -> [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9, 10, 11], [12, 13, 14, 15]]
+    """
+    core_sets = []
+    for cores in numa_nodes():
+        for i in range(0, len(cores) - threads + 1, threads):
+            core_sets.append(cores[i:i + threads])
+    core_sets = core_sets or [available_cores()[:threads]]
+    return core_sets[:workers] if workers else core_sets
+
+
+def set_torch_threads(threads: int | None, interop_threads: int | None = None):
+    import torch
+    if threads:
+        torch.set_num_threads(threads)
+    if interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            pass  # can be set only once, before any parallel work started
+
+
+def init_worker_process(core_sets, threads: int, interop_threads: int = 1):
+    """ Process pool initializer: takes a core set from the `core_sets` queue, pins the process to it and sets torch threads."""
+    cores = core_sets.get()
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    set_torch_threads(threads, interop_threads)
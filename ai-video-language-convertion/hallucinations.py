@@ -0,0 +1,156 @@
+import re
+import zlib
+import numpy as np
+
+WORD = re.compile(r"\w+(?:['’]\w+)*")
+
+DEFAULT_POSTFILTER = {
+    "action": "drop",           # "drop" removes the suspicious segments, "flag" keeps them with the reasons in `flags`
+    "max_repeats": 2,           # identical segments allowed in a row, the following ones are repeated lines
+    "loop_ngram": 3,            # longest n-gram checked for loops within a segment
+    "loop_repeats": 4,          # copies of an n-gram in a row that make a loop ("dziękuję dziękuję dziękuję dziękuję")
+    "compression_ratio": 2.4,   # segments compressing better than this are repetitive
+    "silence_share": 0.8,       # segments with this share of their time in silence are phantom text
+    "silence_db": -45.0,        # without VAD timestamps, frames quieter than this are silence
+    "min_silence": 1.0,         # shortest silence (s) taken into account
+}
+
+
+def compression_ratio(text: str) -> float:
+    """ Same measure as Whisper's: length of the UTF-8 text divided by its zlib-compressed length. Repetitive text scores high."""
+    text_bytes = text.encode("utf-8")
+    if not text_bytes:
+        return 0.0
+    return len(text_bytes) / len(zlib.compress(text_bytes))
+
+
+def overlap_seconds(intervals: np.ndarray, regions: np.ndarray) -> np.ndarray:
+    """
+    Seconds of each (start, end) interval covered by the sorted, non-overlapping `regions`.
+
+    The regions are indexed by their starts and cumulative lengths, so each interval costs two binary searches
+    instead of a comparison with every region.
+    """
+    if len(intervals) == 0 or len(regions) == 0:
+        return np.zeros(len(intervals))
+    starts, ends = regions[:, 0], regions[:, 1]
+    cumulative = np.concatenate([[0.0], np.cumsum(ends - starts)])
+
+    def covered_until(t):
+        # total region length before time t: the regions starting before it, the last one cut at t
+        i = np.searchsorted(starts, t, side="right") - 1
+        j = np.maximum(i, 0)
+        return np.where(i >= 0, cumulative[j] + np.minimum(t, ends[j]) - starts[j], 0.0)
+
+    return covered_until(intervals[:, 1]) - covered_until(intervals[:, 0])
+
+
+def silence_from_speech(speech: list[dict], duration: float, min_silence: float = 0.0) -> np.ndarray:
+    """ Sorted (start, end) gaps between speech timestamps ([{"start", "end"}] in seconds, e.g. from a VAD) up to `duration`."""
+    bounds = np.array(sorted((s["start"], s["end"]) for s in speech), dtype=float).reshape(-1, 2)
+    if len(bounds) == 0:
+        return np.array([[0.0, duration]])
+    ends = np.maximum.accumulate(bounds[:, 1])
+    regions = np.stack([np.concatenate([[0.0], ends]), np.concatenate([bounds[:, 0], [max(duration, ends[-1])]])], axis=1)
+    return regions[regions[:, 1] - regions[:, 0] >= max(min_silence, 1e-9)]
+
+
+def silence_from_audio(audio: np.ndarray, sample_rate: int, silence_db: float = -45.0, min_silence: float = 1.0, frame_seconds: float = 0.02) -> np.ndarray:
+    """ Sorted (start, end) runs of frames with RMS below `silence_db` lasting at least `min_silence` seconds."""
+    frame = max(1, int(frame_seconds * sample_rate))
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return np.zeros((0, 2))
+    power = np.square(audio[:n_frames * frame].astype(np.float32, copy=False)).reshape(n_frames, frame).mean(axis=1)
+    silent = np.concatenate([[False], 10 * np.log10(power + 1e-10) <= silence_db, [False]])
+    edges = np.flatnonzero(np.diff(silent.astype(np.int8)))
+    regions = edges.reshape(-1, 2) * (frame / sample_rate)
+    return regions[regions[:, 1] - regions[:, 0] >= min_silence]
+
+
+def _has_loop(tokens: list[int], max_ngram: int, repeats: int) -> bool:
+    """ True if some n-gram (n <= max_ngram) occurs `repeats` times in a row, found in one pass per n over the token hashes."""
+    for n in range(1, max_ngram + 1):
+        run = 0
+        for i in range(len(tokens) - n):
+            run = run + 1 if tokens[i] == tokens[i + n] else 0
+            if run >= n * (repeats - 1):
+                return True
+    return False
+
+
+def filter_hallucinations(segments, speech: list[dict] | None = None, audio: np.ndarray | None = None, sample_rate: int = 16000,
+                          options: dict | None = None) -> tuple[list, dict]:
+    """
+    Drops (or flags) the typical Whisper hallucinations from a list of segments, cheaply enough to decode with fast settings
+    (no beam search, no temperature fallback) and clean up afterwards.
+
+    A segment is suspicious when it is:
+        - "repeat": the same text (ignoring case and punctuation) as the `max_repeats` segments before it,
+        - "loop": a word n-gram repeated `loop_repeats` times in a row within it,
+        - "compression": its compression ratio is above `compression_ratio`,
+        - "silence": more than `silence_share` of its time falls into silence, taken from the VAD `speech` timestamps or,
+          without them, from the energy of `audio`; with neither this check is skipped.
+
+    Every segment's words are hashed once and the silences are an interval index queried for all the segments at once
+    (`overlap_seconds`), so the whole filter is linear in the length of the transcript.
+
+    Args:
+        segments (list[TranscribedSegment]): Segments in time order (anything with start, end and text).
+        speech (list[dict] | None): Speech timestamps [{"start", "end"}] in seconds, e.g. the external VAD output.
+        audio (np.ndarray | None): Mono audio the segments come from, used for silence when `speech` is None.
+        options (dict | None): Overrides of `DEFAULT_POSTFILTER`.
+
+    Returns:
+        (segments, summary): the kept segments (all of them with "flag", suspicious ones with a `flags` list of reasons)
+        and {"action", "dropped", "flagged", "reasons": {reason: count}}.
+    """
+    options = {**DEFAULT_POSTFILTER, **(options or {})}
+    if not segments:
+        return segments, {"action": options["action"], "dropped": 0, "flagged": 0, "reasons": {}}
+
+    silence = None
+    if speech is not None:
+        silence = silence_from_speech(speech, segments[-1].end, options["min_silence"])
+    elif audio is not None:
+        silence = silence_from_audio(audio, sample_rate, options["silence_db"], options["min_silence"])
+    silent_share = np.zeros(len(segments))
+    if silence is not None:
+        intervals = np.array([(s.start, s.end) for s in segments], dtype=float)
+        silent_share = overlap_seconds(intervals, silence) / np.maximum(intervals[:, 1] - intervals[:, 0], 1e-3)
+
+    kept, reasons = [], {}
+    previous_hash, run = None, 0
+    for segment, share in zip(segments, silent_share):
+        tokens = [hash(w) for w in WORD.findall(segment.text.lower())]
+        text_hash = hash(tuple(tokens))
+        run = run + 1 if text_hash == previous_hash else 0
+        previous_hash = text_hash
+
+        ratio = segment.compression_ratio if getattr(segment, "compression_ratio", None) is not None else compression_ratio(segment.text)
+        flags = []
+        if tokens and run >= options["max_repeats"]:
+            flags.append("repeat")
+        if _has_loop(tokens, options["loop_ngram"], options["loop_repeats"]):
+            flags.append("loop")
+        if ratio > options["compression_ratio"]:
+            flags.append("compression")
+        if share > options["silence_share"]:
+            flags.append("silence")
+
+        for reason in flags:
+            reasons[reason] = reasons.get(reason, 0) + 1
+        if flags and options["action"] == "flag":
+            segment.flags = flags
+        if not flags or options["action"] == "flag":
+            kept.append(segment)
+
+    suspicious = len(segments) - len(kept) if options["action"] == "drop" else sum(1 for s in kept if getattr(s, "flags", None))
+    summary = {
+        "action": options["action"],
+        "dropped": suspicious if options["action"] == "drop" else 0,
+        "flagged": suspicious if options["action"] == "flag" else 0,
+        "reasons": reasons,
+    }
+    print(f"[Postfilter] {suspicious} of {len(segments)} segments {'dropped' if options['action'] == 'drop' else 'flagged'}: {reasons}")
+    return kept, summary
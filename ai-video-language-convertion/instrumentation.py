@@ -0,0 +1,173 @@
+import os
+import sys
+import json
+import time
+import wave
+import resource
+import threading
+from contextlib import contextmanager
+
+import metrics
+
+_tracer = None
+_local = threading.local()
+
+
+class Tracer:
+    """
+    Collects finished spans as Chrome trace events ("X" complete events, "i" instant events).
+
+    The saved file can be opened in chrome://tracing or https://ui.perfetto.dev; every thread (pipeline stage,
+    batch/MCP worker) gets its own row.
+    """
+
+    def __init__(self):
+        self.events: list[dict] = []
+        self.pid = os.getpid()
+        self.t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self._threads: set[int] = set()
+
+    def _ts(self, t: float) -> float:
+        return round((t - self.t0) * 1e6, 1)
+
+    def add(self, event: dict):
+        tid = threading.get_ident()
+        with self._lock:
+            if tid not in self._threads:
+                self._threads.add(tid)
+                self.events.append({"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid,
+                                    "args": {"name": threading.current_thread().name}})
+            self.events.append(dict(event, pid=self.pid, tid=tid))
+
+    def complete(self, name: str, start: float, end: float, args: dict):
+        self.add({"name": name, "cat": name.split(".")[0], "ph": "X", "ts": self._ts(start), "dur": round((end - start) * 1e6, 1), "args": args})
+
+    def instant(self, name: str, args: dict):
+        self.add({"name": name, "cat": name.split(".")[0], "ph": "i", "s": "t", "ts": self._ts(time.perf_counter()), "args": args})
+
+    def save(self, path: str):
+        with self._lock:
+            trace = {"traceEvents": list(self.events), "displayTimeUnit": "ms"}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(trace, f, default=str)
+        print(f"[Trace] {len(trace['traceEvents'])} events saved to: {path}")
+
+
+def start_trace() -> Tracer:
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def stop_trace(path: str | None = None) -> Tracer | None:
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer and path:
+        tracer.save(path)
+    return tracer
+
+
+@contextmanager
+def tracing(path: str | None):
+    """ Records all the spans of the block into a Chrome trace saved at `path` (no-op if path is None)."""
+    if path is None:
+        yield None
+        return
+    tracer = start_trace()
+    try:
+        yield tracer
+    finally:
+        stop_trace(path)
+
+
+def _io_counters() -> tuple[int, int]:
+    """ (read_bytes, write_bytes) of this process from /proc/self/io, (0, 0) where not available."""
+    try:
+        counters = {}
+        with open("/proc/self/io") as f:
+            for line in f:
+                key, value = line.split(":")
+                counters[key] = int(value)
+        return counters.get("read_bytes", 0), counters.get("write_bytes", 0)
+    except (OSError, ValueError):
+        return 0, 0
+
+
+def _gpu_memory() -> tuple[float, float] | None:
+    """ (allocated, peak allocated) CUDA memory in MB, None without a GPU (or without torch loaded)."""
+    torch = sys.modules.get("torch")  # don't import torch just for tracing
+    if torch is None or not torch.cuda.is_available():
+        return None
+    return torch.cuda.memory_allocated() / 1024**2, torch.cuda.max_memory_allocated() / 1024**2
+
+
+@contextmanager
+def span(name: str, **args):
+    """
+    Measures a block of work.
+
+    The wall time is always added to the metrics of the current request (see `metrics.collect`) under `name`.
+    While a trace is recording (see `tracing`), the span is also stored as a trace event with:
+        - cpu_s: CPU time of this thread (subprocesses like ffmpeg aren't included),
+        - read_bytes / write_bytes: storage I/O of the process during the span,
+        - rss_mb / peak_rss_mb: current and peak resident memory of the process,
+        - gpu_mb / gpu_peak_mb: allocated and peak allocated CUDA memory,
+        - any `args` given here or added later with `annotate()` (e.g. audio_seconds, cache hit/miss).
+
+    Yields the args dict, so the block can add its own values.
+    """
+    tracer = _tracer
+    stack = _local.__dict__.setdefault("stack", [])
+    span_args = dict(args)
+    stack.append(span_args)
+
+    start = time.perf_counter()
+    if tracer:
+        cpu_start = time.thread_time()
+        io_start = _io_counters()
+    try:
+        yield span_args
+    finally:
+        end = time.perf_counter()
+        stack.pop()
+
+        if (request_metrics := metrics.current()) is not None:
+            request_metrics.add_time(name, end - start)
+
+        if tracer:
+            io_end = _io_counters()
+            span_args.update(
+                cpu_s=round(time.thread_time() - cpu_start, 4),
+                read_bytes=io_end[0] - io_start[0],
+                write_bytes=io_end[1] - io_start[1],
+                rss_mb=round(metrics.rss_bytes() / 1024**2, 1),
+                peak_rss_mb=round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            )
+            if (gpu := _gpu_memory()) is not None:
+                span_args.update(gpu_mb=round(gpu[0], 1), gpu_peak_mb=round(gpu[1], 1))
+            tracer.complete(name, start, end, span_args)
+
+
+def annotate(**args):
+    """ Adds values to the innermost open span of this thread (ignored outside of a span)."""
+    stack = getattr(_local, "stack", None)
+    if stack:
+        stack[-1].update(args)
+
+
+def count(name: str, **args):
+    """ Counts an event (e.g. a cache hit) in the request metrics and marks it in the trace."""
+    if (request_metrics := metrics.current()) is not None:
+        request_metrics.incr(name)
+    if _tracer:
+        _tracer.instant(name, args)
+
+
+def audio_seconds(path: str) -> float | None:
+    """ Length of a WAV file read from its header, None for other formats."""
+    try:
+        with wave.open(path, "rb") as w:
+            return round(w.getnframes() / w.getframerate(), 3)
+    except Exception:
+        return None
@@ -0,0 +1,210 @@
+import time
+import uuid
+import queue
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from transcribe import Transcription, ExecutorPool
+from av_preprocessing import get_media_duration
+from metrics import RequestMetrics, MemorySampler, collect
+from instrumentation import span
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a job is submitted while the queue already holds `max_pending` jobs."""
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker when its running job gets cancelled."""
+
+
+@dataclass
+class Job:
+    """A transcription request and its state: queued -> running -> done / failed / cancelled."""
+    id: str
+    params: dict
+    status: str = "queued"
+    submitted_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    progress: dict = field(default_factory=dict)
+    output_srt: str | None = None
+    result: str | None = None
+    error: str | None = None
+    metrics: dict = field(default_factory=dict)
+    cancel_requested: threading.Event = field(default_factory=threading.Event, repr=False)
+    finished: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "input_path": self.params.get("input_file"),
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": self.progress,
+            "output_srt": self.output_srt,
+            "error": self.error,
+            "metrics": self.metrics,
+        }
+
+
+class TranscriptionJobQueue:
+    """
+    Bounded job queue running `Transcription`s in a pool of worker threads.
+
+    Workers share warm models through an `ExecutorPool` of the same size, so the number of loaded Whisper models never
+    exceeds `workers` no matter how many requests come in. Admission control rejects new jobs with `QueueFullError`
+    once `max_pending` jobs are waiting. Queued jobs can be cancelled at once, running ones between two decoded chunks
+    (i.e. VAD segments, when an external VAD is used).
+
+    Args:
+        workers (int): Number of transcriptions running at once (and of loaded models).
+        max_pending (int): Maximum number of queued (not yet running) jobs.
+        max_finished (int): How many finished jobs are kept for status/result queries.
+        executor_pool (ExecutorPool | None): Pool of warm executors, a new one of size `workers` if None.
+        on_finished (callable | None): Called with the `Job` once it's done, failed or cancelled (from the worker thread).
+
+    Each job gets `metrics`: queue wait, time per preprocessing stage, model load, VAD, inference, audio length,
+    real-time factors and the peak RSS/GPU memory during the run.
+
+    Example:
+        jobs = TranscriptionJobQueue(workers=1)
+        job = jobs.submit(input_file="movie.mp4", whisper_implementation="whisperx", whisper_params={...})
+        jobs.wait(job.id)
+        print(job.result)
+    """
+
+    def __init__(self, workers: int = 1, max_pending: int = 16, max_finished: int = 100, executor_pool: ExecutorPool | None = None,
+                 on_finished=None):
+        self.max_pending = max_pending
+        self.on_finished = on_finished
+        self.max_finished = max_finished
+        self.executor_pool = executor_pool or ExecutorPool(size=workers)
+
+        self.jobs: OrderedDict[str, Job] = OrderedDict()
+        self._lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue()
+        self._pending = 0
+
+        self._workers = [
+            threading.Thread(target=self._worker, name=f"transcription-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, **params) -> Job:
+        """ Queues a transcription. `params` are the keyword arguments of `Transcription`."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFullError(f"Transcription queue is full ({self._pending} jobs waiting), try again later.")
+            job = Job(id=uuid.uuid4().hex[:12], params=params)
+            self.jobs[job.id] = job
+            self._pending += 1
+            self._prune()
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id: str) -> Job:
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            raise KeyError(f"Unknown job id: {job_id}")
+        return job
+
+    def snapshot(self) -> list[Job]:
+        """ The known jobs in submission order, copied under the lock (`submit` and pruning change `jobs` from other threads)."""
+        with self._lock:
+            return list(self.jobs.values())
+
+    def wait(self, job_id: str, timeout: float | None = None) -> Job:
+        job = self.get(job_id)
+        job.finished.wait(timeout)
+        return job
+
+    def cancel(self, job_id: str) -> Job:
+        job = self.get(job_id)
+        with self._lock:
+            if job.status == "queued":
+                self._finish(job, "cancelled")
+                self._pending -= 1
+            elif job.status == "running":
+                job.cancel_requested.set()
+        return job
+
+    def queue_position(self, job_id: str) -> int | None:
+        """ 0-based position among the queued jobs, None if the job isn't waiting."""
+        queued = [job.id for job in self.snapshot() if job.status == "queued"]
+        return queued.index(job_id) if job_id in queued else None
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished.is_set()]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job_id]
+
+    def _finish(self, job: Job, status: str, error: str | None = None):
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        job.finished.set()
+        if self.on_finished:
+            try:
+                self.on_finished(job)
+            except Exception as e:
+                print(f"[JobQueue] on_finished callback failed for job {job.id}: {e}")
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                if job.status != "queued":
+                    continue  # cancelled while waiting
+                job.status = "running"
+                job.started_at = time.time()
+                self._pending -= 1
+
+            metrics = RequestMetrics()
+            metrics.set("queue_wait", round(job.started_at - job.submitted_at, 4))
+            memory = MemorySampler()
+            status, error = "done", None
+            try:
+                with collect(metrics), memory, span("job", job_id=job.id, input=job.params.get("input_file")):
+                    self._run(job)
+            except JobCancelled:
+                status = "cancelled"
+            except Exception as e:
+                print(f"[JobQueue] Job {job.id} failed: {e}")
+                status, error = "failed", str(e)
+
+            job.metrics = self._summarize(job, metrics, memory)
+            self._finish(job, status, error)
+
+    @staticmethod
+    def _summarize(job: Job, metrics: RequestMetrics, memory: MemorySampler) -> dict:
+        metrics.set("total", round(time.time() - job.started_at, 4))
+        audio_seconds = get_media_duration(job.params["input_file"])
+        if audio_seconds:
+            metrics.set("audio_seconds", round(audio_seconds, 3))
+            inference = sum(t for name, t in metrics.timings.items() if name.startswith("inference"))  # incl. inference.probe etc.
+            metrics.set("rtf", round(inference / audio_seconds, 4))
+            metrics.set("total_rtf", round(metrics.values["total"] / audio_seconds, 4))
+        return {**metrics.to_dict(), **memory.to_dict()}
+
+    def _run(self, job: Job):
+        params = dict(job.params)
+        implementation = params.get("whisper_implementation")
+        model_name = params.get("model_name", "large-v2")
+
+        with self.executor_pool.executor(implementation, model_name, params.get("whisper_params"), params.get("cpu_profile")) as executor:
+            transcription = Transcription(run=False, whisper_executor=executor, **params)
+            job.output_srt = transcription.output_srt
+            for i, segment in enumerate(transcription.iter_segments(), start=1):
+                job.progress = {"segments": i, "transcribed_until": segment.end}
+                if job.cancel_requested.is_set():
+                    raise JobCancelled()
+
+        transcription.write_srt()
+        job.result = transcription.full_text()
@@ -5,6 +5,9 @@ import ollama
 from transcribe import Transcription
 from srt_processing import extend_w_llm
 from translate import translate_srt
+from pipeline import run_streaming_pipeline
+from batch import run_batch
+from instrumentation import tracing
 
 ollama.OLLAMA_API_URL = "http://localhost:11434/api"
 ollama.OLLAMA_MODEL = "deepseek-r1:14b"
@@ -36,33 +39,90 @@ WHISPER_PARAMS = {
     }
 }
 
-def main():
+def main(movie_file, output_srt=None, streaming=False, external_vad=None, external_vad_params=None):
+    """
+    Transcribes, corrects and translates a movie.
+
+    By default the stages run one after another through files, with the second transcription pass. With `streaming` they
+    run side by side (`pipeline.StreamingPipeline`) without the second pass, which needs the whole text first; the stages
+    only overlap when Whisper decodes in chunks, i.e. with an `external_vad`.
+    """
 
     whisper_implementation = "whisperx"  # or "whisper" for OpenAI Whisper
 
+    if streaming and external_vad is None:
+        print("[Pipeline] Streaming without an external VAD: segments arrive only once the whole file is decoded, the stages won't overlap")
+
     t = Transcription(
         movie_file,
-        second_pass=True,
+        output_srt=output_srt,
+        second_pass=not streaming,  # the second pass needs the whole text first, so it can't be streamed
+        external_vad=external_vad,
+        external_vad_params=external_vad_params,
         skip_preprocessing_if_file_exists=True,
         whisper_implementation=whisper_implementation,
         whisper_params=WHISPER_PARAMS.get(whisper_implementation.upper(), WHISPER_PARAMS['WHISPER']),
         preprocess_pipeline=PREPROCESSING_PIPELINE,
+        run=not streaming,
     )
+
+    if streaming:
+        # Transcription, correction and translation run side by side, passing segments to each other
+        return run_streaming_pipeline(t, window=7.0, language="polish", translation_method='marian')
+
     t.write_srt()
 
     # Correct the SRT file with LLM context
     llm_extended_srt = extend_w_llm(t.output_srt, window=7.0, language="polish")
     # Translate the SRT file
-    translate_srt(llm_extended_srt, method='marian')
+    translated_srt = translate_srt(llm_extended_srt, method='marian')
+
+    return t.output_srt, llm_extended_srt, translated_srt
+
+def main_batch(source, output_dir=None, cpu_workers=2, gpu_workers=1, llm_workers=1):
+
+    whisper_implementation = "whisperx"  # or "whisper" for OpenAI Whisper
+
+    # second pass is off: it would keep the GPU slot busy while waiting for the LLM summary
+    return run_batch(
+        source,
+        output_dir=output_dir,
+        cpu_workers=cpu_workers,
+        gpu_workers=gpu_workers,
+        llm_workers=llm_workers,
+        transcription_params={
+            "whisper_implementation": whisper_implementation,
+            "whisper_params": WHISPER_PARAMS.get(whisper_implementation.upper(), WHISPER_PARAMS['WHISPER']),
+            "preprocess_pipeline": PREPROCESSING_PIPELINE,
+        },
+        correction_params={"window": 7.0, "language": "polish"},
+        translation_params={"method": "marian"},
+    )
     
 
 if __name__ == "__main__":
-    import sys
-    
-    if len(sys.argv) < 2:
-        print("Usage: python transcribe.py <movie_file> [output_srt]")
-    else:
-        movie_file = sys.argv[1]
-        output_srt = sys.argv[2] if len(sys.argv) > 2 else None
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Transcribe, correct and translate a movie")
+    parser.add_argument("movie_file", help="Path to the movie or audio file (with --batch: a directory or a manifest file)")
+    parser.add_argument("output_srt", nargs="?", default=None,
+                        help="Path to the output SRT file (with --batch: output directory)")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Run the stages side by side in one process (no second transcription pass)")
+    parser.add_argument("--batch", action="store_true",
+                        help="Process all the media files of a directory or a manifest, skipping work finished in previous runs")
+    parser.add_argument("--cpu-workers", type=int, default=2, help="Batch: parallel ffmpeg/denoise jobs")
+    parser.add_argument("--gpu-workers", type=int, default=1, help="Batch: parallel Whisper models")
+    parser.add_argument("--llm-workers", type=int, default=1, help="Batch: parallel requests to Ollama")
+    parser.add_argument("--trace", default=None,
+                        help="Save a Chrome trace (chrome://tracing, ui.perfetto.dev) of all the stages to this JSON file")
+    args = parser.parse_args()
+
+    with tracing(args.trace):
+        if args.batch:
+            failed = main_batch(args.movie_file, args.output_srt, args.cpu_workers, args.gpu_workers, args.llm_workers)
+        else:
+            main(args.movie_file, args.output_srt, streaming=args.streaming)
+            failed = None
 
-    main()
\ No newline at end of file
+    sys.exit(1 if failed else 0)
@@ -1,14 +1,66 @@
-import json
+import asyncio
 import datetime
 
 from fastmcp import FastMCP
-from transcribe import Transcription
+from job_queue import TranscriptionJobQueue, QueueFullError
+from metrics import JsonLinesSink, MetricsRegistry
 
 mcp: FastMCP = FastMCP("audio-llm-pipeline")
 LOG_FILE = "/tmp/mcp_server_requests.log"
 
+# Requests and finished jobs are logged as JSON lines from a background thread, metrics of the finished jobs
+# are aggregated for the `stats` tool.
+log_sink = JsonLinesSink(LOG_FILE)
+job_metrics = MetricsRegistry()
+
+# Transcriptions run in a bounded pool of workers sharing warm models, so concurrent calls can't load
+# more models than WORKERS and OOM the GPU. Requests above MAX_PENDING waiting jobs are rejected.
+WORKERS = 1
+MAX_PENDING = 16
+
+def log_request(function, params):
+    # Log the incoming request and payload
+    log_entry = dict(
+        timestamp=datetime.datetime.now().isoformat(),
+        function=function
+    )
+    log_entry.update(params)
+    log_sink.write(log_entry)
+
+def job_finished(job):
+    log_sink.write(dict(
+        timestamp=datetime.datetime.now().isoformat(),
+        event="job_finished",
+        job_id=job.id,
+        status=job.status,
+        input_path=job.params.get("input_file"),
+        error=job.error,
+        metrics=job.metrics,
+    ))
+    if job.status == "done":
+        job_metrics.add(job.metrics)
+
+jobs = TranscriptionJobQueue(workers=WORKERS, max_pending=MAX_PENDING, on_finished=job_finished)
+
+def submit_job(function, input_path, output_srt, preprocess_pipeline, skip_preprocessing_if_file_exists,
+               external_vad, external_vad_params, model_name, whisper_params, whisper_implementation):
+    params = dict(
+        input_file=input_path,
+        output_srt=output_srt,
+        preprocess_pipeline=preprocess_pipeline,
+        external_vad=external_vad,
+        external_vad_params=external_vad_params,
+        skip_preprocessing_if_file_exists=skip_preprocessing_if_file_exists,
+        whisper_params=whisper_params,
+        model_name=model_name,
+        whisper_implementation=whisper_implementation
+    )
+    job = jobs.submit(**params)
+    log_request(function, dict(params, job_id=job.id))
+    return job
+
 @mcp.tool
-def transcribe(
+async def transcribe(
     input_path,
     output_srt=None,
     preprocess_pipeline=None,
@@ -86,6 +138,8 @@ def transcribe(
         - Use `write_srt()` to save subtitles.
         - WhisperX requires `pip install whisperx`.
         - Alignment/diarization are not supported.
+        - The call waits for the result; for long files use `submit_transcription` and poll `job_status` instead.
+        - Requests are queued and run by a bounded pool of workers sharing the loaded models.
         - Backend is selected via `whisper_implementation`.
         - WhisperX is only imported if used.
 
@@ -156,48 +210,125 @@ def transcribe(
         )
         print(result)
     """
-    # Log the incoming request and payload
-    log_entry = dict(
-        timestamp=datetime.datetime.now().isoformat(),
-        function="transcribe"
-    )
-    # Add parameters to log_entry from locals()
-    for k in [
-        "input_path", "output_srt", "preprocess_pipeline", "external_vad", "external_vad_params",
-        "skip_preprocessing_if_file_exists", "whisper_params", "model_name", "whisper_implementation"
-    ]:
-        log_entry[k] = locals()[k]
     try:
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(json.dumps(log_entry, ensure_ascii=False, indent=2) + "\n")
-    except Exception as e:
-        print(f"[LOGGING ERROR] {e}")
-
-    # LOCK_FILE = "/tmp/mcp_server.lock"
-    # lock_fp = open(LOCK_FILE, "w")
-    # try:
-    #     fcntl.flock(lock_fp, fcntl.LOCK_EX | fcntl.LOCK_NB)
-    # except BlockingIOError:
-    #     print("Another instance of MCP tool is already running. Please try again later.")
-    #     return "[ERROR] Another instance of MCP server is already running. Please try again later."
-
-    transcription = Transcription(
-        input_file=input_path,
-        output_srt=output_srt,
-        preprocess_pipeline=preprocess_pipeline,
-        external_vad=external_vad,
-        external_vad_params=external_vad_params,
-        skip_preprocessing_if_file_exists=skip_preprocessing_if_file_exists,
-        whisper_params=whisper_params,
-        model_name=model_name,
-        whisper_implementation=whisper_implementation
-    )
-    transcription.write_srt()
+        job = submit_job("transcribe", input_path, output_srt, preprocess_pipeline, skip_preprocessing_if_file_exists,
+                         external_vad, external_vad_params, model_name, whisper_params, whisper_implementation)
+    except QueueFullError as e:
+        return f"[ERROR] {e}"
+
+    # wait in a thread, so the server keeps answering other calls (status, other submissions) meanwhile
+    await asyncio.to_thread(job.finished.wait)
 
-    # Release the lock
-    # fcntl.flock(lock_fp, fcntl.LOCK_UN)
+    if job.status != "done":
+        return f"[ERROR] Transcription job {job.id} {job.status}: {job.error or ''}"
+    return job.result
 
-    return transcription.full_text()
+@mcp.tool
+def submit_transcription(
+    input_path,
+    output_srt=None,
+    preprocess_pipeline=None,
+    skip_preprocessing_if_file_exists=False,
+    external_vad=None,
+    external_vad_params=None,
+    model_name="large-v2",
+    whisper_params=None,
+    whisper_implementation=None
+):
+    """
+    Queue a transcription and return at once, without waiting for the result.
+
+    Takes exactly the same arguments as the `transcribe` tool. Use `job_status` to follow the progress,
+    `job_result` to get the transcribed text once the job is done and `cancel_job` to stop it.
+
+    Returns:
+        dict: {"job_id": str, "status": "queued", "queue_position": int} or {"error": str} when the queue is full.
+    """
+    try:
+        job = submit_job("submit_transcription", input_path, output_srt, preprocess_pipeline, skip_preprocessing_if_file_exists,
+                         external_vad, external_vad_params, model_name, whisper_params, whisper_implementation)
+    except QueueFullError as e:
+        return {"error": str(e)}
+    return {"job_id": job.id, "status": job.status, "queue_position": jobs.queue_position(job.id)}
+
+@mcp.tool
+def job_status(job_id: str):
+    """
+    Get the state of a transcription job submitted with `submit_transcription`.
+
+    Returns:
+        dict: status ("queued", "running", "done", "failed" or "cancelled"), queue_position of a queued job,
+        progress of a running job ({"segments": int, "transcribed_until": seconds}), timestamps, output_srt and error.
+    """
+    try:
+        job = jobs.get(job_id)
+    except KeyError as e:
+        return {"error": str(e)}
+    return dict(job.to_dict(), queue_position=jobs.queue_position(job_id))
+
+@mcp.tool
+def job_result(job_id: str):
+    """
+    Get the transcribed text of a finished job.
+
+    Returns:
+        str: The full transcribed text, or an "[ERROR] ..." message if the job is unknown, not finished yet, failed or cancelled.
+    """
+    try:
+        job = jobs.get(job_id)
+    except KeyError as e:
+        return f"[ERROR] {e}"
+    if job.status != "done":
+        return f"[ERROR] Job {job_id} is {job.status}. {job.error or ''}".strip()
+    return job.result
+
+@mcp.tool
+def cancel_job(job_id: str):
+    """
+    Cancel a transcription job. A queued job is cancelled at once, a running one after its current chunk is transcribed.
+
+    Returns:
+        dict: The job status after the request.
+    """
+    try:
+        job = jobs.cancel(job_id)
+    except KeyError as e:
+        return {"error": str(e)}
+    return job.to_dict()
+
+@mcp.tool
+def list_jobs():
+    """
+    List all the known transcription jobs (queued, running and recently finished).
+
+    Returns:
+        list[dict]: Status of each job.
+    """
+    return [job.to_dict() for job in jobs.snapshot()]
+
+@mcp.tool
+def stats():
+    """
+    Show where the time goes: metrics aggregated over the recently finished transcription jobs, plus the current queue state.
+
+    Every metric is summarized as count/mean/p50/p95/max. Times are in seconds:
+        - queue_wait: time between submission and start,
+        - preprocess.<stage>: time of each preprocessing stage (e.g. preprocess.normalize.ffmpeg),
+        - model_load: loading a Whisper model (missing when a warm model was reused),
+        - vad, inference: external VAD and Whisper decoding,
+        - llm.generate: LLM calls (e.g. the summary for the second pass),
+        - preprocess.cache_hit / preprocess.cache_miss: preprocessing stages reused from disk / computed,
+        - total: whole job run time,
+        - audio_seconds: length of the input,
+        - rtf / total_rtf: inference (incl. the adaptive probe and escalations) / total time divided by the audio length,
+        - peak_rss_mb / peak_gpu_mb: peak process memory during the job.
+
+    Returns:
+        dict: {"queue": {...}, "requests": int, "metrics": {name: {count, mean, p50, p95, max}}}
+    """
+    statuses = [job.status for job in jobs.snapshot()]
+    queue_state = {status: statuses.count(status) for status in ("queued", "running", "done", "failed", "cancelled")}
+    return {"queue": queue_state, **job_metrics.summary()}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,191 @@
+import os
+import json
+import queue
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+_current = threading.local()
+
+
+class RequestMetrics:
+    """
+    Timings and resource usage of a single request.
+
+    Collection is activated for the current thread with `collect()`; the instrumented code (preprocessing stages,
+    model loading, inference...) reports into it through `instrumentation.span()` and doesn't need to know about the
+    request at all. Timings of the same name are summed up (e.g. inference over all VAD segments).
+    """
+
+    def __init__(self):
+        self.timings: dict[str, float] = {}
+        self.values: dict[str, float] = {}
+
+    def add_time(self, name: str, seconds: float):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def incr(self, name: str, by: int = 1):
+        self.values[name] = self.values.get(name, 0) + by
+
+    def set(self, name: str, value):
+        self.values[name] = value
+
+    def to_dict(self) -> dict:
+        return {**{k: round(v, 4) for k, v in self.timings.items()}, **self.values}
+
+
+def current() -> RequestMetrics | None:
+    return getattr(_current, "metrics", None)
+
+
+@contextmanager
+def collect(metrics: RequestMetrics):
+    """ Makes `metrics` the target of the spans and counters in this thread."""
+    previous = current()
+    _current.metrics = metrics
+    try:
+        yield metrics
+    finally:
+        _current.metrics = previous
+
+
+def rss_bytes() -> int:
+    """ Current resident set size of the process (Linux), 0 where /proc isn't available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class MemorySampler:
+    """
+    Tracks the peak CPU (RSS) and GPU memory while the block runs.
+
+    Both are sampled from a background thread every `interval` seconds. torch's allocator peak is read on enter and
+    exit but never reset, as it is shared by all threads: when it rose during the block, that new peak is reported,
+    otherwise the highest sampled allocation. Both are process-wide, so with concurrent requests they include the memory of the others.
+    """
+
+    def __init__(self, interval: float = 0.2):
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_gpu = None
+        self._cuda = False
+        self._gpu_peak_on_enter = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, rss_bytes())
+            if self._cuda:
+                import torch
+                self.peak_gpu = max(self.peak_gpu, torch.cuda.memory_allocated())
+
+    def __enter__(self):
+        self.peak_rss = rss_bytes()
+        self._cuda = _cuda_available()
+        if self._cuda:
+            import torch
+            self._gpu_peak_on_enter = torch.cuda.max_memory_allocated()
+            self.peak_gpu = torch.cuda.memory_allocated()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_rss = max(self.peak_rss, rss_bytes())
+        if self._cuda:
+            import torch
+            self.peak_gpu = max(self.peak_gpu, torch.cuda.memory_allocated())
+            peak = torch.cuda.max_memory_allocated()
+            if peak > self._gpu_peak_on_enter:
+                self.peak_gpu = max(self.peak_gpu, peak)
+        return False
+
+    def to_dict(self) -> dict:
+        return {
+            "peak_rss_mb": round(self.peak_rss / 1024**2, 1),
+            "peak_gpu_mb": round(self.peak_gpu / 1024**2, 1) if self.peak_gpu is not None else None,
+        }
+
+
+def _cuda_available() -> bool:
+    try:
+        import torch
+        return torch.cuda.is_available()
+    except ImportError:
+        return False
+
+
+class JsonLinesSink:
+    """
+    Appends log entries as compact JSON lines from a background thread.
+
+    `write()` only puts the entry in a queue, so the caller never waits for the disk. Entries that can't be
+    serialized as they are (e.g. callables passed as `external_vad`) are written as their `str()`.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="jsonl-sink", daemon=True)
+        self._thread.start()
+
+    def write(self, entry: dict):
+        self._queue.put(entry)
+
+    def _run(self):
+        while True:
+            entries = [self._queue.get()]
+            while not self._queue.empty():
+                entries.append(self._queue.get_nowait())
+            lines = "".join(json.dumps(e, ensure_ascii=False, separators=(",", ":"), default=str) + "\n" for e in entries)
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(lines)
+            except Exception as e:
+                print(f"[LOGGING ERROR] {e}")
+
+
+class MetricsRegistry:
+    """ Keeps the metrics of the last `maxlen` requests and summarizes them (count, mean, p50, p95, max per metric)."""
+
+    def __init__(self, maxlen: int = 1000):
+        self._records: deque[dict] = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, record: dict):
+        with self._lock:
+            self._records.append(record)
+
+    def summary(self) -> dict:
+        with self._lock:
+            records = list(self._records)
+
+        values: dict[str, list[float]] = {}
+        for record in records:
+            for name, value in record.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    values.setdefault(name, []).append(value)
+
+        summary = {}
+        for name, vals in sorted(values.items()):
+            vals.sort()
+            summary[name] = {
+                "count": len(vals),
+                "mean": round(sum(vals) / len(vals), 4),
+                "p50": round(_percentile(vals, 50), 4),
+                "p95": round(_percentile(vals, 95), 4),
+                "max": round(vals[-1], 4),
+            }
+        return {"requests": len(records), "metrics": summary}
+
+
+def _percentile(sorted_values: list[float], p: float) -> float:
+    k = (len(sorted_values) - 1) * p / 100
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
@@ -0,0 +1,134 @@
+import os
+import tempfile
+import numpy as np
+import soundfile as sf
+
+# Timelines larger than this are mixed in a memory-mapped temp file instead of RAM
+MEMMAP_THRESHOLD_BYTES = 1 << 30
+
+
+class TimelineMixer:
+    """
+    Mixes audio clips onto one timeline.
+
+    The whole timeline is one preallocated float32 buffer (memory-mapped to a temp file when it's larger than
+    `MEMMAP_THRESHOLD_BYTES`) and every clip is added in place at its sample offset, so placing a clip costs only its own length.
+    `write()` saves the result in blocks.
+
+    Args:
+        duration (float): Length of the timeline in seconds; clips reaching past it are cut.
+        sample_rate (int): Sample rate of the timeline, clips with another rate are resampled.
+        channels (int): Number of channels; mono clips are copied to all of them.
+        temp_dir (str | None): Where the memory-mapped buffer is created for long timelines.
+
+    Example:
+        mixer = TimelineMixer(duration=segments[-1].end, sample_rate=44100)
+        for seg in segments:
+            mixer.add_file(f"output_audio/{seg.start:.3f}.wav", seg.start)
+        mixer.write("output_audio/aligned_output.wav")
+    """
+
+    def __init__(self, duration: float, sample_rate: int, channels: int = 1, temp_dir: str | None = None):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        frames = int(round(duration * sample_rate))
+
+        self._memmap_path = None
+        if frames * channels * 4 > MEMMAP_THRESHOLD_BYTES:
+            fd, self._memmap_path = tempfile.mkstemp(suffix=".f32", dir=temp_dir)
+            os.close(fd)
+            self.buffer = np.memmap(self._memmap_path, dtype=np.float32, mode="w+", shape=(frames, channels))
+        else:
+            self.buffer = np.zeros((frames, channels), dtype=np.float32)
+
+    @property
+    def duration(self) -> float:
+        return len(self.buffer) / self.sample_rate
+
+    def add(self, audio: np.ndarray, start: float, sample_rate: int | None = None, gain: float = 1.0, duck_db: float = 0.0) -> bool:
+        """
+        Adds a clip at `start` seconds.
+
+        Args:
+            audio (np.ndarray): (frames,) or (frames, channels) float samples.
+            sample_rate (int | None): Sample rate of the clip, the timeline's if None.
+            gain (float): Linear gain of the clip.
+            duck_db (float): Attenuation (dB) of what is already on the timeline under the clip, e.g. the original soundtrack under the voice-over.
+
+        Returns:
+            bool: False if the clip starts after the end of the timeline (nothing added).
+        """
+        audio = np.asarray(audio, dtype=np.float32)
+        if audio.ndim == 1:
+            audio = audio[:, None]
+        if sample_rate and sample_rate != self.sample_rate:
+            audio = _resample(audio, sample_rate, self.sample_rate)
+        if audio.shape[1] != self.channels:
+            audio = np.repeat(audio.mean(axis=1, keepdims=True), self.channels, axis=1)
+
+        offset = int(round(start * self.sample_rate))
+        if offset >= len(self.buffer):
+            return False
+        region = self.buffer[offset:offset + len(audio)]
+        if duck_db:
+            region *= np.float32(10 ** (-duck_db / 20))
+        if gain != 1.0:
+            region += audio[:len(region)] * np.float32(gain)
+        else:
+            region += audio[:len(region)]
+        return True
+
+    def add_file(self, path: str, start: float, **kwargs) -> bool:
+        audio, sr = sf.read(path, dtype="float32", always_2d=True)
+        return self.add(audio, start, sample_rate=sr, **kwargs)
+
+    def peak(self, block_seconds: float = 60.0) -> float:
+        block = max(1, int(block_seconds * self.sample_rate))
+        return max((float(np.abs(self.buffer[i:i + block]).max()) for i in range(0, len(self.buffer), block)), default=0.0)
+
+    def write(self, path: str, clipping: str | None = "normalize", subtype: str = "PCM_16", block_seconds: float = 60.0) -> str:
+        """
+        Writes the timeline to an audio file in blocks of `block_seconds`.
+
+        Args:
+            clipping (str | None): What to do where overlapping clips exceed full scale:
+                "normalize" scales the whole timeline down to the peak (keeps the balance, only if it clips),
+                "clip" hard-clips the samples, None writes as is (float subtypes only).
+        """
+        scale = 1.0
+        if clipping == "normalize" and (peak := self.peak(block_seconds)) > 1.0:
+            scale = 1.0 / peak
+            print(f"[Mixer] Peak {peak:.2f} over full scale, scaling the timeline by {scale:.3f}")
+
+        block = max(1, int(block_seconds * self.sample_rate))
+        with sf.SoundFile(path, "w", samplerate=self.sample_rate, channels=self.channels, subtype=subtype) as f:
+            for i in range(0, len(self.buffer), block):
+                chunk = self.buffer[i:i + block]
+                if scale != 1.0:
+                    chunk = chunk * np.float32(scale)
+                if clipping is not None:
+                    chunk = np.clip(chunk, -1.0, 1.0)
+                f.write(chunk)
+        return path
+
+    def close(self):
+        """ Frees the buffer (removes the memory-mapped temp file)."""
+        if self._memmap_path:
+            del self.buffer
+            os.remove(self._memmap_path)
+            self._memmap_path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def _resample(audio: np.ndarray, sr_in: int, sr_out: int) -> np.ndarray:
+    """ Linear-interpolation resampling, good enough for placing speech clips on a timeline."""
+    n_out = int(round(len(audio) * sr_out / sr_in))
+    x_in = np.arange(len(audio)) / sr_in
+    x_out = np.arange(n_out) / sr_out
+    return np.stack([np.interp(x_out, x_in, audio[:, c]) for c in range(audio.shape[1])], axis=1).astype(np.float32)
@@ -1,5 +1,6 @@
 import requests
 import re
+from instrumentation import span, annotate
 
 OLLAMA_API_URL = "http://localhost:11434/api"
 OLLAMA_MODEL = "qwen2.5"
@@ -29,9 +30,11 @@ def call_api(prompt: str, model: str = OLLAMA_MODEL, timeout: int = 600) -> str:
         "stream": False
     }
     try:
-        response = requests.post(OLLAMA_API_URL + "/generate", json=payload, timeout=timeout)
-        response.raise_for_status()
-        result = response.json()
+        with span("llm.generate", model=model, prompt_chars=len(prompt)):
+            response = requests.post(OLLAMA_API_URL + "/generate", json=payload, timeout=timeout)
+            response.raise_for_status()
+            result = response.json()
+            annotate(eval_count=result.get("eval_count"), prompt_eval_count=result.get("prompt_eval_count"))
         summary = result.get("response", "")
         summary = clean_llm_response(summary)
         print(f"[Ollama] Response: {summary}")
@@ -57,9 +60,11 @@ def call_chat(messages, model: str = OLLAMA_MODEL, timeout: int = 600) -> str:
         "stream": False
     }
     try:
-        response = requests.post(OLLAMA_API_URL + "/chat", json=payload, timeout=timeout)
-        response.raise_for_status()
-        result = response.json()
+        with span("llm.chat", model=model, messages=len(messages)):
+            response = requests.post(OLLAMA_API_URL + "/chat", json=payload, timeout=timeout)
+            response.raise_for_status()
+            result = response.json()
+            annotate(eval_count=result.get("eval_count"), prompt_eval_count=result.get("prompt_eval_count"))
         summary = result['message']['content']
         summary = clean_llm_response(summary)
         if not summary:
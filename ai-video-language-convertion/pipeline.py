@@ -0,0 +1,264 @@
+import queue
+import itertools
+import threading
+from contextlib import contextmanager
+
+import ollama
+from transcribe import Transcription
+from srt_processing import (
+    SRTSegment, iter_merged_segments, get_broad_context,
+    get_context_segments, correction_prompt, seconds_to_srt_time, write_srt_segments
+)
+from translate import translation_prompt, marian_translate, marian_lang_codes
+from instrumentation import span
+
+_DONE = object()  # end-of-stream marker passed between the stages
+
+
+class ResourceBudget:
+    """
+    Shared GPU memory budget for the overlapping pipeline stages.
+
+    Every stage declares how much memory (in GB) its model needs and reserves it before loading. Stages run side by side
+    as long as their reservations fit into the budget, otherwise the later one waits until memory is released. On a card
+    too small for Whisper and the LLM at once the pipeline therefore falls back to running them one after another instead of OOMing.
+
+    Args:
+        total_gb (float | None): Memory available to the pipeline. If None, the size of the first CUDA device is used
+            (no limit on CPU-only machines).
+    """
+
+    def __init__(self, total_gb: float | None = None):
+        if total_gb is None:
+            total_gb = detect_gpu_memory_gb()
+        self.total_gb = total_gb
+        self._used_gb = 0.0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def reserve(self, gb: float, name: str = ""):
+        gb = min(gb, self.total_gb)  # a single stage larger than the whole budget still has to be able to run alone
+        with self._cond:
+            if self._used_gb + gb > self.total_gb:
+                print(f"[Pipeline] {name} waiting for {gb:.1f} GB of GPU memory ({self._used_gb:.1f}/{self.total_gb:.1f} GB in use)")
+            self._cond.wait_for(lambda: self._used_gb + gb <= self.total_gb)
+            self._used_gb += gb
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._used_gb -= gb
+                self._cond.notify_all()
+
+
+def detect_gpu_memory_gb() -> float:
+    try:
+        import torch
+        if torch.cuda.is_available():
+            return torch.cuda.get_device_properties(0).total_memory / 1024**3
+    except ImportError:
+        pass
+    return float("inf")
+
+
+def _iter_queue(q: queue.Queue):
+    while (item := q.get()) is not _DONE:
+        yield item
+
+
+def _iter_windowed(segments, window: float):
+    """
+    Yields (segments_so_far, idx) for each segment once its whole "after" context window has arrived,
+    so `get_context_segments` gives the same result as on the complete list.
+    """
+    received: list[SRTSegment] = []
+    ready = 0
+    for seg in segments:
+        received.append(seg)
+        while ready < len(received) - 1 and seg.start - received[ready].end > window:
+            yield received, ready
+            ready += 1
+    while ready < len(received):
+        yield received, ready
+        ready += 1
+
+
+class StreamingPipeline:
+    """
+    In-process transcription -> LLM correction -> translation runner.
+
+    The stages run in separate threads connected with queues, so correction of the early segments starts while Whisper is
+    still decoding later audio and translation follows right behind the correction. Wall-clock time approaches the slowest stage
+    instead of the sum of all of them. Segments are only streamed per decoded chunk, so the overlap works best with an
+    `external_vad` configured on the transcription.
+
+    The video summary used by correction and translation is built once from the first `context_seconds` of the transcript
+    (instead of the whole movie, as `extend_w_llm`/`translate_srt` do), so the LLM stages don't have to wait for the end of transcription.
+
+    Args:
+        transcription (Transcription): Configured transcription, created with `run=False`.
+        language (str): Language of the transcription, used by the corrector prompt.
+        window (float): Context window (seconds) for correction and LLM translation, see `get_context_segments`.
+        translation_method (str | None): "llm", "marian" or None to skip translation.
+        source_language (str), target_language (str): Languages for the translation stage.
+        context_seconds (float): How much transcript is collected before asking the LLM for the video summary.
+        budget (ResourceBudget | None): GPU memory budget shared by the stages.
+        whisper_gb (float), llm_gb (float), marian_gb (float): Memory reserved by the Whisper, Ollama and MarianMT models.
+        marian_batch_size (int): Number of segments translated at once with MarianMT.
+
+    Example:
+        t = Transcription(movie_file, external_vad=..., whisper_implementation="whisperx", run=False)
+        srt, corrected_srt, translated_srt = StreamingPipeline(t, translation_method="marian").run()
+    """
+
+    def __init__(self,
+        transcription: Transcription,
+        language: str = "polish",
+        window: float = 7.0,
+        translation_method: str | None = "llm",
+        source_language: str = "polish",
+        target_language: str = "english",
+        context_seconds: float = 300.0,
+        budget: ResourceBudget | None = None,
+        whisper_gb: float = 10.0,
+        llm_gb: float = 10.0,
+        marian_gb: float = 1.0,
+        marian_batch_size: int = 8,
+        ):
+
+        self.transcription = transcription
+        self.language = language
+        self.window = window
+        self.translation_method = translation_method
+        self.source_language = source_language
+        self.target_language = target_language
+        self.context_seconds = context_seconds
+        self.budget = budget or ResourceBudget()
+        self.whisper_gb = whisper_gb
+        self.llm_gb = llm_gb
+        self.marian_gb = marian_gb
+        self.marian_batch_size = marian_batch_size
+
+        self.output_srt = transcription.output_srt
+        self.corrected_srt = f"{self.output_srt}_llm_extended"
+        self.translated_srt = f"{self.corrected_srt}_translated" if translation_method else None
+
+        self.broad_context = None
+        self._errors: list[BaseException] = []
+
+    def run(self) -> tuple[str, str, str | None]:
+        """ Runs all the stages and returns paths of (transcription SRT, corrected SRT, translated SRT)."""
+
+        transcribed_q: queue.Queue = queue.Queue()
+        corrected_q: queue.Queue = queue.Queue()
+
+        stages = [
+            threading.Thread(target=self._guard, args=(self._transcribe_stage, transcribed_q), name="transcribe"),
+            threading.Thread(target=self._guard, args=(self._correct_stage, transcribed_q, corrected_q), name="correct"),
+        ]
+        if self.translation_method:
+            stages.append(threading.Thread(target=self._guard, args=(self._translate_stage, corrected_q), name="translate"))
+
+        for stage in stages:
+            stage.start()
+        for stage in stages:
+            stage.join()
+
+        if self._errors:
+            raise self._errors[0]
+
+        return self.output_srt, self.corrected_srt, self.translated_srt
+
+    def _guard(self, stage, *queues):
+        """ Runs a stage and records its error, so `run()` can re-raise it once all the threads are finished."""
+        try:
+            with span(f"pipeline.{threading.current_thread().name}"):
+                stage(*queues)
+        except BaseException as e:
+            print(f"[Pipeline] Stage {threading.current_thread().name} failed: {e}")
+            self._errors.append(e)
+
+    def _transcribe_stage(self, out_q: queue.Queue):
+        try:
+            with self.budget.reserve(self.whisper_gb, "whisper"):
+                for i, seg in enumerate(self.transcription.iter_segments(), start=1):
+                    out_q.put(SRTSegment(i, seg.start, seg.end, seg.text))
+            self.transcription.write_srt()
+        finally:
+            out_q.put(_DONE)
+
+    def _correct_stage(self, in_q: queue.Queue, out_q: queue.Queue):
+        fixed_segments = []
+        try:
+            segments = _iter_queue(in_q)
+
+            # collect the beginning of the movie for the summary, the rest keeps arriving in the queue meanwhile
+            head = []
+            for seg in segments:
+                head.append(seg)
+                if seg.end >= self.context_seconds:
+                    break
+
+            with self.budget.reserve(self.llm_gb, "llm correction"):
+                self.broad_context = get_broad_context(" ".join(seg.text for seg in head), stop_after=False)
+
+                for received, idx in _iter_windowed(iter_merged_segments(itertools.chain(head, segments)), self.window):
+                    before, target, after = get_context_segments(received, idx, self.window)
+                    change_proposal = ollama.call_api(correction_prompt(before, target, after, self.broad_context, self.language))
+
+                    if change_proposal.strip() != target.text.strip():
+                        print(f"[CHANGED] #{target.idx} {seconds_to_srt_time(target.start)} --> {seconds_to_srt_time(target.end)}")
+                        print(f"  Original: {target.text}")
+                        print(f"  Changed:  {change_proposal}\n")
+
+                    fixed_segments.append((target.idx, target.start, target.end, change_proposal))
+                    out_q.put(SRTSegment(target.idx, target.start, target.end, change_proposal))
+
+                if self.translation_method != "llm":
+                    ollama.stop_all_processes()  # nothing else needs the LLM, free the memory
+        finally:
+            write_srt_segments(self.corrected_srt, fixed_segments)
+            out_q.put(_DONE)
+
+    def _translate_stage(self, in_q: queue.Queue):
+        translated_segments = []
+
+        if self.translation_method == "marian":
+            src_lang, tgt_lang = marian_lang_codes(self.source_language, self.target_language)
+            segments = _iter_queue(in_q)
+            first = next(segments, None)
+            # memory is reserved only once there is something to translate: held while waiting for the corrections,
+            # it could take the place the LLM stage needs to produce them
+            if first is not None:
+                with self.budget.reserve(self.marian_gb, "marian"):
+                    batch = []
+                    for seg in itertools.chain([first], segments):
+                        batch.append(seg)
+                        if len(batch) >= self.marian_batch_size:
+                            translated_segments.extend(self._marian_batch(batch, src_lang, tgt_lang))
+                            batch = []
+                    if batch:
+                        translated_segments.extend(self._marian_batch(batch, src_lang, tgt_lang))
+        else:
+            # shares the model (and so the reservation) with the correction stage, Ollama keeps it loaded
+            for segments, idx in _iter_windowed(_iter_queue(in_q), self.window):
+                before, target, after = get_context_segments(segments, idx, self.window)
+                translated_line = ollama.call_api(translation_prompt(
+                    before, target, after, self.broad_context, self.source_language, self.target_language
+                ))
+                print(f"[TRANSLATED] #{target.idx} {seconds_to_srt_time(target.start)} --> {seconds_to_srt_time(target.end)}")
+                print(f"  Original: {target.text}")
+                print(f"  Translated:  {translated_line}\n")
+                translated_segments.append((target.idx, target.start, target.end, translated_line))
+            ollama.stop_all_processes()
+
+        write_srt_segments(self.translated_srt, translated_segments)
+
+    def _marian_batch(self, batch, src_lang, tgt_lang):
+        translations = marian_translate([seg.text for seg in batch], src_lang, tgt_lang, batch_size=self.marian_batch_size)
+        return [(seg.idx, seg.start, seg.end, line) for seg, line in zip(batch, translations)]
+
+
+def run_streaming_pipeline(transcription: Transcription, **kwargs) -> tuple[str, str, str | None]:
+    """ Shortcut for `StreamingPipeline(transcription, **kwargs).run()`."""
+    return StreamingPipeline(transcription, **kwargs).run()
@@ -1,5 +1,6 @@
 import os
 import re
+from instrumentation import annotate, count
 
 def audio_preprocessor(func):
     def wrapper(input_path, skip_if_exists=False, checksum=None, **kwargs):
@@ -20,8 +21,13 @@ def audio_preprocessor(func):
 
         if os.path.exists(output_path) and skip_if_exists:
             print(f"[Preprocessor] Output file '{output_path}' already exists. Skipping {func.__name__}.")
+            annotate(cache="hit")
+            count("preprocess.cache_hit", preprocessor=func.__name__)
             return output_path
 
+        annotate(cache="miss")
+        count("preprocess.cache_miss", preprocessor=func.__name__)
+
         # Print/log which preprocessor is running and with what arguments
         print(f"[Preprocessor] Running {func.__name__}(")
         print(f"    input_path='{input_path}',")
@@ -0,0 +1,197 @@
+import os
+import csv
+import glob
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from srt_processing import parse_srt
+from hallucinations import WORD, compression_ratio, overlap_seconds, silence_from_speech
+
+SCORE_COLUMNS = ["wer", "cer", "repeat_rate", "compression_ratio", "high_compression_cues", "silent_cues", "timing_offset", "timing_error"]
+
+
+def normalize_words(text: str) -> list[str]:
+    """ Lowercase words without punctuation, the units of WER."""
+    return WORD.findall(text.lower())
+
+
+def _match_masks(pattern) -> dict:
+    """ Bit mask of the positions of every symbol of `pattern`, the precomputed part of `edit_distance`."""
+    masks = {}
+    for i, symbol in enumerate(pattern):
+        masks[symbol] = masks.get(symbol, 0) | (1 << i)
+    return masks
+
+
+def edit_distance(pattern, text, masks: dict | None = None) -> int:
+    """
+    Levenshtein distance of two sequences (strings, or lists of words) with the bit-parallel algorithm of Myers/Hyyrö.
+
+    One column of the DP matrix is kept as bit vectors of vertical +1/-1 differences in Python ints, so each symbol of `text`
+    costs a few integer operations over len(pattern) bits: O(len(text) * len(pattern) / 64) machine work instead of a
+    Python loop over every cell. The common prefix and suffix are skipped first, which leaves little to do for the near-identical
+    transcripts of a sweep. Pass `masks` (from `_match_masks(pattern)`) to score many texts against one pattern.
+    """
+    prefix = len(os.path.commonprefix([pattern, text]))
+    pattern, text = pattern[prefix:], text[prefix:]
+    suffix = len(os.path.commonprefix([pattern[::-1], text[::-1]]))
+    pattern, text = pattern[:len(pattern) - suffix], text[:len(text) - suffix]
+
+    m = len(pattern)
+    if m == 0:
+        return len(text)
+    if masks is None:
+        masks, prefix = _match_masks(pattern), 0
+    full = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv, mv, score = full, 0, m
+    for symbol in text:
+        eq = (masks.get(symbol, 0) >> prefix) & full
+        xv = eq | mv
+        xh = ((((eq & pv) + pv) & full) ^ pv) | eq
+        ph = mv | (~(xh | pv) & full)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = ((ph << 1) | 1) & full
+        mh = (mh << 1) & full
+        pv = mh | (~(xv | ph) & full)
+        mv = ph & xv
+    return score
+
+
+def repeat_rate(words: list[str], n: int = 3) -> float:
+    """ Share of the word n-grams that already occurred earlier in the text; looping hallucinations push it up."""
+    if len(words) < n:
+        return 0.0
+    ngrams = [hash(tuple(words[i:i + n])) for i in range(len(words) - n + 1)]
+    return 1.0 - len(set(ngrams)) / len(ngrams)
+
+
+def silence_regions(cues: np.ndarray, min_silence: float = 2.0, speech: list[dict] | None = None) -> np.ndarray:
+    """
+    Sorted (start, end) silent regions: the gaps of at least `min_silence` between the reference cues, or the complement of
+    `speech` timestamps ([{"start", "end"}] in seconds, e.g. from a VAD) when they are given.
+    """
+    if speech is None:
+        speech = [{"start": start, "end": end} for start, end in cues]
+    else:
+        min_silence = 0.0
+    if not speech:
+        return np.zeros((0, 2))
+    return silence_from_speech(speech, max(s["end"] for s in speech), min_silence)
+
+
+class Reference:
+    """
+    A reference transcript prepared once for scoring many hypotheses against it (e.g. all the trials of a sweep).
+
+    Its words, characters and their edit distance bit masks, cue times and silent regions are computed in the constructor,
+    so `score()` only processes the hypothesis.
+
+    Args:
+        srt_file (str): Reference (ground truth) subtitles.
+        min_silence (float): Gaps between reference cues at least this long count as silence.
+        speech (list[dict] | None): Speech timestamps (VAD) to take the silence from instead of the reference gaps.
+
+    Example:
+        reference = Reference("lecture.reference.srt")
+        scores = [reference.score(path) for path in glob.glob("sweep/trial_*.srt")]
+    """
+
+    def __init__(self, srt_file: str, min_silence: float = 2.0, speech: list[dict] | None = None):
+        segments = parse_srt(srt_file)
+        self.words = normalize_words(" ".join(s.text for s in segments))
+        self.chars = " ".join(self.words)
+        self._word_masks = _match_masks(self.words)
+        self._char_masks = _match_masks(self.chars)
+        self.cues = np.array([(s.start, s.end) for s in segments], dtype=float).reshape(-1, 2)
+        self.silence = silence_regions(self.cues, min_silence, speech)
+
+    def score(self, srt_file: str, compression_threshold: float = 2.4, silent_share: float = 0.5) -> dict:
+        """
+        Scores a hypothesis SRT, lower is better for all the values:
+            - wer / cer: word and character error rates (edit distance / reference length),
+            - repeat_rate: share of repeated word 3-grams (see `repeat_rate`),
+            - compression_ratio: of the whole text; high_compression_cues: cues above `compression_threshold`,
+            - silent_cues: cues with more than `silent_share` of their time in the reference silence (phantom text),
+            - timing_offset / timing_error: median signed and mean absolute start difference (s) to the nearest reference cue.
+        """
+        segments = parse_srt(srt_file)
+        words = normalize_words(" ".join(s.text for s in segments))
+        chars = " ".join(words)
+        cues = np.array([(s.start, s.end) for s in segments], dtype=float).reshape(-1, 2)
+
+        scores = {
+            "wer": edit_distance(self.words, words, self._word_masks) / max(len(self.words), 1),
+            "cer": edit_distance(self.chars, chars, self._char_masks) / max(len(self.chars), 1),
+            "repeat_rate": repeat_rate(words),
+            "compression_ratio": compression_ratio(chars),
+            "high_compression_cues": sum(compression_ratio(s.text) > compression_threshold for s in segments),
+            "silent_cues": 0,
+            "timing_offset": 0.0,
+            "timing_error": 0.0,
+        }
+        if len(cues):
+            durations = np.maximum(cues[:, 1] - cues[:, 0], 1e-3)
+            scores["silent_cues"] = int(np.count_nonzero(overlap_seconds(cues, self.silence) / durations > silent_share))
+        if len(cues) and len(self.cues):
+            ref_starts, starts = self.cues[:, 0], cues[:, 0]
+            i = np.searchsorted(ref_starts, starts)
+            before, after = ref_starts[np.clip(i - 1, 0, None)], ref_starts[np.clip(i, None, len(ref_starts) - 1)]
+            nearest = np.where(np.abs(starts - before) <= np.abs(starts - after), before, after)
+            diff = starts - nearest
+            scores["timing_offset"] = float(np.median(diff))
+            scores["timing_error"] = float(np.mean(np.abs(diff)))
+        return {k: round(v, 4) if isinstance(v, float) else int(v) for k, v in scores.items()}
+
+
+def rank(scored: list[dict], by: tuple[str, ...] = ("wer", "repeat_rate", "silent_cues")) -> list[dict]:
+    """ Sorts score dicts (best first) by the given columns, in order of importance."""
+    return sorted(scored, key=lambda s: tuple(s.get(k, float("inf")) for k in by))
+
+
+_worker_reference = None
+
+
+def _init_scoring_worker(reference_srt: str, reference_args: dict):
+    global _worker_reference
+    _worker_reference = Reference(reference_srt, **reference_args)
+
+
+def _score_in_worker(srt_file: str) -> dict:
+    return {"srt": srt_file, **_worker_reference.score(srt_file)}
+
+
+def score_files(reference_srt: str, srt_files: list[str], output_csv: str | None = None, workers: int | None = None, **reference_args) -> list[dict]:
+    """
+    Scores many SRT files against one reference and returns them ranked; optionally saves the table as CSV.
+    The files are scored in `workers` processes, each preparing the reference once.
+    """
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_scoring_worker, initargs=(reference_srt, reference_args)) as pool:
+        ranked = rank(list(pool.map(_score_in_worker, srt_files)))
+    if output_csv:
+        with open(output_csv, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["srt"] + SCORE_COLUMNS)
+            writer.writeheader()
+            writer.writerows(ranked)
+    return ranked
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score SRT files against a reference SRT and rank them.")
+    parser.add_argument("reference")
+    parser.add_argument("srt_files", nargs="+", help="SRT files, or a sweep output directory (its trial_*.srt are scored)")
+    parser.add_argument("--output", default=None, help="Save the ranking as CSV")
+    parser.add_argument("--min-silence", type=float, default=2.0)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    files = []
+    for path in args.srt_files:
+        files.extend(sorted(glob.glob(os.path.join(path, "trial_*.srt"))) if os.path.isdir(path) else [path])
+    for row in score_files(args.reference, files, args.output, args.workers, min_silence=args.min_silence):
+        print(f"{row['wer']:.3f} WER  {row['cer']:.3f} CER  {row['repeat_rate']:.3f} rep  {row['silent_cues']:3d} silent  {row['srt']}")
@@ -61,31 +61,37 @@ def parse_srt(srt_path: str) -> List[SRTSegment]:
         segments.append(SRTSegment(idx, start, end, text))
     return segments
 
-def merge_srt_segments(segments, max_gap=0.5):
-    merged = []
-    buffer = []
-    for i, seg in enumerate(segments):
-        if not buffer:
-            buffer.append(seg)
+def iter_merged_segments(segments, max_gap=0.5):
+    """
+    Incremental version of `merge_srt_segments`.
+
+    Yields each merged segment as soon as the next input segment proves it can't grow any further,
+    so it can be used on a stream of segments that is still being produced.
+    """
+    buffer = None
+    for seg in segments:
+        if buffer is None:
+            buffer = seg
             continue
-        prev = buffer[-1]
         # If gap is small and previous text doesn't end with .!?...
-        if seg.start - prev.end <= max_gap and not prev.text.strip().endswith(('.', '!', '?', '…')):
+        if seg.start - buffer.end <= max_gap and not buffer.text.strip().endswith(('.', '!', '?', '…')):
             # Merge
-            buffer[-1] = SRTSegment(
-                idx=prev.idx,
-                start=prev.start,
+            buffer = SRTSegment(
+                idx=buffer.idx,
+                start=buffer.start,
                 end=seg.end,
-                text=prev.text.rstrip() + ' ' + seg.text.lstrip()
+                text=buffer.text.rstrip() + ' ' + seg.text.lstrip()
             )
         else:
-            merged.append(buffer[-1])
-            buffer = [seg]
-    if buffer:
-        merged.append(buffer[-1])
-    return merged
+            yield buffer
+            buffer = seg
+    if buffer is not None:
+        yield buffer
 
-def get_broad_context(text: str) -> str:
+def merge_srt_segments(segments, max_gap=0.5):
+    return list(iter_merged_segments(segments, max_gap))
+
+def get_broad_context(text: str, stop_after: bool = True) -> str:
     # Summarize the movie in 2-3 sentences using the LLM
     prompt = textwrap.dedent(f"""
         Summarize in 2-3 sentences what this movie is about based on the subtitles provided.
@@ -95,7 +101,8 @@ def get_broad_context(text: str) -> str:
         Summary:
     """)
     context =  ollama.call_api(prompt)
-    ollama.stop_all_processes()  # Stop all Ollama processes to free memory
+    if stop_after:
+        ollama.stop_all_processes()  # Stop all Ollama processes to free memory
     return context.strip()
 
 def get_context_segments(segments: List[SRTSegment], idx: int, window: float = 7.0) -> Tuple[List[SRTSegment], SRTSegment, List[SRTSegment]]:
@@ -117,6 +124,36 @@ def get_context_segments(segments: List[SRTSegment], idx: int, window: float = 7
             break
     return before, target, after
 
+def correction_prompt(before: List[SRTSegment], target: SRTSegment, after: List[SRTSegment], broad_context: str, language: str = "polish") -> str:
+    """Build the LLM prompt that corrects `target` using its surrounding segments and the video summary."""
+
+    system_prompt = textwrap.dedent(f"""
+        You are a subtitle corrector. Your only task is to minimally correct grammar, spelling, or clarity issues in the provided subtitle line, or align it to fit the surrounding context if necessary.
+        Do not rewrite, embellish, or add creative language. Do not change the meaning or style. Do not add or remove information.
+        If the line is already clear and grammatically correct, return it unchanged.
+        All sentences must be grammatically correct and natural in the {language} language.
+        Do not include any reasoning or analysis in your response. Only provide the corrected line without any additions.
+    """)
+    summary_prompt = f"Video summary is: {broad_context}"
+    before_text = ' '.join([s.text for s in before])
+    after_text = ' '.join([s.text for s in after])
+
+    return textwrap.dedent(f"""
+        {system_prompt}
+        {summary_prompt}
+
+        Context before: {before_text}
+        Line to correct: {target.text}
+        Context after: {after_text}
+    """)
+
+def write_srt_segments(output_srt: str, segments) -> str:
+    """Write (idx, start, end, text) tuples with times in seconds to an SRT file."""
+    with open(output_srt, 'w', encoding='utf-8') as f:
+        for idx, start, end, text in segments:
+            f.write(f"{idx}\n{seconds_to_srt_time(start)} --> {seconds_to_srt_time(end)}\n{text}\n\n")
+    return output_srt
+
 def extend_w_llm(input_srt: str, output_srt: str | None = None, window: float = 7.0, language: str = "polish") -> str:
 
     # If output_srt is None, use input file name with 'llm_extended_' prefix
@@ -129,28 +166,9 @@ def extend_w_llm(input_srt: str, output_srt: str | None = None, window: float =
     broad_context = get_broad_context(segments)
     fixed_segments = []
 
-    system_prompt = textwrap.dedent(f"""
-        You are a subtitle corrector. Your only task is to minimally correct grammar, spelling, or clarity issues in the provided subtitle line, or align it to fit the surrounding context if necessary.
-        Do not rewrite, embellish, or add creative language. Do not change the meaning or style. Do not add or remove information.
-        If the line is already clear and grammatically correct, return it unchanged.
-        All sentences must be grammatically correct and natural in the {language} language.
-        Do not include any reasoning or analysis in your response. Only provide the corrected line without any additions.
-    """)
-    summary_prompt = f"Video summary is: {broad_context}"
-
     for idx, seg in enumerate(segments):
         before, target, after = get_context_segments(segments, idx, window)
-        before_text = ' '.join([s.text for s in before])
-        after_text = ' '.join([s.text for s in after])
-
-        prompt = textwrap.dedent(f"""
-            {system_prompt}
-            {summary_prompt}
-
-            Context before: {before_text}
-            Line to correct: {target.text}
-            Context after: {after_text}
-        """)
+        prompt = correction_prompt(before, target, after, broad_context, language)
 
         change_proposal = ollama.call_api(prompt)
 
@@ -163,8 +181,4 @@ def extend_w_llm(input_srt: str, output_srt: str | None = None, window: float =
         fixed_segments.append((target.idx, target.start, target.end, change_proposal))
 
     # Write fixed SRT
-    with open(output_srt, 'w', encoding='utf-8') as f:
-        for idx, start, end, text in fixed_segments:
-            f.write(f"{idx}\n{seconds_to_srt_time(start)} --> {seconds_to_srt_time(end)}\n{text}\n\n")
-
-    return output_srt
\ No newline at end of file
+    return write_srt_segments(output_srt, fixed_segments)
\ No newline at end of file
@@ -0,0 +1,263 @@
+import os
+import csv
+import json
+import time
+import random
+import hashlib
+import argparse
+import itertools
+from dataclasses import dataclass, field, asdict
+
+from av_preprocessing import preprocess_w_pipeline
+from transcribe import Transcription, ExecutorPool
+from instrumentation import span
+from metrics import RequestMetrics, collect
+from scoring import Reference, SCORE_COLUMNS
+
+# Transcription arguments a sweep may vary, everything else is fixed for the whole sweep
+TRIAL_PARAMS = ("preprocess_pipeline", "model_name", "whisper_implementation", "whisper_params")
+RESULT_COLUMNS = ["trial", "status", "preprocess_key", "model_key", "srt", "segments", "seconds", "preprocess_s", "model_load_s", "inference_s",
+                  *SCORE_COLUMNS, "params", "error"]
+
+
+def _set_path(params: dict, path: str, value):
+    """ Sets a dotted key, e.g. "whisper_params.asr.beam_size", creating the nested dicts on the way."""
+    *parents, last = path.split(".")
+    for key in parents:
+        params = params.setdefault(key, {})
+    params[last] = value
+
+
+def _merge(base: dict, overrides: dict) -> dict:
+    merged = dict(base)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            value = _merge(merged[key], value)
+        merged[key] = value
+    return merged
+
+
+def grid(space: dict[str, list]) -> list[dict]:
+    """
+    All the combinations of the values in `space` (dotted keys into the Transcription arguments).
+
+    Example:
+        grid({"whisper_params.asr.beam_size": [1, 5], "preprocess_pipeline": [PIPELINE_A, PIPELINE_B]})  # 4 trials
+    """
+    keys = list(space)
+    trials = []
+    for values in itertools.product(*(space[k] for k in keys)):
+        params = {}
+        for key, value in zip(keys, values):
+            _set_path(params, key, value)
+        trials.append(params)
+    return trials
+
+
+def random_search(space: dict[str, list], n: int, seed: int | None = None) -> list[dict]:
+    """ `n` distinct random combinations of the values in `space` (all of them if there are fewer), reproducible with `seed`."""
+    rng = random.Random(seed)
+    total = 1
+    for values in space.values():
+        total *= len(values)
+    trials, seen = [], set()
+    while len(trials) < min(n, total):
+        params = {}
+        for key, values in space.items():
+            _set_path(params, key, rng.choice(values))
+        key = json.dumps(params, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            trials.append(params)
+    return trials
+
+
+def _digest(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class Trial:
+    """One combination of parameters and what its transcription gave."""
+    id: int
+    params: dict
+    preprocess_key: str = ""
+    model_key: str = ""
+    status: str = "pending"  # pending, done, failed
+    srt: str | None = None
+    segments: int = 0
+    seconds: float = 0.0
+    timings: dict = field(default_factory=dict)
+    scores: dict = field(default_factory=dict)
+    error: str | None = None
+
+    def row(self) -> dict:
+        return {
+            "trial": self.id,
+            "status": self.status,
+            "preprocess_key": self.preprocess_key,
+            "model_key": self.model_key,
+            "srt": self.srt,
+            "segments": self.segments,
+            "seconds": round(self.seconds, 3),
+            "preprocess_s": round(self.timings.get("preprocess_pipeline", 0.0), 3),
+            "model_load_s": round(self.timings.get("model_load", 0.0), 3),
+            "inference_s": round(self.timings.get("inference", 0.0), 3),
+            **{k: self.scores.get(k) for k in SCORE_COLUMNS},
+            "params": json.dumps({k: self.params[k] for k in TRIAL_PARAMS if k in self.params}, ensure_ascii=False, sort_keys=True),
+            "error": self.error,
+        }
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class Sweep:
+    """
+    Runs many transcriptions of one file with different preprocessing and Whisper parameters and collects them into one table.
+
+    The trials are grouped so the expensive work is done once per group instead of once per trial:
+        - preprocessing: trials with the same `preprocess_pipeline` share its output, which is made once (and reused by later
+          sweeps through the pipeline checksums); the decoded audio is shared through the `.npy` cache in <output_dir>/audio_cache,
+        - model: trials run ordered by model and load-time options, back to back on a warm executor from an `ExecutorPool`,
+          so each model is loaded once. For WhisperX the asr (decoding) options are swapped on the loaded pipeline
+          (`WhisperxExecutor.set_asr_options`) instead of being part of the model key.
+
+    Each trial's SRT is saved as <output_dir>/trial_<id>.srt; the params, timings and status of all the trials go to
+    <output_dir>/results.csv and results.json, rewritten after every trial, so an interrupted sweep keeps what it did.
+    With a `reference_srt` every trial is also scored against it (WER, CER, repetitions, phantom cues, timing, see
+    `scoring.Reference.score`) and `ranking()` orders the trials from the best.
+
+    Args:
+        input_file (str): The media file transcribed by every trial.
+        trials (list[dict]): Parameters of each trial (see `grid` and `random_search`), merged into `base_params`.
+        output_dir (str): Where the SRT files and the results table are written.
+        base_params (dict | None): Transcription arguments common to all the trials (e.g. external_vad_params, cpu_profile).
+        reference_srt (str | None): Ground truth subtitles of `input_file` to score the trials with.
+
+    Example:
+        trials = grid({"whisper_params.asr.beam_size": [1, 5], "whisper_params.asr.temperatures": [[0.0], [0.0, 0.2, 0.4]]})
+        sweep = Sweep("lecture.mp4", trials, "Wideo/test-sweep", base_params={"whisper_implementation": "whisperx", "model_name": "large-v2",
+                      "whisper_params": {"language": "pl"}, "preprocess_pipeline": [("normalize.ffmpeg", {"presets": ["mono16k"]})]})
+        results = sweep.run()
+    """
+
+    def __init__(self, input_file: str, trials: list[dict], output_dir: str, base_params: dict | None = None, reference_srt: str | None = None):
+        self.input_file = input_file
+        self.reference = Reference(reference_srt) if reference_srt else None
+        self.output_dir = output_dir
+        self.base_params = base_params or {}
+        self.trials = [self._trial(i, _merge(self.base_params, params)) for i, params in enumerate(trials, start=1)]
+        self._variants: dict[str, str] = {}  # preprocess_key -> preprocessed file
+
+    @staticmethod
+    def _trial(trial_id: int, params: dict) -> Trial:
+        params.setdefault("model_name", "large-v2")
+        whisper_params = params.get("whisper_params") or {}
+        if params.get("whisper_implementation") == "whisperx":
+            whisper_params = {k: v for k, v in whisper_params.items() if k != "asr"}
+        model_key = ExecutorPool.key(params.get("whisper_implementation"), params["model_name"], whisper_params)
+        return Trial(trial_id, params, preprocess_key=_digest(params.get("preprocess_pipeline") or []), model_key=_digest(model_key))
+
+    def run(self) -> list[Trial]:
+        """ Runs the pending trials (ordered by model, then by preprocessing) and returns all of them in their original order."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        pool = ExecutorPool(size=1, cpu_profile=self.base_params.get("cpu_profile"))
+        pending = sorted((t for t in self.trials if t.status != "done"), key=lambda t: (t.model_key, t.preprocess_key))
+        print(f"[Sweep] {len(pending)} trials, {len({t.preprocess_key for t in pending})} audio variants, {len({t.model_key for t in pending})} models")
+
+        try:
+            for n, trial in enumerate(pending, start=1):
+                print(f"[Sweep] Trial {trial.id} ({n}/{len(pending)})")
+                try:
+                    self._run_trial(trial, pool)
+                    trial.status = "done"
+                    if self.reference:
+                        trial.scores = self.reference.score(trial.srt)
+                except Exception as e:
+                    trial.status, trial.error = "failed", f"{type(e).__name__}: {e}"
+                    print(f"[Sweep] Trial {trial.id} failed: {trial.error}")
+                self.save_results()
+        finally:
+            pool.clear()
+        return self.trials
+
+    def _variant(self, pipeline) -> str:
+        """ The input preprocessed with `pipeline`, made once per sweep."""
+        key = _digest(pipeline or [])
+        if key not in self._variants:
+            self._variants[key] = preprocess_w_pipeline(self.input_file, pipeline, True, {}) if pipeline else self.input_file
+        return self._variants[key]
+
+    def _run_trial(self, trial: Trial, pool: ExecutorPool):
+        params = dict(trial.params)
+        implementation = params.pop("whisper_implementation", None)
+        model_name = params.pop("model_name")
+        whisper_params = params.pop("whisper_params", None) or {}
+        pipeline = params.pop("preprocess_pipeline", None)
+        params.setdefault("audio_cache_dir", os.path.join(self.output_dir, "audio_cache"))
+        trial.srt = os.path.join(self.output_dir, f"trial_{trial.id}.srt")
+
+        load_params = whisper_params
+        if implementation == "whisperx":
+            load_params = {k: v for k, v in whisper_params.items() if k != "asr"}
+
+        metrics = RequestMetrics()
+        start = time.perf_counter()
+        with collect(metrics), span("sweep.trial", trial=trial.id):
+            processed = self._variant(pipeline)
+            with pool.executor(implementation, model_name, load_params, params.get("cpu_profile")) as executor:
+                if implementation == "whisperx":
+                    # raises for options that need a fresh model: the trial fails instead of loading a second model next to the pooled one
+                    executor.set_asr_options(whisper_params.get("asr"))
+                transcription = Transcription(processed, output_srt=trial.srt, model_name=model_name, whisper_params=whisper_params,
+                                              whisper_implementation=implementation, whisper_executor=executor, **params)
+            transcription.write_srt()
+        trial.seconds = time.perf_counter() - start
+        trial.timings = dict(metrics.timings)
+        trial.segments = len(transcription.segments)
+
+    def ranking(self, by: tuple[str, ...] = ("wer", "repeat_rate", "silent_cues")) -> list[Trial]:
+        """ The scored trials, best first, ordered by the `by` scores in order of importance."""
+        return sorted((t for t in self.trials if t.scores), key=lambda t: tuple(t.scores[k] for k in by))
+
+    def save_results(self):
+        rows = [trial.row() for trial in self.trials]
+        tmp_path = os.path.join(self.output_dir, "results.csv.tmp")
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(tmp_path, os.path.join(self.output_dir, "results.csv"))
+
+        tmp_path = os.path.join(self.output_dir, "results.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"input_file": self.input_file, "trials": [trial.to_dict() for trial in self.trials]}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, os.path.join(self.output_dir, "results.json"))
+
+
+def load_spec(path: str) -> tuple[dict, dict]:
+    """ Reads a sweep spec: {"base": {Transcription arguments}, "space": {dotted key: [values]}}; pipelines may be lists of [name, params]."""
+    with open(path, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    return spec.get("base", {}), spec["space"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transcribe one file with many parameter combinations and collect the results.")
+    parser.add_argument("input_file")
+    parser.add_argument("spec", help="JSON file with the fixed arguments (\"base\") and the values to try (\"space\")")
+    parser.add_argument("--output-dir", default=None, help="Default: sweep-<date>-<time> next to the input file")
+    parser.add_argument("--random", type=int, default=None, metavar="N", help="Try N random combinations instead of the full grid")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--reference", default=None, help="Reference SRT to score and rank the trials with")
+    args = parser.parse_args()
+
+    base, space = load_spec(args.spec)
+    trials = random_search(space, args.random, args.seed) if args.random else grid(space)
+    output_dir = args.output_dir or os.path.join(os.path.dirname(os.path.abspath(args.input_file)), time.strftime("sweep-%Y%m%d-%H%M%S"))
+    sweep = Sweep(args.input_file, trials, output_dir, base_params=base, reference_srt=args.reference)
+    sweep.run()
+    for trial in sweep.ranking()[:10]:
+        print(f"[Sweep] #{trial.id}: WER {trial.scores['wer']:.3f}, CER {trial.scores['cer']:.3f}, {trial.seconds:.1f}s  {trial.row()['params']}")
+    print(f"[Sweep] Results saved to: {os.path.join(output_dir, 'results.csv')}")
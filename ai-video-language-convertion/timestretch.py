@@ -0,0 +1,144 @@
+import os
+import json
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict
+import numpy as np
+import soundfile as sf
+
+
+def wsola(audio: np.ndarray, rate: float, sample_rate: int, frame_ms: float = 40.0, tolerance_ms: float = 10.0) -> np.ndarray:
+    """
+    Time-stretches audio without changing its pitch (Waveform Similarity Overlap-Add).
+
+    Frames of `frame_ms` are taken every `rate` * hop from the input and overlap-added every hop into the output; each frame
+    is shifted by up to `tolerance_ms` to the position most similar (cross-correlation) to the natural continuation of the
+    previous one, which avoids the phasing of plain OLA and suits speech well.
+
+    Args:
+        audio (np.ndarray): (frames,) or (frames, channels) samples; the alignment is found on the channel mean.
+        rate (float): Speed factor, > 1 shortens the audio (output length = input length / rate).
+
+    Returns:
+        np.ndarray: Stretched float32 audio with the shape layout of the input.
+    """
+    audio = np.asarray(audio, dtype=np.float32)
+    mono_input = audio.ndim == 1
+    if mono_input:
+        audio = audio[:, None]
+
+    n = int(sample_rate * frame_ms / 1000) // 2 * 2
+    hop_out = n // 2
+    hop_in = hop_out * rate
+    tol = int(sample_rate * tolerance_ms / 1000)
+    out_len = int(round(len(audio) / rate))
+    if len(audio) < n or rate == 1.0:
+        return (audio[:, 0] if mono_input else audio).copy()
+
+    padded = np.pad(audio, ((tol, n + tol + hop_out), (0, 0)))
+    guide = padded.mean(axis=1)
+    window = np.hanning(n).astype(np.float32)
+
+    n_frames = int((len(audio) - n) / hop_in) + 2
+    out = np.zeros((n_frames * hop_out + n, audio.shape[1]), dtype=np.float32)
+    weight = np.zeros(len(out), dtype=np.float32)
+
+    pos = tol
+    for k in range(n_frames):
+        nominal = int(k * hop_in) + tol
+        if nominal + tol + n + hop_out > len(padded):
+            break
+        if k > 0:
+            # natural continuation of the previous frame, the candidate around the nominal position matching it best wins
+            target = guide[pos + hop_out:pos + hop_out + n]
+            candidates = guide[nominal - tol:nominal + tol + n]
+            delta = int(np.argmax(np.correlate(candidates, target, mode="valid"))) - tol
+        else:
+            delta = 0
+        pos = nominal + delta
+        out[k * hop_out:k * hop_out + n] += padded[pos:pos + n] * window[:, None]
+        weight[k * hop_out:k * hop_out + n] += window
+
+    out /= np.maximum(weight, 1e-3)[:, None]
+    out = out[:out_len]
+    return out[:, 0] if mono_input else out
+
+
+@dataclass
+class FitResult:
+    """How a clip was fitted into its cue window."""
+    path: str
+    start: float
+    window: float           # seconds available until the next cue
+    duration: float         # original clip length
+    rate: float             # applied speed factor (1.0 = untouched)
+    fitted_duration: float
+    fits: bool              # False: even at max_rate the clip overruns the next cue
+    samples: int = 0        # length of the fitted file
+    sample_rate: int = 0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def fit_clip(path: str, start: float, window: float, max_rate: float = 1.35, min_rate: float = 1.0, tolerance: float = 0.02) -> FitResult:
+    """
+    Speeds a clip up (or slows it down, with `min_rate` < 1) to fit `window` seconds, within [min_rate, max_rate].
+    A stretched clip replaces the file, its original is kept in an `original/` subdirectory and used by later fittings,
+    so fitting the same clips again (e.g. with other bounds) never stretches them twice.
+    """
+    original_path = os.path.join(os.path.dirname(path), "original", os.path.basename(path))
+    audio, sr = sf.read(original_path if os.path.exists(original_path) else path, dtype="float32")
+    duration = len(audio) / sr
+
+    needed = duration / window if window > 0 else float("inf")
+    rate = 1.0
+    if needed > 1.0 + tolerance:
+        rate = min(needed, max_rate)
+    elif needed < min_rate - tolerance:
+        rate = max(needed, min_rate)
+
+    if rate != 1.0 or os.path.exists(original_path):
+        if not os.path.exists(original_path):
+            os.makedirs(os.path.dirname(original_path), exist_ok=True)
+            os.replace(path, original_path)
+        audio = wsola(audio, rate, sr)
+        sf.write(path, audio, sr, subtype=sf.info(original_path).subtype)
+
+    fitted = len(audio) / sr
+    return FitResult(path, start, round(window, 3), round(duration, 3), round(rate, 4), round(fitted, 3), fitted <= window * (1.0 + tolerance),
+                     len(audio), sr)
+
+
+def fit_segments(segments, output_dir: str, max_rate: float = 1.35, min_rate: float = 1.0, gap: float = 0.05, workers: int | None = None,
+                 report_file: str | None = "fit_report.json") -> list[FitResult]:
+    """
+    Fits the synthesized clips (<output_dir>/<start>.wav) to their cues before they are placed on the timeline.
+
+    A clip may last until the next segment starts (minus `gap`), the last one until its own end. Clips running over are sped up
+    with `wsola` up to `max_rate`; those that still don't fit are flagged (`fits` False) and listed, so they can be shortened
+    in the translation or fixed in the editor. Clips are processed in parallel in `workers` processes.
+
+    Returns:
+        list[FitResult]: In the order of `segments`; also saved to <output_dir>/<report_file> unless it's None.
+    """
+    jobs = []
+    for i, seg in enumerate(segments):
+        path = os.path.join(output_dir, f"{seg.start:.3f}.wav")
+        if not os.path.exists(path):
+            continue
+        limit = segments[i + 1].start - gap if i + 1 < len(segments) else seg.end
+        jobs.append((path, seg.start, max(limit - seg.start, 0.0)))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(fit_clip, path, start, window, max_rate, min_rate) for path, start, window in jobs]
+        results = [f.result() for f in futures]
+
+    unfittable = [r for r in results if not r.fits]
+    print(f"[Fit] {sum(r.rate != 1.0 for r in results)} of {len(results)} clips stretched, {len(unfittable)} still don't fit:")
+    for r in unfittable:
+        print(f"  {r.path}: {r.fitted_duration:.2f}s in a {r.window:.2f}s window")
+
+    if report_file:
+        with open(os.path.join(output_dir, report_file), "w") as f:
+            json.dump([r.to_dict() for r in results], f, indent=4)
+    return results
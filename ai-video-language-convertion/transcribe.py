@@ -1,10 +1,20 @@
 import os
-import preprocessors
+import json
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from typing import Any
+from contextlib import contextmanager, ExitStack
+from dataclasses import dataclass, asdict
 import torch
 
-from av_preprocessing import preprocess_w_pipeline
+from av_preprocessing import preprocess_w_pipeline, load_audio, SAMPLE_RATE
+from instrumentation import span
 from srt_processing import seconds_to_srt_time, get_broad_context
+from chunking import plan_chunks, stitch_chunks
+from alignment import align_segments
+from hallucinations import filter_hallucinations, compression_ratio
+from cpu_profile import apply_cpu_profile, worker_core_sets, init_worker_process, set_torch_threads
 
 class Transcription():
     """
@@ -15,13 +25,44 @@ class Transcription():
     Args:
         input_file (str): Path to the input audio or video file to be transcribed.
         output_srt (str | None, optional): Path to the output SRT file. If None, the output will be saved as <input_file>.srt.
-        second_pass (bool, optional): If True, enables a second pass using LLM-based context correction. Default is False.
+        second_pass (bool | str, optional): Enables a second pass with an LLM-made summary of the video as the initial prompt. Default is False.
+            - True or "selective": only the low-confidence segments of the first pass (see `second_pass_thresholds`) are re-decoded
+              with the context prompt and spliced back in, so the GPU time of the second pass is proportional to the doubtful audio only.
+            - "full": the whole preprocessing and transcription is run again with the context prompt.
+        cpu_profile (dict, bool or None, optional): Settings used when no GPU is available, see `cpu_profile.CpuProfile`. None (default)
+            applies the default CPU profile automatically on CPU-only machines (int8 WhisperX, explicit torch/CTranslate2 threads,
+            turbo/distil model instead of a large one), a dict overrides some of its fields, False disables it.
+            The profile and the model actually used are reported in `metadata["device"]`.
+        align (bool or dict, optional): If set, the finished transcript goes through one forced alignment pass (WhisperX wav2vec2
+            models, cached per language) after the second pass and postfilter, and its segments get word timings in `words`, with start/end tightened to the first/last word. A dict may set
+            "language" (default: the transcription language) and "model_name" (custom alignment model). Default is False.
+        adaptive (bool or dict, optional): Adaptive model selection. A small probe model detects the language on the first 30 s and
+            transcribes every decoded unit (the whole file or a VAD segment) first. Units with (almost) no speech are skipped, and only
+            the low-confidence regions of the rest are decoded again with `model_name` and spliced in, the model being loaded on first use,
+            so short or quiet inputs may never load it. A dict overrides the options of `DEFAULT_ADAPTIVE`.
+            Decisions are recorded in `metadata["adaptive"]`. Default is False.
+        executor_pool (ExecutorPool or None, optional): Pool the `adaptive` probe model is checked out of, so it counts against the
+            pool's limit; it needs room for the probe next to the main model. Without it the probe is loaded on its own.
+        postfilter (bool or dict, optional): Cleans the finished transcript of typical hallucinations (see `hallucinations.filter_hallucinations`):
+            repeated lines, n-gram loops, segments with an abnormal compression ratio and text placed in silence (from the external VAD
+            timestamps, or the audio energy without VAD). Suspicious segments are dropped, or kept with their reasons in `flags` when the
+            dict sets "action": "flag"; a dict overrides the options of `hallucinations.DEFAULT_POSTFILTER`. It lets fast decoding
+            settings (no beam search or temperature fallback) be cleaned up afterwards. Counts are recorded in `metadata["postfilter"]`.
+            Not applied by `iter_segments()`. Default is False.
+        second_pass_thresholds (dict or None, optional): Confidence thresholds of the selective second pass, a segment is re-decoded when:
+            - avg_logprob (float): its average log probability is lower (default -0.8),
+            - compression_ratio (float): its text compression ratio is higher (default 2.4),
+            - no_speech_prob (float): its no-speech probability is higher (default 0.6), i.e. the text may be hallucinated.
+            WhisperX doesn't report avg_logprob/no_speech_prob, so with it only the compression ratio is used.
         preprocess_pipeline (list[tuple[str, dict]] or None, optional): List of preprocessing steps to apply before transcription.
             Each step is a tuple of (processor_name, parameters_dict), where:
                 processor_name (str): Name of the preprocessor in the format "module.function", e.g. "normalize.ffmpeg".
                 parameters_dict (dict): Dictionary of keyword arguments for the preprocessor.
             See the "Preprocessors" section in the README for more details and available options.
         skip_preprocessing_if_file_exists (bool, optional): If True, skips adio preprocessing steps if an audio output file already exists. Default is False.
+        audio_cache_dir (str or None, optional): The preprocessed audio is decoded to 16 kHz only once per `Transcription` and the array is
+            shared by all the decoding calls (VAD segments, second pass, any backend). If set, the decoded audio is also cached in this
+            directory as a `.npy` file keyed by the file hash and memory-mapped by later runs and other processes.
         external_vad (callable or None, optional): Optional external Voice Activity Detection function. If provided, it should return a list of timestamp dicts with 'start' and 'end' keys.
         external_vad_params (dict or None, optional): Dictionary of parameters for the external VAD function. May include:
             - Any keyword arguments required by your VAD function.
@@ -29,7 +70,13 @@ class Transcription():
             - align_pipeline (list[tuple[str, dict]], optional): Preprocessing pipeline to align audio for VAD (e.g., resampling).
         model_name (str, optional): Name of the Whisper model to use (e.g., "large-v2", "base", etc.). Default is "large-v2". The device (CUDA or CPU) is detected automatically.
         whisper_params (dict or None, optional): Additional parameters to pass to the Whisper or WhisperX implementation's transcribe method. See below for details.
-        whisper_implementation (str or None, optional): Which backend to use: 'whisper', 'whisperx', or None (auto-detect/default).
+        whisper_implementation (str or None, optional): Which backend to use: 'whisper', 'whisper_chunked', 'whisperx', or None (auto-detect/default).
+            'whisper_chunked' is OpenAI Whisper decoding long audio in parallel chunks, see `ChunkedWhisperExecutor`.
+        run (bool, optional): If True (default), transcription runs right away in the constructor. Set it to False to only configure
+            the object and drive it later with `run()` or `iter_segments()` (e.g. from the streaming pipeline runner).
+        whisper_executor (Executor or None, optional): Already loaded executor to use for the (first) transcription pass instead of
+            loading a new model, e.g. one checked out of an `ExecutorPool`. It has to match `model_name` and the load-time options
+            (`compute_type`, `asr`) of `whisper_params`; the per-call options are passed to it with every call. It's not released afterwards.
 
     Whisper Parameters(by implementation):
         whisper_params (dict):
@@ -44,6 +91,7 @@ class Transcription():
                 initial_prompt (str): Optional text to provide as a prompt for the first window.
                 carry_initial_prompt (bool): If True, `initial_prompt` is prepended to the prompt of each internal `decode()`.
                 hallucination_silence_threshold (float): When word_timestamps is True, skip silent periods longer than this threshold (in seconds).
+                chunking (dict): Only for 'whisper_chunked', see `ChunkedWhisperExecutor`.
             WhisperX-specific options:
                 asr (dict):
                     beam_size (int): Beam search size (default: 5)
@@ -62,13 +110,19 @@ class Transcription():
                 compute_type (str, optional): Computation type ("float16", "int8", default: "float16")
                 print_progress (bool, optional): Print progress during transcription (default: False)
                 compute_type (str, optional): Computation type for WhisperX (e.g., "float16", "int8").
+            Both:
+                threads (int, optional): torch threads (and CTranslate2 threads for WhisperX) when running on CPU.
+                interop_threads (int, optional): torch inter-op threads when running on CPU.
 
     Notes:
         - For a detailed description of available preprocessors and their parameters, see the "Preprocessors" section in the README.
         - The device (CUDA or CPU) is detected automatically.
-        - Use `write_srt()` to save the subtitles to the output SRT file.
+        - Use `write_srt()` to save the subtitles to the output SRT file, `write_json()` to save the segments with their
+          confidence, word timings and the run metadata.
         - WhisperX support requires separate installation (`pip install whisperx`).
-        - Alignment and diarization features have been removed; only transcription is supported.
+        - Diarization is not supported; word-level alignment is optional (`align`).
+        - `segments` holds `TranscribedSegment`s with the timing, text and confidence of each segment; `metadata` describes the run
+          (e.g. how many segments the selective second pass re-decoded).
         - The backend (Whisper or WhisperX) is selected via the `whisper_implementation` argument.
         - All imports for WhisperX are performed inside methods to avoid unnecessary dependencies unless used.
 
@@ -153,25 +207,56 @@ class Transcription():
         second_pass: bool = False,
         preprocess_pipeline=None,
         skip_preprocessing_if_file_exists=False,
+        audio_cache_dir=None,
         external_vad=None,
         external_vad_params=None,
         model_name: str = "large-v2",
         whisper_params= None,
         whisper_implementation: str = None,  # 'whisper' or 'whisperx'
+        run: bool = True,
+        whisper_executor=None,
+        second_pass_thresholds=None,
+        cpu_profile=None,
+        align=False,
+        adaptive=False,
+        postfilter=False,
+        executor_pool=None,
         ):
 
         self.input_file = input_file
         self.output_srt = output_srt
-        self.second_pass = second_pass
+        self.second_pass = "selective" if second_pass is True else second_pass
+        self.second_pass_thresholds = {**DEFAULT_SECOND_PASS_THRESHOLDS, **(second_pass_thresholds or {})}
         self.preprocess_pipeline = preprocess_pipeline or []
         self.skip_preprocessing_if_file_exists = skip_preprocessing_if_file_exists
+        self.audio_cache_dir = audio_cache_dir
+        self._audio = None  # (path, decoded 16 kHz audio)
 
         self.external_vad = external_vad
         self.external_vad_params = external_vad_params or {}
+
+        # on CPU-only machines the model and its options are adjusted to the CPU profile
+        self.model_name, self.whisper_params, self.cpu_profile = apply_cpu_profile(whisper_implementation, model_name, whisper_params or {}, cpu_profile)
+        self.whisper_implementation = whisper_implementation
+        self.whisper_executor = whisper_executor
+        self.align = {} if align is True else align
+        self.detected_language = None
+        self.adaptive = {} if adaptive is True else adaptive
+        self.executor_pool = executor_pool
+        self.postfilter = {} if postfilter is True else postfilter
+        self.speech_timestamps = None  # external VAD output of the last pass
         
         self.data = None
         self.segments = None
         self.description = None
+        self.metadata = {
+            "device": {
+                "device": "cuda" if torch.cuda.is_available() else "cpu",
+                "model_name": self.model_name,
+                "requested_model_name": model_name,
+                "cpu_profile": self.cpu_profile.to_dict() if self.cpu_profile else None,
+            },
+        }
 
         # if path for srt not provided, make it after video file name
         if output_srt is None:
@@ -180,46 +265,235 @@ class Transcription():
         else:
             self.output_srt = output_srt
 
-        # Pick the Whisper executor based on the implementation type
-        whisper_executor = self.set_up_executor(whisper_implementation, model_name, whisper_params.copy())
-        self.segments = self.transcribe(whisper_executor)
-        del whisper_executor  # Clean up executor to free memory
+        if run:
+            self.run()
+
+    def run(self):
+        """ Runs the transcription (and the optional second pass) and stores the result in `self.segments`."""
+        with span("transcription", input=self.input_file, second_pass=self.second_pass):
+            self._run()
+            if self.postfilter is not False:
+                self.filter_hallucinations()
+            self.align_words()
+            return self.segments
+
+    def _run(self):
+        whisper_params = self.whisper_params
+
+        whisper_executor, transcribe_args = self._first_pass_executor()
+        self.segments = self.transcribe(whisper_executor, transcribe_args=transcribe_args)
 
-        if second_pass:
+        if isinstance(whisper_executor, AdaptiveExecutor):
+            self.metadata["adaptive"] = whisper_executor.summary()
+            whisper_executor.close()
+            if not self.second_pass:
+                return self.segments
+            whisper_executor = whisper_executor.main_executor()  # the second pass needs the full model
+
+        if not self.second_pass:
+            return self.segments
+
+        with span("transcription.second_pass", mode=self.second_pass):
             video_context = get_broad_context(self.full_text())
             initial_prompt = f"This video you're transcribing is about: {video_context}. Use this knowledge for accurate transcription, especially for names and key terms."
 
-            if whisper_params.get("asr"):
-                whisper_params["asr"]["initial_prompt"] = initial_prompt
-                whisper_params["asr"]["condition_on_previous_text"] = True
+            prompt = {"initial_prompt": initial_prompt, "condition_on_previous_text": True}
+            cls = executor_class(self.whisper_implementation)
+            _, call_params = cls.split_params(whisper_params)
+            restore_asr = None
+
+            if hasattr(whisper_executor, "set_asr_options"):
+                # WhisperX takes the prompt as a load-time asr option: it is set on the loaded pipeline and restored afterwards,
+                # so the second pass doesn't need a second model
+                asr = whisper_params.get("asr") or {}
+                try:
+                    whisper_executor.set_asr_options({**asr, **prompt})
+                    restore_asr = asr
+                except (TypeError, ValueError) as e:
+                    if whisper_executor is self.whisper_executor:
+                        # the executor isn't ours to release, a second model would be loaded next to it
+                        print(f"[Second pass] Skipped, the prompt can't be set on the shared executor: {e}")
+                        self.metadata["second_pass"] = {"mode": self.second_pass, "skipped": str(e)}
+                        return self.segments
+                    print(f"[Second pass] Reloading the model with the prompt: {e}")
+                    del whisper_executor  # free the first model before loading the new one
+                    whisper_executor = self.set_up_executor(self.whisper_implementation, self.model_name,
+                                                            {**whisper_params, "asr": {**asr, **prompt}})
             else:
-                whisper_params["initial_prompt"] = initial_prompt
-                whisper_params["condition_on_previous_text"] = True
+                # plain Whisper takes the prompt with every call
+                call_params = {**call_params, **prompt}
+
+            try:
+                if self.second_pass == "full":
+                    self.segments = self.transcribe(whisper_executor, skip_preprocessing_if_file_exists=True, transcribe_args=call_params)
+                    self.metadata["second_pass"] = {"mode": "full"}
+                else:
+                    self.segments = self.redecode_low_confidence(whisper_executor, call_params)
+            finally:
+                if restore_asr is not None:
+                    whisper_executor.set_asr_options(restore_asr)
+
+        return self.segments
+
+    def filter_hallucinations(self):
+        """ Applies the `postfilter` to `self.segments` (see `hallucinations.filter_hallucinations`)."""
+        with span("postfilter", segments=len(self.segments)):
+            audio = self.audio() if self.speech_timestamps is None else None
+            self.segments, self.metadata["postfilter"] = filter_hallucinations(
+                self.segments, speech=self.speech_timestamps, audio=audio, sample_rate=SAMPLE_RATE, options=self.postfilter)
+        return self.segments
+
+    def is_low_confidence(self, segment) -> bool:
+        """ True if the segment falls below any of the `second_pass_thresholds`."""
+        return is_low_confidence(segment, self.second_pass_thresholds)
+
+    def low_confidence_regions(self, max_gap: float = 1.0, pad: float = 0.5) -> list[tuple[float, float, int, int]]:
+        """ Regions of neighbouring low-confidence segments of `self.segments` to re-decode, see `low_confidence_regions`."""
+        return low_confidence_regions(self.segments, self.second_pass_thresholds, max_gap, pad)
+
+    def redecode_low_confidence(self, whisper_executor, transcribe_args=None):
+        """ Re-decodes only the low-confidence regions of `self.segments` and splices the new segments in their place."""
+
+        transcribe_args = transcribe_args or {}
+        external_vad_preprocess_pipeline = self.external_vad_params.get("preprocess_pipeline") if self.external_vad else None
+
+        regions = self.low_confidence_regions()
+        redecoded_seconds = sum(end - start for start, end, _, _ in regions)
+
+        def redecode(start, end):
+            segment_audio = self._segment_audio(start, end, external_vad_preprocess_pipeline)
+            with span("inference", model=whisper_executor.model_name, audio_seconds=round(end - start, 3), second_pass=True):
+                result = whisper_executor.transcribe(segment_audio, **transcribe_args)
+            return self._segments(result, start)
+
+        segments = splice_regions(self.segments, regions, redecode)
 
-            whisper_executor = self.set_up_executor(whisper_implementation, model_name, whisper_params.copy())
-            self.segments = self.transcribe(whisper_executor, skip_preprocessing_if_file_exists=True)
+        self.metadata["second_pass"] = {
+            "mode": "selective",
+            "thresholds": self.second_pass_thresholds,
+            "low_confidence_segments": sum(last - first + 1 for _, _, first, last in regions),
+            "total_segments": len(self.segments),
+            "regions": len(regions),
+            "redecoded_seconds": round(redecoded_seconds, 3),
+        }
+        print(f"[Second pass] Re-decoded {len(regions)} regions ({redecoded_seconds:.1f}s of audio) out of {len(self.segments)} segments.")
+        return segments
+
+    def audio(self):
+        """ The processed audio decoded to a 16 kHz float32 array, decoded once and reused by all the passes."""
+        if self._audio is None or self._audio[0] != self.processed_audio:
+            self._audio = (self.processed_audio, load_audio(self.processed_audio, self.audio_cache_dir))
+        return self._audio[1]
+
+    def _segment_audio(self, start: float, end: float, preprocess_pipeline=None):
+        """
+        Audio of [start, end] seconds for the executor: a slice of the shared decoded array, or, if the segment has its own
+        preprocessing pipeline (which works on files), a wav file cut out of the processed audio and preprocessed.
+        """
+        if not preprocess_pipeline:
+            return self.audio()[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)]
+
+        cutting_pipeline: list[tuple[Any, dict]] = [
+            ("normalize.ffmpeg", {"custom": ["-ss", str(start), "-to", str(end)], "output_format": "wav"}),
+        ]
+        seg_path = preprocess_w_pipeline(self.processed_audio, cutting_pipeline, False, {})
+        return preprocess_w_pipeline(seg_path, preprocess_pipeline, False, {})
+
+    def iter_segments(self):
+        """
+        Transcribes the input and yields segments as soon as they are decoded.
+
+        With an external VAD the segments come out per VAD chunk, so consumers (LLM correction, translation) can work
+        on the beginning of the movie while the rest is still being transcribed. Without VAD the backend returns the whole
+        file at once. The second pass is not applied here, as it needs the full text up front.
+        All yielded segments are also collected in `self.segments`; with `align` set they get their word timings in place
+        once the last one is decoded.
+        """
+        whisper_executor, transcribe_args = self._first_pass_executor()
+
+        self.segments = []
+        try:
+            for segment in self.iter_transcribe(whisper_executor, transcribe_args=transcribe_args):
+                self.segments.append(segment)
+                yield segment
+            self.align_words()
+        finally:
+            if isinstance(whisper_executor, AdaptiveExecutor):
+                self.metadata["adaptive"] = whisper_executor.summary()
+                whisper_executor.close()
+            del whisper_executor  # Clean up executor to free memory
+
+    def _first_pass_executor(self):
+        """ (executor, transcribe_args) for the first pass: the injected executor, a newly loaded one, or an `AdaptiveExecutor` loading it only when needed."""
+        if self.whisper_executor:
+            load, transcribe_args = (lambda: self.whisper_executor), self._executor_call_args()
+        else:
+            # Pick the Whisper executor based on the implementation type
+            load, transcribe_args = (lambda: self.set_up_executor(self.whisper_implementation, self.model_name, self.whisper_params.copy())), None
+
+        if self.adaptive is False:
+            return load(), transcribe_args
+        # the probe and the full model get the same explicit per-call options (e.g. the detected language added to them)
+        executor = AdaptiveExecutor(load, self.whisper_implementation, self.whisper_params, self.adaptive,
+                                    executor_pool=self.executor_pool)
+        return executor, self._executor_call_args()
+
+    def _segments(self, result, seg_start=0):
+        """ Segments of one decoding result, remembering the language the backend detected for `align_words()`."""
+        if result.get("language") and not self.detected_language:
+            self.detected_language = result["language"]
+        return get_transcribed_segments(result, seg_start)
+
+    def align_words(self):
+        """ Adds word timings to all of `self.segments` in one forced alignment pass (see `alignment.align_segments`)."""
+        if self.align is False or not self.segments:
+            return self.segments
+        language = self.align.get("language") or self.whisper_params.get("language") or self.detected_language
+        model_name = self.align.get("model_name")
+        with span("alignment", language=language):
+            align_segments(self.segments, self.audio(), language, model_name=model_name)
+        self.metadata["alignment"] = {"language": language, "model_name": model_name}
+        return self.segments
+
+    def _executor_call_args(self):
+        """ Per-call part of `whisper_params`, passed explicitly to an injected executor that may have been created for another request."""
+        _, call_params = executor_class(self.whisper_implementation).split_params(self.whisper_params)
+        return call_params
 
     def full_text(self):
-        return " ".join([text for (_, _, text) in self.segments])
+        return " ".join([segment.text for segment in self.segments])
     
     def write_srt(self):
         with open(self.output_srt, "w", encoding="utf-8") as srt_file:
-            for i, (start, end, text) in enumerate(self.segments, start=1):
-                srt_file.write(f"{i}\n{start} --> {end}\n{text}\n\n")
+            for i, segment in enumerate(self.segments, start=1):
+                srt_file.write(f"{i}\n{seconds_to_srt_time(segment.start)} --> {seconds_to_srt_time(segment.end)}\n{segment.text}\n\n")
         print(f"✅ Transcription complete. Subtitles saved to: {self.output_srt}")
 
         return self.output_srt
 
-    def transcribe(self, whisper_executor, skip_preprocessing_if_file_exists=None):
+    def write_json(self, output_json=None):
+        """ Saves the segments (with confidence and word timings) and the run metadata next to the SRT file (<output_srt base>.json)."""
+        if output_json is None:
+            output_json = os.path.splitext(self.output_srt)[0] + ".json"
+        with open(output_json, "w", encoding="utf-8") as f:
+            json.dump({"metadata": self.metadata, "segments": [segment.to_dict() for segment in self.segments]}, f, ensure_ascii=False, indent=2)
+        print(f"Segments saved to: {output_json}")
+        return output_json
+
+    def transcribe(self, whisper_executor, skip_preprocessing_if_file_exists=None, transcribe_args=None):
         """ Transcribes the input audio or video file using the provided Whisper executor."""
+        return list(self.iter_transcribe(whisper_executor, skip_preprocessing_if_file_exists, transcribe_args))
+
+    def iter_transcribe(self, whisper_executor, skip_preprocessing_if_file_exists=None, transcribe_args=None):
+        """ Same as `transcribe`, but yields the segments of each decoded chunk as soon as it is ready."""
+
+        transcribe_args = transcribe_args or {}
 
         if skip_preprocessing_if_file_exists is None:
             skip_preprocessing_if_file_exists = self.skip_preprocessing_if_file_exists
         else:
             skip_preprocessing_if_file_exists = skip_preprocessing_if_file_exists
 
-        segments = []
-
         # run preprocessing pipeline if provided
         if self.preprocess_pipeline:
             self.processed_audio = preprocess_w_pipeline(self.input_file, self.preprocess_pipeline, skip_preprocessing_if_file_exists, {})
@@ -238,31 +512,26 @@ class Transcription():
             # e.g. silero vad requires 16kHz mono audio
             # the reason for a separate process is to use it only to rcognize timestamps and not necessarily affect the audio quality
             # used for the further processing
+            vad_input = self.processed_audio
             if external_vad_align_pipeline:
-                timestamps = self.external_vad(preprocess_w_pipeline(self.processed_audio, external_vad_align_pipeline, self.skip_if_exists, {}), **external_vad_params)
-            else:
-                timestamps = self.external_vad(self.processed_audio, **external_vad_params)
+                vad_input = preprocess_w_pipeline(self.processed_audio, external_vad_align_pipeline, skip_preprocessing_if_file_exists, {})
+            with span("vad", input=vad_input):
+                timestamps = self.external_vad(vad_input, **external_vad_params)
+            self.speech_timestamps = timestamps
 
             for ts in timestamps:
-                # First, we need to cut the audio segment based on the VAD timestamps
-                VAD_CUTTING_PIPELINE: list[tuple[Any, dict]] = [
-                    (preprocessors.normalize.ffmpeg, {"custom": ["-ss", str(ts['start']), "-to", str(ts['end'])], "output_format": "wav"}),
-                ]
-                seg_path = preprocess_w_pipeline(self.processed_audio, VAD_CUTTING_PIPELINE, False, {})
-
-                # Then we can apply any additional preprocessing if provided
-                if external_vad_preprocess_pipeline:
-                    seg_path = preprocess_w_pipeline(seg_path, external_vad_preprocess_pipeline, False, {})
-
-                # Finally transcribe the segment and collect the results
-                result = whisper_executor.transcribe(seg_path)
-                if segments_found := get_transcribed_segments(result, ts['start']):
-                    segments.extend(segments_found)
+                # Cut the audio segment based on the VAD timestamps (applying the additional preprocessing if provided)
+                segment_audio = self._segment_audio(ts['start'], ts['end'], external_vad_preprocess_pipeline)
+
+                # Then transcribe the segment and collect the results
+                with _inference_span(whisper_executor, ts['end'] - ts['start']):
+                    result = whisper_executor.transcribe(segment_audio, **transcribe_args)
+                yield from self._segments(result, ts['start'])
         else:
-            result = whisper_executor.transcribe(self.processed_audio)
-            segments = get_transcribed_segments(result)
-        
-        return segments
+            audio = self.audio()
+            with _inference_span(whisper_executor, len(audio) / SAMPLE_RATE):
+                result = whisper_executor.transcribe(audio, **transcribe_args)
+            yield from self._segments(result)
     
     def set_up_executor(self, whisper_implementation: str | None = None, model_name: str = "large-v2", whisper_params=None):
         """
@@ -270,26 +539,38 @@ class Transcription():
         """
 
         whisper_params = whisper_params or {}
-
-        match whisper_implementation:
-            case "whisperx":
-                return WhisperxExecutor(model_name=model_name, whisper_params=whisper_params)
-            case _:
-                return WhisperExecutor(model_name=model_name, whisper_params=whisper_params)
+        with span("model_load", model=model_name, implementation=whisper_implementation or "whisper"):
+            return executor_class(whisper_implementation)(model_name=model_name, whisper_params=whisper_params)
 
 class Executor():
 
+    # whisper_params keys used when the model is loaded, the others are passed to every transcribe call
+    LOAD_PARAMS: tuple[str, ...] = ("threads", "interop_threads")
+
     def __init__(self, model_name: str = "large-v2", whisper_params=None):
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         self.model_name = model_name
-        self._whisper_params = whisper_params or {}
+        self._whisper_params = dict(whisper_params or {})
+
+        self.threads = self._whisper_params.pop("threads", None)
+        interop_threads = self._whisper_params.pop("interop_threads", None)
+        if self.device == "cpu":
+            set_torch_threads(self.threads, interop_threads)
 
         self.model = self._init_model_implementation()
 
+    @classmethod
+    def split_params(cls, whisper_params):
+        """ Splits whisper_params into (load-time options baked into the model, options passed to every transcribe call)."""
+        call_params = dict(whisper_params or {})
+        load_params = {k: call_params.pop(k) for k in cls.LOAD_PARAMS if k in call_params}
+        return load_params, call_params
+
     def _init_model_implementation(self):
         pass
         
-    def transcribe(self, audio_path, **whisper_params): 
+    def transcribe(self, audio, **whisper_params):
+        """ Transcribes `audio`: a file path or a 16 kHz mono float32 array (see `av_preprocessing.load_audio`)."""
         pass
 
 class WhisperExecutor(Executor):
@@ -298,25 +579,224 @@ class WhisperExecutor(Executor):
         import whisper  # type: ignore
         return whisper.load_model(self.model_name, device=self.device)
 
-    def transcribe(self, audio_path, **whisper_params):
+    def transcribe(self, audio, **whisper_params):
+        args = whisper_params or self._whisper_params
+        return self.model.transcribe(audio, **args)
+
+def _init_chunk_worker(model_name, threads, core_sets):
+    """ Loads the model once per worker process and pins it to its own set of cores."""
+    global _worker_model
+    import whisper  # type: ignore
+
+    init_worker_process(core_sets, threads)
+    _worker_model = whisper.load_model(model_name, device="cpu")
+
+def _transcribe_chunk(audio, whisper_params):
+    result = _worker_model.transcribe(audio, **whisper_params)
+    return [
+        {k: segment[k] for k in ("start", "end", "text", "avg_logprob", "no_speech_prob", "compression_ratio") if k in segment}
+        for segment in result["segments"]
+    ]
+
+class ChunkedWhisperExecutor(WhisperExecutor):
+    """
+    OpenAI Whisper for long audio: the file is split into chunks (see `chunking.plan_chunks`) that are decoded in parallel
+    and stitched back together (`chunking.stitch_chunks`), instead of one sequential pass of 30 s windows.
+
+        - On CPU the chunks go to a pool of worker processes, each with its own model, `threads` torch threads and pinned to
+          its own cores, so the workers don't fight over the same cores.
+        - On GPU the audio is cut into chunks of at most 30 s (one Whisper window) and their mel spectrograms are decoded in
+          batches of `batch_size` with one `whisper.decode` call. As in `whisper.transcribe`, the chunks failing
+          `compression_ratio_threshold` or `logprob_threshold` are decoded again (still batched) at the next `temperature`, and
+          chunks over `no_speech_threshold` are dropped, so both devices give the same transcript for the same params.
+
+    Options go to `whisper_params["chunking"]` (a load-time option, the worker processes are started with the model):
+        chunk_seconds (float): Maximum chunk length. Default 30 on GPU, 120 on CPU.
+        overlap_seconds (float): Overlap of chunks cut in the middle of speech (default 2.0).
+        search_seconds (float): How far before the limit a silence to cut at is looked for (default 5.0).
+        silence_db (float): Frame energy (dB RMS) considered silence (default -40).
+        workers (int): CPU worker processes. Default: cores // threads, each pinned to cores of one NUMA node. Every worker holds a copy of the model in RAM.
+        threads (int): torch threads per CPU worker (default 4).
+        batch_size (int): Chunks decoded at once on GPU (default 8).
+
+    Example:
+        Transcription(movie_file, whisper_implementation="whisper_chunked", model_name="small",
+                      whisper_params={"language": "pl", "chunking": {"chunk_seconds": 120, "threads": 4}})
+    """
+
+    LOAD_PARAMS = ("chunking", "threads", "interop_threads")
+
+    def _init_model_implementation(self):
+        self.chunking = dict(self._whisper_params.pop("chunking", {}))
+        self.chunking.setdefault("chunk_seconds", 30.0 if self.device == "cuda" else 120.0)
+        if self.device == "cuda":
+            self.chunking["chunk_seconds"] = min(self.chunking["chunk_seconds"], 30.0)  # one chunk has to fit into one mel window
+            return super()._init_model_implementation()
+
+        threads = self.chunking.get("threads", 4)
+        core_sets = worker_core_sets(threads, self.chunking.get("workers"))
+        workers = self.chunking.get("workers") or len(core_sets)
+
+        ctx = multiprocessing.get_context("spawn")
+        core_sets_queue = ctx.Queue()
+        for i in range(workers):
+            core_sets_queue.put(core_sets[i] if i < len(core_sets) else None)  # more workers than cores: not pinned
+        print(f"[ChunkedWhisper] Starting {workers} CPU workers with {threads} threads each")
+        self.pool = ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_chunk_worker, initargs=(self.model_name, threads, core_sets_queue))
+        return None
+
+    def transcribe(self, audio, **whisper_params):
         args = whisper_params or self._whisper_params
-        return self.model.transcribe(audio_path, **args)
+        if isinstance(audio, str):
+            audio = load_audio(audio)
+        chunk_args = {k: v for k, v in self.chunking.items() if k in ("chunk_seconds", "overlap_seconds", "search_seconds", "silence_db")}
+        chunks = plan_chunks(audio, **chunk_args)
+        print(f"[ChunkedWhisper] {len(audio) / SAMPLE_RATE:.1f}s of audio in {len(chunks)} chunks")
+
+        if self.model is None:
+            futures = [self.pool.submit(_transcribe_chunk, audio[start:end], args) for start, end in chunks]
+            chunk_segments = [f.result() for f in futures]
+        else:
+            chunk_segments = []
+            batch_size = self.chunking.get("batch_size", 8)
+            for i in range(0, len(chunks), batch_size):
+                chunk_segments.extend(self._decode_batch([audio[start:end] for start, end in chunks[i:i + batch_size]], args))
+
+        chunk_results = []
+        for (start, end), segments in zip(chunks, chunk_segments):
+            offset = start / SAMPLE_RATE
+            chunk_results.append((offset, end / SAMPLE_RATE, [dict(s, start=s["start"] + offset, end=s["end"] + offset) for s in segments]))
+        segments = stitch_chunks(chunk_results)
+        return {"text": " ".join(s["text"].strip() for s in segments), "segments": segments}
+
+    def _decode_batch(self, audios, args):
+        """ Decodes up to 30 s chunks at once, returns the segments of each chunk (times relative to the chunk)."""
+        import whisper  # type: ignore
+        from whisper.tokenizer import get_tokenizer  # type: ignore
+
+        mel = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.tensor(audio)), self.model.dims.n_mels) for audio in audios
+        ]).to(self.model.device)
+
+        temperatures = args.get("temperature", WHISPER_TEMPERATURES)
+        temperatures = list(temperatures) if isinstance(temperatures, (list, tuple)) else [temperatures]
+        thresholds = (
+            args.get("compression_ratio_threshold", 2.4),
+            args.get("logprob_threshold", -1.0),
+            args.get("no_speech_threshold", 0.6),
+        )
+
+        # same fallback as whisper.transcribe: chunks decoded too repetitive or too unlikely are decoded again at the next temperature
+        results = [None] * len(audios)
+        pending = list(range(len(audios)))
+        for temperature in temperatures:
+            options = _decoding_options(whisper, args, temperature)
+            for i, result in zip(pending, whisper.decode(self.model, mel[pending], options)):
+                results[i] = result
+            pending = [i for i in pending if _needs_fallback(results[i], *thresholds)]
+            if not pending:
+                break
+
+        chunk_segments = []
+        for audio, result in zip(audios, results):
+            if _is_silence(result, *thresholds[1:]):
+                chunk_segments.append([])  # dropped like whisper.transcribe drops no-speech windows
+                continue
+            tokenizer = get_tokenizer(self.model.is_multilingual, num_languages=self.model.num_languages, language=result.language, task=options.task)
+            segments = _segments_from_tokens(result.tokens, tokenizer, len(audio) / SAMPLE_RATE)
+            for segment in segments:
+                segment.update(avg_logprob=result.avg_logprob, no_speech_prob=result.no_speech_prob, compression_ratio=result.compression_ratio)
+            chunk_segments.append(segments)
+        return chunk_segments
+
+    def __del__(self):
+        if getattr(self, "pool", None):
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+WHISPER_TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)  # whisper.transcribe's default fallback temperatures
+
+def _decoding_options(whisper, args: dict, temperature: float):
+    """ DecodingOptions for one temperature, as whisper.transcribe builds them: beam search (with patience) when greedy, best_of when sampling."""
+    beam_size = args.get("beam_size") if temperature == 0 else None
+    return whisper.DecodingOptions(
+        task=args.get("task", "transcribe"),
+        language=args.get("language"),
+        temperature=temperature,
+        beam_size=beam_size,
+        best_of=args.get("best_of") if temperature > 0 else None,
+        patience=args.get("patience") if beam_size is not None else None,  # DecodingOptions rejects patience without a beam size
+        prompt=args.get("initial_prompt"),
+        fp16=args.get("fp16", True),
+    )
+
+def _needs_fallback(result, compression_ratio_threshold, logprob_threshold, no_speech_threshold) -> bool:
+    """ Whether whisper.transcribe would decode the window again at a higher temperature."""
+    if _is_silence(result, logprob_threshold, no_speech_threshold):
+        return False
+    return (
+        (compression_ratio_threshold is not None and result.compression_ratio > compression_ratio_threshold)
+        or (logprob_threshold is not None and result.avg_logprob < logprob_threshold)
+    )
+
+def _is_silence(result, logprob_threshold, no_speech_threshold) -> bool:
+    """ A window whisper.transcribe skips: likely no speech and not confidently decoded."""
+    if no_speech_threshold is None or result.no_speech_prob <= no_speech_threshold:
+        return False
+    return logprob_threshold is None or result.avg_logprob <= logprob_threshold
+
+def _segments_from_tokens(tokens, tokenizer, duration):
+    """ Splits decoded tokens into segments at the timestamp token pairs (<|0.00|> text <|2.40|><|2.40|> text ...)."""
+    segments = []
+    start, text_tokens = None, []
+    for token in tokens:
+        if token >= tokenizer.timestamp_begin:
+            t = (token - tokenizer.timestamp_begin) * 0.02
+            if start is not None and text_tokens:
+                segments.append({"start": start, "end": t, "text": tokenizer.decode(text_tokens)})
+                start, text_tokens = None, []
+            else:
+                start = t
+        else:
+            text_tokens.append(token)
+    if text_tokens:
+        # no closing timestamp: the text runs to the end of the chunk
+        segments.append({"start": start or 0.0, "end": duration, "text": tokenizer.decode(text_tokens)})
+    return segments
 
 class WhisperxExecutor(Executor):
 
+    LOAD_PARAMS = ("compute_type", "asr", "threads", "interop_threads")
+
     def _init_model_implementation(self):
         import whisperx  # type: ignore
         self.load_audio = whisperx.load_audio  # type: ignore
         return whisperx.load_model(
             self.model_name,
             self.device,
-            compute_type=self._whisper_params.pop("compute_type", "float16"),
-            asr_options=self._whisper_params.pop("asr", {})
+            compute_type=self._whisper_params.pop("compute_type", "float16" if self.device == "cuda" else "int8"),
+            asr_options=self._whisper_params.pop("asr", {}),
+            threads=self.threads or 4,
         )
 
-    def transcribe(self, audio_path, **whisper_params):
+    def set_asr_options(self, asr=None):
+        """
+        Replaces the decoding (asr) options of the loaded pipeline, starting from the ones it was loaded with, so runs differing
+        only in them (beam size, temperatures, prompt...) reuse the model instead of loading it again (see `sweep`).
+        Raises TypeError or ValueError for an option the pipeline doesn't know.
+        """
+        from dataclasses import is_dataclass, replace
+        if not hasattr(self, "_loaded_asr"):
+            self._loaded_asr = (self.model.options, getattr(self.model, "suppress_numerals", False))
+        options, suppress_numerals = self._loaded_asr
+        asr = dict(asr or {})
+        self.model.suppress_numerals = asr.pop("suppress_numerals", suppress_numerals)
+        # TranscriptionOptions is a NamedTuple in older faster-whisper releases and a dataclass in newer ones
+        self.model.options = replace(options, **asr) if is_dataclass(options) else options._replace(**asr)
+
+    def transcribe(self, audio, **whisper_params):
         args = whisper_params or self._whisper_params
-        audio = self.load_audio(audio_path)
+        if isinstance(audio, str):
+            audio = self.load_audio(audio)
         return self.model.transcribe(audio, **args)
 
     def __del__(self):
@@ -328,11 +808,336 @@ class WhisperxExecutor(Executor):
         if torch.cuda.is_available():
             torch.cuda.empty_cache()
 
+DEFAULT_ADAPTIVE = {
+    "probe_model": "base",          # small model for language ID, speech check and the confident parts
+    "language_seconds": 30.0,       # audio the language is detected on
+    "min_speech_ratio": 0.05,       # units with less speech than this (share of their length) are skipped
+    "no_speech_prob": 0.6,          # probe segments above this no-speech probability don't count as speech
+    "thresholds": {"avg_logprob": -0.5, "compression_ratio": 2.4, "no_speech_prob": 0.6},  # probe output is kept only within all of them
+}
+
+class AdaptiveExecutor():
+    """
+    Executor wrapper choosing the model per region of each decoded unit (see `Transcription(adaptive=...)`).
+
+    The language is detected once, on the first `language_seconds` of the first unit. Each `transcribe` call then runs the probe
+    model and either:
+        - skip: the probe found (almost) no speech, an empty result is returned,
+        - probe: every probe segment is within the confidence `thresholds`, the probe result is returned,
+        - escalate: the low-confidence regions of the probe result (`low_confidence_regions`) are decoded with the full model,
+          loaded with `load_main` on first use, and spliced in place of the probe segments.
+    WhisperX doesn't report avg_logprob, so its probe output can't be judged: units with speech (measured by the probe's segment
+    coverage, like for Whisper) are escalated whole, only the silent ones are skipped.
+
+    Args:
+        load_main (callable): Returns the full executor (called at most once).
+        whisper_implementation (str | None): Backend of the probe, the same as of the full model ("whisper_chunked" probes with plain Whisper).
+        whisper_params (dict): Transcription options; the load-time ones (compute_type, threads) are used for the probe too.
+        options (dict | None): Overrides of `DEFAULT_ADAPTIVE`.
+        executor_pool (ExecutorPool | None): Pool to check the probe out of (returned by `close()`), else it is loaded directly.
+    """
+
+    def __init__(self, load_main, whisper_implementation: str | None, whisper_params=None, options=None, executor_pool=None):
+        self.options = {**DEFAULT_ADAPTIVE, **(options or {})}
+        self._load_main = load_main
+        self._main = None
+        self._probe = None
+        self._leases = ExitStack()
+        self.language = None
+        self.decisions: list[dict] = []
+
+        self.implementation = "whisperx" if whisper_implementation == "whisperx" else None
+        self.confidence_reported = self.implementation != "whisperx"
+        load_params, _ = executor_class(self.implementation).split_params(whisper_params)
+        load_params.pop("asr", None)  # prompts and decoding options of the full model
+        self._probe_params = load_params
+        self._pool = executor_pool
+        self.model_name = self.options["probe_model"]
+
+    @property
+    def probe(self):
+        """ The probe executor, checked out of the pool or loaded on first use."""
+        if self._probe is None:
+            if self._pool is not None:
+                # the CPU profile is already applied to the params, the pool mustn't apply it again
+                lease = self._pool.executor(self.implementation, self.model_name, self._probe_params, cpu_profile=False)
+                self._probe = self._leases.enter_context(lease)
+            else:
+                with span("model_load", model=self.model_name, implementation=self.implementation or "whisper", probe=True):
+                    self._probe = executor_class(self.implementation)(model_name=self.model_name, whisper_params=self._probe_params)
+        return self._probe
+
+    def main_executor(self):
+        if self._main is None:
+            self._main = self._load_main()
+        return self._main
+
+    def close(self):
+        """ Returns the probe to the pool (or drops it)."""
+        self._leases.close()
+        self._probe = None
+
+    def detect_language(self, audio, **whisper_params) -> str | None:
+        if self.language is None:
+            head = audio[:int(self.options["language_seconds"] * SAMPLE_RATE)]
+            with span("inference.language", model=self.model_name, audio_seconds=round(len(head) / SAMPLE_RATE, 3)):
+                self.language = self.probe.transcribe(head, **whisper_params).get("language")
+        return self.language
+
+    def transcribe(self, audio, **whisper_params):
+        if isinstance(audio, str):
+            audio = load_audio(audio)
+        duration = len(audio) / SAMPLE_RATE
+
+        args = dict(whisper_params)
+        if not args.get("language"):
+            args["language"] = self.detect_language(audio, **args)  # detected once, the following units don't detect it again
+
+        with span("inference.probe", model=self.model_name, audio_seconds=round(duration, 3)):
+            result = self.probe.transcribe(audio, **args)
+
+        segments = get_transcribed_segments(result)
+        speech = sum(
+            s.end - s.start for s in segments
+            if s.text and (s.no_speech_prob is None or s.no_speech_prob <= self.options["no_speech_prob"])
+        )
+        speech_ratio = min(1.0, speech / duration) if duration else 0.0
+
+        escalated_seconds = 0.0
+        if speech_ratio < self.options["min_speech_ratio"]:
+            action, reason = "skip", "no speech"
+            result = {"text": "", "segments": [], "language": args["language"]}
+        elif not self.confidence_reported:
+            action, reason = "escalate", "confidence not reported"
+            main = self.main_executor()
+            with span("inference.escalated", model=main.model_name, audio_seconds=round(duration, 3)):
+                result = main.transcribe(audio, **args)
+            escalated_seconds = duration
+        else:
+            regions = low_confidence_regions(segments, self.options["thresholds"], pad=0.5, end=duration)
+            if regions:
+                action, reason = "escalate", "low confidence"
+                result = self._escalate(audio, result, regions, args)
+                escalated_seconds = sum(end - start for start, end, _, _ in regions)
+            else:
+                action, reason = "probe", "confident"
+
+        self.decisions.append({
+            "audio_seconds": round(duration, 3),
+            "speech_ratio": round(speech_ratio, 3),
+            "escalated_seconds": round(escalated_seconds, 3),
+            "action": action,
+            "reason": reason,
+        })
+        return result
+
+    def _escalate(self, audio, probe_result: dict, regions, args: dict) -> dict:
+        """ The probe result with the segments of the `regions` replaced by the full model's decoding of their audio."""
+        main = self.main_executor()
+
+        def redecode(start, end):
+            with span("inference.escalated", model=main.model_name, audio_seconds=round(end - start, 3)):
+                result = main.transcribe(audio[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)], **args)
+            return [_shift_segment(segment, start) for segment in result["segments"]]
+
+        segments = splice_regions(probe_result["segments"], regions, redecode)
+        return {**probe_result, "segments": segments, "text": " ".join(segment["text"].strip() for segment in segments)}
+
+    def summary(self) -> dict:
+        actions = [d["action"] for d in self.decisions]
+        return {
+            "probe_model": self.model_name,
+            "language": self.language,
+            "main_model_loaded": self._main is not None,
+            "units": {action: actions.count(action) for action in ("skip", "probe", "escalate")},
+            "escalated_seconds": round(sum(d["escalated_seconds"] for d in self.decisions), 3),
+            "decisions": self.decisions,
+        }
+
+def _shift_segment(segment: dict, offset: float) -> dict:
+    """ A decoded segment (and its word timings) moved by `offset` seconds."""
+    shifted = {**segment, "start": segment["start"] + offset, "end": segment["end"] + offset}
+    if segment.get("words"):
+        shifted["words"] = [
+            {**word, **{key: word[key] + offset for key in ("start", "end") if word.get(key) is not None}}
+            for word in segment["words"]
+        ]
+    return shifted
+
+def executor_class(whisper_implementation: str | None):
+    """ Maps the `whisper_implementation` name to its executor class."""
+    match whisper_implementation:
+        case "whisperx":
+            return WhisperxExecutor
+        case "whisper_chunked":
+            return ChunkedWhisperExecutor
+        case _:
+            return WhisperExecutor
+
+class ExecutorPool():
+    """
+    Keeps loaded (warm) Whisper executors to share them between transcriptions.
+
+    At most `size` executors are kept at once. Executors are matched by implementation, model and load-time options, so
+    transcriptions differing only in per-call options (language, temperature, batch_size...) reuse the same model. When the pool
+    is full and no matching executor is idle, an idle one with other options is dropped to make room, otherwise the caller waits.
+    On CPU-only machines the model and options are adjusted with the CPU profile (`cpu_profile` of the pool or of the call)
+    the same way `Transcription` does it.
+
+    Example:
+        pool = ExecutorPool(size=1)
+        with pool.executor("whisperx", "large-v2", whisper_params) as executor:
+            Transcription(movie_file, whisper_implementation="whisperx", whisper_params=whisper_params, whisper_executor=executor)
+    """
+
+    def __init__(self, size: int = 1, cpu_profile=None):
+        self.size = size
+        self.cpu_profile = cpu_profile
+        self._idle: dict[str, list] = {}
+        self._count = 0
+        self._cond = threading.Condition()
+
+    @staticmethod
+    def key(whisper_implementation: str | None, model_name: str, whisper_params=None) -> str:
+        load_params, _ = executor_class(whisper_implementation).split_params(whisper_params)
+        return json.dumps([whisper_implementation or "whisper", model_name, load_params], sort_keys=True)
+
+    def _evict_idle(self) -> bool:
+        for key, executors in self._idle.items():
+            if executors:
+                executors.pop()
+                self._count -= 1
+                print(f"[ExecutorPool] Releasing idle executor {key}")
+                return True
+        return False
+
+    @contextmanager
+    def executor(self, whisper_implementation: str | None, model_name: str = "large-v2", whisper_params=None, cpu_profile=None):
+        # same adjustment as in Transcription, so the executor matches what the transcription expects
+        cpu_profile = self.cpu_profile if cpu_profile is None else cpu_profile
+        model_name, whisper_params, _ = apply_cpu_profile(whisper_implementation, model_name, whisper_params, cpu_profile)
+        key = self.key(whisper_implementation, model_name, whisper_params)
+        executor = None
+
+        with self._cond:
+            while True:
+                if self._idle.get(key):
+                    executor = self._idle[key].pop()
+                    break
+                if self._count < self.size or self._evict_idle():
+                    self._count += 1
+                    break
+                self._cond.wait()
+
+        if executor is None:
+            try:
+                print(f"[ExecutorPool] Loading executor {key}")
+                with span("model_load", model=model_name, implementation=whisper_implementation or "whisper"):
+                    executor = executor_class(whisper_implementation)(model_name=model_name, whisper_params=dict(whisper_params or {}))
+            except BaseException:
+                with self._cond:
+                    self._count -= 1
+                    self._cond.notify_all()
+                raise
+
+        try:
+            yield executor
+        finally:
+            with self._cond:
+                self._idle.setdefault(key, []).append(executor)
+                self._cond.notify_all()
+
+    def clear(self):
+        """ Drops all the idle executors (frees GPU memory)."""
+        with self._cond:
+            while self._evict_idle():
+                pass
+            self._cond.notify_all()
+
+DEFAULT_SECOND_PASS_THRESHOLDS = {
+    "avg_logprob": -0.8,
+    "compression_ratio": 2.4,
+    "no_speech_prob": 0.6,
+}
+
+@dataclass
+class TranscribedSegment:
+    """A transcribed segment with its timing (seconds from the start of the input) and the decoder's confidence."""
+    start: float
+    end: float
+    text: str
+    avg_logprob: float | None = None
+    no_speech_prob: float | None = None
+    compression_ratio: float | None = None
+    words: list[dict] | None = None  # [{"word", "start", "end", "score"}, ...] when aligned
+    flags: list[str] | None = None  # hallucination suspicions of the postfilter ("flag" action)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+def is_low_confidence(segment, thresholds: dict) -> bool:
+    """ True if the segment's avg_logprob is below, or compression_ratio / no_speech_prob above its threshold (missing values pass)."""
+    return (
+        (segment.avg_logprob is not None and segment.avg_logprob < thresholds["avg_logprob"])
+        or (segment.compression_ratio is not None and segment.compression_ratio > thresholds["compression_ratio"])
+        or (segment.no_speech_prob is not None and segment.no_speech_prob > thresholds["no_speech_prob"])
+    )
+
+def low_confidence_regions(segments, thresholds: dict, max_gap: float = 1.0, pad: float = 0.5, end: float | None = None) -> list[tuple[float, float, int, int]]:
+    """
+    Groups neighbouring low-confidence segments (see `is_low_confidence`) into regions to re-decode.
+
+    Returns a list of (start, end, first_idx, last_idx): a region covers segments[first_idx:last_idx + 1], padded by `pad`
+    seconds but never overlapping the confident segments around it (nor going past `end`), so the re-decoded text can
+    replace it one to one.
+    """
+    regions = []
+    for i, segment in enumerate(segments):
+        if not is_low_confidence(segment, thresholds):
+            continue
+        # extend the previous region if it ends right before this segment (no confident segment in between)
+        if regions and regions[-1][1] == i - 1 and segment.start - segments[i - 1].end <= max_gap:
+            regions[-1][1] = i
+        else:
+            regions.append([i, i])
+
+    result = []
+    for first, last in regions:
+        lower = segments[first - 1].end if first > 0 else 0.0
+        upper = segments[last + 1].start if last + 1 < len(segments) else end
+        region_start = max(segments[first].start - pad, lower)
+        region_end = segments[last].end + pad if upper is None else min(segments[last].end + pad, upper)
+        result.append((region_start, region_end, first, last))
+    return result
+
+def splice_regions(items, regions, decode) -> list:
+    """ Replaces items[first:last + 1] of every (start, end, first, last) region with `decode(start, end)`."""
+    items = list(items)
+    # from the last region, so the indexes of the ones not yet processed stay valid
+    for start, end, first, last in reversed(regions):
+        items[first:last + 1] = decode(start, end)
+    return items
+
+def _inference_span(executor, audio_seconds):
+    """
+    Span around one decoded unit. An `AdaptiveExecutor` reports its own inference.probe/inference.escalated spans (and
+    may load the main model in between), so its outer span is named "adaptive" and isn't counted as inference twice.
+    """
+    name = "adaptive" if isinstance(executor, AdaptiveExecutor) else "inference"
+    return span(name, model=executor.model_name, audio_seconds=round(audio_seconds, 3))
+
+
 def get_transcribed_segments(r, seg_start = 0):
     entries = []
     for segment in r["segments"]:
-        start = seconds_to_srt_time(segment["start"] + seg_start)
-        end = seconds_to_srt_time(segment["end"] + seg_start)
         text = segment["text"].strip()
-        entries.append((start, end, text))
+        entries.append(TranscribedSegment(
+            start=segment["start"] + seg_start,
+            end=segment["end"] + seg_start,
+            text=text,
+            avg_logprob=segment.get("avg_logprob"),
+            no_speech_prob=segment.get("no_speech_prob"),
+            # WhisperX doesn't report it, so it's computed the same way from the text
+            compression_ratio=segment.get("compression_ratio", compression_ratio(text)),
+        ))
     return entries
\ No newline at end of file
@@ -1,17 +1,23 @@
 import os
 import textwrap
+import functools
 import ollama
 from transformers import MarianMTModel, MarianTokenizer
 
-from srt_processing import parse_srt, merge_srt_segments, get_context_segments, seconds_to_srt_time, get_broad_context
+from srt_processing import parse_srt, merge_srt_segments, get_context_segments, seconds_to_srt_time, get_broad_context, write_srt_segments
 
-def marian_translate(texts, src_lang="pl", tgt_lang="en", batch_size=8):
+@functools.lru_cache(maxsize=None)
+def load_marian(src_lang="pl", tgt_lang="en"):
+    """Load (and keep) the MarianMT tokenizer/model pair, so translating in several batches loads it only once."""
     import torch
     model_name = f"Helsinki-NLP/opus-mt-{src_lang}-{tgt_lang}"
     tokenizer = MarianTokenizer.from_pretrained(model_name)
     model = MarianMTModel.from_pretrained(model_name)
     device = "cuda" if torch.cuda.is_available() else "cpu"
-    model = model.to(device)
+    return tokenizer, model.to(device), device
+
+def marian_translate(texts, src_lang="pl", tgt_lang="en", batch_size=8):
+    tokenizer, model, device = load_marian(src_lang, tgt_lang)
     results = []
     for i in range(0, len(texts), batch_size):
         batch_texts = texts[i:i+batch_size]
@@ -20,6 +26,33 @@ def marian_translate(texts, src_lang="pl", tgt_lang="en", batch_size=8):
         results.extend([tokenizer.decode(t, skip_special_tokens=True) for t in gen])
     return results
 
+def translation_prompt(before, target, after, broad_context, source_language="polish", target_language="english"):
+    """Build the LLM prompt that translates `target` using its surrounding segments and the movie summary."""
+
+    system_prompt = textwrap.dedent(f"""
+        You are a professional subtitle translator. 
+        Translate the provided subtitle line from {source_language} to natural, idiomatic {target_language}, preserving the meaning and style.
+        Use the provided movie summary and local context to resolve ambiguities.
+        Return only the translated line, with no explanations or extra output.
+    """)
+    summary_prompt = f"Movie summary: {broad_context}"
+    before_text = ' '.join([s.text for s in before])
+    after_text = ' '.join([s.text for s in after])
+
+    return textwrap.dedent(f"""
+        {system_prompt}
+        {summary_prompt}
+
+        Context before: {before_text}
+        Line to translate: {target.text}
+        Context after: {after_text}
+    """)
+
+def marian_lang_codes(source_language="polish", target_language="english"):
+    src_lang = "pl" if source_language.lower().startswith("pol") else "en"
+    tgt_lang = "en" if target_language.lower().startswith("eng") else "pl"
+    return src_lang, tgt_lang
+
 def translate_srt(
     input_srt: str,
     output_srt: str | None = None,
@@ -43,8 +76,7 @@ def translate_srt(
 
     if method == "marian":
         # Use MarianMT for direct translation (no context)
-        src_lang = "pl" if source_language.lower().startswith("pol") else "en"
-        tgt_lang = "en" if target_language.lower().startswith("eng") else "pl"
+        src_lang, tgt_lang = marian_lang_codes(source_language, target_language)
         texts = [seg.text for seg in segments]
         translations = marian_translate(texts, src_lang, tgt_lang)
         for seg, translated_line in zip(segments, translations):
@@ -53,27 +85,9 @@ def translate_srt(
         # Use LLM with context
         broad_context = get_broad_context(segments)
 
-        system_prompt = textwrap.dedent(f"""
-            You are a professional subtitle translator. 
-            Translate the provided subtitle line from {source_language} to natural, idiomatic {target_language}, preserving the meaning and style.
-            Use the provided movie summary and local context to resolve ambiguities.
-            Return only the translated line, with no explanations or extra output.
-        """)
-        summary_prompt = f"Movie summary: {broad_context}"
-
         for idx, seg in enumerate(segments):
             before, target, after = get_context_segments(segments, idx, window)
-            before_text = ' '.join([s.text for s in before])
-            after_text = ' '.join([s.text for s in after])
-
-            prompt = textwrap.dedent(f"""
-                {system_prompt}
-                {summary_prompt}
-
-                Context before: {before_text}
-                Line to translate: {target.text}
-                Context after: {after_text}
-            """)
+            prompt = translation_prompt(before, target, after, broad_context, source_language, target_language)
 
             translated_line = ollama.call_api(prompt)
 
@@ -84,8 +98,4 @@ def translate_srt(
             translated_segments.append((target.idx, target.start, target.end, translated_line))
 
     # Write translated SRT
-    with open(output_srt, 'w', encoding='utf-8') as f:
-        for idx, start, end, text in translated_segments:
-            f.write(f"{idx}\n{seconds_to_srt_time(start)} --> {seconds_to_srt_time(end)}\n{text}\n\n")
-
-    return output_srt
\ No newline at end of file
+    return write_srt_segments(output_srt, translated_segments)
\ No newline at end of file
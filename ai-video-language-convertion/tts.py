@@ -1,20 +1,194 @@
 import os
 import json
+import queue
+import functools
+import threading
 import torch
 import torchaudio
 from collections import OrderedDict
-from pydub import AudioSegment
-from zonos.model import Zonos
-from zonos.conditioning import make_cond_dict
+from dataclasses import dataclass
+import soundfile as sf
 
 from srt_processing import parse_srt, merge_srt_segments, seconds_to_srt_time
+from av_preprocessing import file_hash
+from mixer import TimelineMixer
+from timestretch import fit_segments
 
-device = "cuda" if torch.cuda.is_available() else "cpu"
-model = Zonos.from_pretrained("Zyphra/Zonos-v0.1-transformer", device=device)
+MODEL_ID = "Zyphra/Zonos-v0.1-transformer"
+# Speaker embeddings of the reference voices, computed once and reused by all the later runs
+SPEAKER_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".speaker_cache")
 
-def create_speaker_embedding(input_file: str):
-    wav, sr = torchaudio.load(input_file)
-    return model.make_speaker_embedding(wav, sr)
+emotion_od = OrderedDict([
+    ("happiness", 1.0),
+    ("sadness",   0.0),
+    ("disgust",   0.0),
+    ("fear",      0.0),
+    ("surprise",  0.5),
+    ("anger",     0.0),
+    ("other",     0.5),
+    ("neutral",   1.5),
+])
+emotion_vector = list(emotion_od.values())
+
+_speaker_embeddings: dict[str, torch.Tensor] = {}
+
+@functools.lru_cache(maxsize=None)
+def load_zonos(model_id: str = MODEL_ID, device: str | None = None):
+    """Load (and keep) the Zonos model, so every engine and SRT in the process shares one copy."""
+    from zonos.model import Zonos
+    device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+    print(f"Loading Zonos model {model_id} on {device}")
+    return Zonos.from_pretrained(model_id, device=device)
+
+
+class TTSEngine:
+    """
+    Zonos text-to-speech for SRT files.
+
+    The model is loaded on first use (see `load_zonos`) and shared by all the engines of the process, so importing this module
+    is cheap and many SRTs can be voiced without reloading it.
+
+    Args:
+        model_id (str): Zonos model to use.
+        device (str | None): "cuda" or "cpu", detected if None.
+        language (str): espeak language code of the texts, e.g. "en-us".
+        emotion_vector (list[float] | None): Emotion conditioning in the order of `emotion_od`.
+        speaker_cache_dir (str | None): Where speaker embeddings are stored, None to keep them in memory only.
+        batch_size (int): Segments generated at once.
+        max_new_tokens (int): Generation limit per segment (86 tokens ~ 1 s).
+
+    Example:
+        engine = TTSEngine(language="en-us")
+        for srt in ["part1.srt_translated", "part2.srt_translated"]:
+            engine.synthesize_srt(srt, reference_audio="voice.wav", output_dir=f"{srt}_audio", create_aligned_output=True)
+    """
+
+    def __init__(self,
+        model_id: str = MODEL_ID,
+        device: str | None = None,
+        language: str = "en-us",
+        emotion_vector: list | None = None,
+        speaker_cache_dir: str | None = SPEAKER_CACHE_DIR,
+        batch_size: int = 4,
+        max_new_tokens: int = 86 * 30,
+        ):
+
+        self.model_id = model_id
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.language = language
+        self.emotion_vector = emotion_vector or list(emotion_od.values())
+        self.speaker_cache_dir = speaker_cache_dir
+        self.batch_size = batch_size
+        self.max_new_tokens = max_new_tokens
+
+    @property
+    def model(self):
+        return load_zonos(self.model_id, self.device)
+
+    def speaker_embedding(self, input_file: str):
+        """
+        Returns the speaker embedding of a reference recording.
+
+        Embeddings are kept in memory for the process and stored in `speaker_cache_dir` as <audio hash>_<model>_<sample rate>.pt,
+        so a voice is embedded only once no matter how many videos use it.
+        """
+        key = f"{file_hash(input_file)}_{self.model_id.replace('/', '--')}_{self.model.autoencoder.sampling_rate}"
+        if key in _speaker_embeddings:
+            return _speaker_embeddings[key]
+
+        cache_path = os.path.join(self.speaker_cache_dir, f"{key}.pt") if self.speaker_cache_dir else None
+        if cache_path and os.path.exists(cache_path):
+            print(f"Speaker embedding loaded from cache: {cache_path}")
+            embedding = torch.load(cache_path, map_location=self.device)
+        else:
+            wav, sr = torchaudio.load(input_file)
+            embedding = self.model.make_speaker_embedding(wav, sr)
+            if cache_path:
+                os.makedirs(self.speaker_cache_dir, exist_ok=True)
+                tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+                torch.save(embedding.cpu(), tmp_path)
+                os.replace(tmp_path, cache_path)
+                print(f"Speaker embedding saved to cache: {cache_path}")
+
+        _speaker_embeddings[key] = embedding
+        return embedding
+
+    def synthesize_srt(
+        self,
+        srt_file: str,
+        reference_audio: str,
+        output_dir: str,
+        create_aligned_output: bool = False,
+        create_alignement_data: bool = False,
+        fit_durations: bool | dict = False,
+        project=None,
+    ):
+        """
+        Synthesize audio from SRT file using Zonos API.
+
+        With `fit_durations` the clips running over their cue are sped up to fit before the aligned output/data are made
+        (see `timestretch.fit_segments`, a dict passes its options, e.g. {"max_rate": 1.3, "workers": 4}).
+
+        Segments are generated in batches of `batch_size`, grouped by text length so the phonemes padded within a batch stay short.
+        The speaker embedding and the constant part of the conditioning are prepared once per run, and the generated WAVs
+        are moved to CPU and saved by a background writer thread while the GPU works on the next batch.
+        Each segment is saved as <output_dir>/<start>.wav. Returns the list of segments.
+
+        With a `project` (a `VideoProjectGenerator` of video-editing/) the clips are put on its timeline in the same process
+        (`add_tts_clips`), with durations from the number of samples generated, so the clips are neither probed nor passed
+        through the alignment JSON.
+        """
+        from zonos.conditioning import make_cond_dict
+
+        model = self.model
+        segments = merge_srt_segments(parse_srt(srt_file))
+        # Create speaker embedding from reference audio
+        spk_emb = self.speaker_embedding(reference_audio)
+
+        # Create output directory
+        os.makedirs(output_dir, exist_ok=True)
+
+        # Conditioning shared by all the segments, only the text changes per segment
+        base_cond = make_cond_dict(text="", language=self.language, speaker=spk_emb, emotion=self.emotion_vector, device=self.device)
+
+        writer = WavWriter(model.autoencoder.sampling_rate)
+        try:
+            for batch in _length_batches(segments, self.batch_size):
+                for seg in batch:
+                    print(f"Generating segment {seg.idx}: '{seg.text[:50]}...' ({seg.start:.3f}s - {seg.end:.3f}s)")
+
+                conditioning = model.prepare_conditioning(_batch_cond(base_cond, [seg.text for seg in batch], self.language))
+                codes = model.generate(conditioning, batch_size=len(batch), max_new_tokens=self.max_new_tokens)
+                wavs = model.autoencoder.decode(codes)
+
+                for seg, wav in zip(batch, wavs):
+                    # Save with timestamp as filename for alignment
+                    writer.put(os.path.join(output_dir, f"{seg.start:.3f}.wav"), wav, trim=len(batch) > 1)
+        finally:
+            writer.close()
+
+        fit_results = None
+        if fit_durations:
+            fit_results = fit_segments(segments, output_dir, **(fit_durations if isinstance(fit_durations, dict) else {}))
+
+        # Create timeline-aligned output
+        if create_aligned_output:
+            mix_aligned_output(segments, output_dir)
+
+        clips = None
+        if create_alignement_data or project is not None:
+            clips = create_ve_clips(segments, output_dir, writer.written, writer.sample_rate, fit_results)
+        if create_alignement_data:
+            create_ve_alignement_data(segments, output_dir, fit_results=fit_results, clips=clips)
+        if project is not None:
+            project.add_tts_clips(clips)
+
+        return segments
+
+
+def create_speaker_embedding(input_file: str, cache_dir: str | None = SPEAKER_CACHE_DIR):
+    """ Speaker embedding of a reference recording with the default model, see `TTSEngine.speaker_embedding`."""
+    return TTSEngine(speaker_cache_dir=cache_dir).speaker_embedding(input_file)
 
 def synthesize_with_zonos_api(
     srt_file: str,
@@ -23,118 +197,213 @@ def synthesize_with_zonos_api(
     language: str = "en-us",
     emotion_vector: list = [1.0, 0.0, 0.0, 0.0, 0.5, 0.0, 0.5, 1.5],  # Default emotion vector,
     create_aligned_output: bool = False,
-    create_alignement_data: bool = False
+    create_alignement_data: bool = False,
+    batch_size: int = 4,
+    max_new_tokens: int = 86 * 30,
+    fit_durations: bool | dict = False,
 
 ):
     """
-    Synthesize audio from SRT file using Zonos API.
+    Synthesize audio from SRT file using Zonos API, shortcut for `TTSEngine(...).synthesize_srt(...)`.
     """
-    segments = merge_srt_segments(parse_srt(srt_file))
-    # Create speaker embedding from reference audio
-    spk_emb = create_speaker_embedding(reference_audio)
+    engine = TTSEngine(language=language, emotion_vector=emotion_vector, batch_size=batch_size, max_new_tokens=max_new_tokens)
+    return engine.synthesize_srt(srt_file, reference_audio, output_dir, create_aligned_output, create_alignement_data, fit_durations)
+
 
-    # Create output directory
-    os.makedirs(output_dir, exist_ok=True)
+def _length_batches(segments, batch_size: int):
+    """ Batches of segments with similar text length (longest first, so a too large batch fails early)."""
+    ordered = sorted(segments, key=lambda seg: len(seg.text), reverse=True)
+    for i in range(0, len(ordered), batch_size):
+        yield ordered[i:i + batch_size]
 
+
+def _batch_cond(base_cond: dict, texts: list[str], language: str) -> dict:
+    """ Conditioning dict for a batch of texts: the cached per-run tensors repeated for every item."""
+    cond = {}
+    for key, value in base_cond.items():
+        if key == "espeak":
+            cond[key] = (texts, [language] * len(texts))
+        elif torch.is_tensor(value):
+            cond[key] = value.expand(len(texts), *value.shape[1:])
+        else:
+            cond[key] = value
+    return cond
+
+
+def _trim_trailing_silence(wav: torch.Tensor, threshold: float = 1e-3) -> torch.Tensor:
+    """ A batch is generated to the length of its longest item, the shorter items end with silence, which is cut off here."""
+    loud = (wav.abs().amax(dim=0) > threshold).nonzero()
+    return wav[:, :int(loud[-1]) + 1] if len(loud) else wav
+
+
+class WavWriter:
+    """
+    Saves generated audio from a background thread.
+
+    `put()` only queues the (still GPU) tensor, the writer thread copies it to CPU and writes the file, so generation of the next
+    batch isn't waiting for the transfer or the disk. The queue is bounded (`max_pending`) to limit the GPU memory held by waiting clips.
+    The (samples, channels) of every saved file are kept in `written`.
+    """
+
+    def __init__(self, sample_rate: int, max_pending: int = 16):
+        self.sample_rate = sample_rate
+        self.errors: list[Exception] = []
+        self.written: dict[str, tuple[int, int]] = {}
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name="wav-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, path: str, wav: torch.Tensor, trim: bool = False):
+        self._queue.put((path, wav, trim))
+
+    def _run(self):
+        while (item := self._queue.get()) is not None:
+            path, wav, trim = item
+            try:
+                wav = wav.cpu()
+                if trim:
+                    wav = _trim_trailing_silence(wav)
+                torchaudio.save(path, wav, self.sample_rate)
+                self.written[path] = (wav.shape[-1], wav.shape[0])
+                print(f"Saved: {path}")
+            except Exception as e:
+                print(f"Error saving {path}: {e}")
+                self.errors.append(e)
+
+    def close(self):
+        """ Waits until all the queued files are written."""
+        self._queue.put(None)
+        self._thread.join()
+
+
+@dataclass
+class SynthesizedClip:
+    """ A saved segment with its exact length, all a video editor project needs to place it."""
+    path: str
+    start: float
+    text: str
+    samples: int
+    sample_rate: int
+    channels: int = 1
+    stretch_rate: float | None = None   # set when the clip went through `fit_segments`
+    fits: bool | None = None
+
+    @property
+    def duration(self) -> float:
+        return self.samples / self.sample_rate
+
+
+def create_ve_clips(segments, output_dir: str, written: dict | None = None, sample_rate: int | None = None, fit_results=None) -> list[SynthesizedClip]:
+    """
+    The synthesized clips of `segments` with their lengths in samples: of the fitted file from `fit_results`, else as saved
+    by the `WavWriter` (`written`, at `sample_rate`), else from the WAV header. Segments without a file are left out.
+    """
+    written = written or {}
+    fits = {r.path: r for r in fit_results or []}
+
+    clips = []
     for seg in segments:
-        print(f"Generating segment {seg.idx}: '{seg.text[:50]}...' ({seg.start:.3f}s - {seg.end:.3f}s)")
-
-        # Prepare conditioning dictionary
-        cond = make_cond_dict(
-            text=seg.text,
-            language=language,
-            speaker=spk_emb,
-            emotion=emotion_vector
-        )
-        conditioning = model.prepare_conditioning(cond)
-        codes = model.generate(conditioning)
-
-        wavs = model.autoencoder.decode(codes).cpu()
-        
-        # Save with timestamp as filename for alignment
-        output_filename = os.path.join(output_dir, f"{seg.start:.3f}.wav")
-        torchaudio.save(output_filename, wavs[0], model.autoencoder.sampling_rate)
-        print(f"Saved: {output_filename}")
-    
-    # Create timeline-aligned output using Pydub
-    if create_aligned_output:
-        create_pydub_aligned_output(segments, output_dir)
-    
-    if create_alignement_data:
-        create_ve_alignement_data(segments, output_dir)
-
-
-def create_ve_alignement_data(segments, output_dir, output_file: str = "alignment_data.json"):
+        path = os.path.join(output_dir, f"{seg.start:.3f}.wav")
+        fit = fits.get(path)
+        if path in written and sample_rate:
+            samples, channels = written[path]
+            rate = sample_rate
+        elif os.path.exists(path):
+            info = sf.info(path)
+            samples, rate, channels = info.frames, info.samplerate, info.channels
+        else:
+            print(f"Warning: {path} not found")
+            continue
+        clip = SynthesizedClip(path, seg.start, seg.text, samples, rate, channels)
+        if fit is not None:
+            clip.stretch_rate, clip.fits = fit.rate, fit.fits
+            if fit.samples:
+                clip.samples, clip.sample_rate = fit.samples, fit.sample_rate
+        clips.append(clip)
+    return clips
+
 
+def create_ve_alignement_data(segments, output_dir, output_file: str = "alignment_data.json", fit_results=None, clips: list[SynthesizedClip] | None = None):
+    """
+    Saves the clips for `video-editing/video_project_generator.py --config`. The entries carry the samples and sample rate
+    of each clip, so the generator doesn't have to probe them.
+    """
     output_filepath = os.path.join(output_dir, output_file)
+    if clips is None:
+        clips = create_ve_clips(segments, output_dir, fit_results=fit_results)
 
     data = []
-    for seg in segments:
+    for clip in clips:
         entry = {
-            "filepath": os.path.join(output_dir, f"{seg.start:.3f}.wav"),
-            "trasncription": seg.text,
-            "start_time": seconds_to_srt_time(seg.start)
+            "filepath": clip.path,
+            "transcription": clip.text,
+            "start_time": seconds_to_srt_time(clip.start),
+            "samples": clip.samples,
+            "sample_rate": clip.sample_rate,
+            "channels": clip.channels,
         }
+        if clip.stretch_rate is not None:
+            # lets the editor find the clips that still overrun their cue
+            entry.update(stretch_rate=clip.stretch_rate, fits=clip.fits)
         data.append(entry)
     with open(output_filepath, "w") as f:
         json.dump(data, f, indent=4)
     print(f"Saved JSON to {output_filepath}")
 
-def create_pydub_aligned_output(segments, output_dir: str, output_file: str = "aligned_output.wav"):
-    """Use Pydub to place audio segments at correct timestamps."""
-    
+def mix_aligned_output(segments, output_dir: str, output_file: str = "aligned_output.wav", sample_rate: int | None = None, clipping: str | None = "normalize"):
+    """
+    Places the synthesized segments at their start times on one timeline and saves it as <output_dir>/<output_file>.
+
+    Segments are mixed with `mixer.TimelineMixer`: each clip is added in place into one preallocated buffer and the result is
+    written once, scaled down if overlapping clips would clip (see `TimelineMixer.write`).
+    """
     output_filepath = os.path.join(output_dir, output_file)
+    seg_paths = [(seg, os.path.join(output_dir, f"{seg.start:.3f}.wav")) for seg in segments]
 
-    # Get total duration in milliseconds
-    total_duration_ms = int(segments[-1].end * 1000)
-    
-    # Create silent audio track
-    final_audio = AudioSegment.silent(duration=total_duration_ms)
-    
-    for seg in segments:
-        seg_file = f"{seg.start:.3f}.wav"
-        seg_path = os.path.join(output_dir, seg_file)
-        
-        if os.path.exists(seg_path):
+    if sample_rate is None:
+        sample_rate = next((sf.info(path).samplerate for _, path in seg_paths if os.path.exists(path)), 44100)
+
+    # the timeline has to hold the last clip even if it runs over its cue
+    duration = max(
+        [segments[-1].end] + [seg.start + sf.info(path).duration for seg, path in seg_paths if os.path.exists(path)]
+    )
+
+    with TimelineMixer(duration, sample_rate, temp_dir=output_dir) as mixer:
+        for seg, seg_path in seg_paths:
+            if not os.path.exists(seg_path):
+                print(f"Warning: {seg_path} not found")
+                continue
             try:
-                # Load the audio segment
-                audio_segment = AudioSegment.from_wav(seg_path)
-                
-                # Calculate position in milliseconds
-                start_ms = int(seg.start * 1000)
-                
-                # Overlay the segment at the correct position
-                final_audio = final_audio.overlay(audio_segment, position=start_ms)
+                mixer.add_file(seg_path, seg.start)
                 print(f"Placed segment at {seg.start:.3f}s")
-                
             except Exception as e:
                 print(f"Error processing {seg_path}: {e}")
-        else:
-            print(f"Warning: {seg_path} not found")
-    
-    # Export the final audio
-    final_audio.export(output_file, format="wav")
-    print(f"Pydub aligned audio saved to: {output_file}")
-            
-emotion_od = OrderedDict([
-    ("happiness", 1.0),
-    ("sadness",   0.0),
-    ("disgust",   0.0),
-    ("fear",      0.0),
-    ("surprise",  0.5),
-    ("anger",     0.0),
-    ("other",     0.5),
-    ("neutral",   1.5),
-])
-emotion_vector = list(emotion_od.values())
+        mixer.write(output_filepath, clipping=clipping)
+
+    print(f"Aligned audio saved to: {output_filepath}")
+    return output_filepath
+
 
-synthesize_with_zonos_api(
-    srt_file="Wideo/VID20250619100726_cfr_rotated.srt_translated", 
-    reference_audio="Wideo/l.wav", 
-    output_dir="output_audio",
-    emotion_vector=emotion_vector,
-    create_aligned_output=True,
-    create_alignement_data=True
-)
+if __name__ == "__main__":
+    import argparse
 
+    parser = argparse.ArgumentParser(description="Voice translated SRT files with Zonos TTS")
+    parser.add_argument("srt_files", nargs="+", help="SRT files to synthesize (the model is loaded once for all of them)")
+    parser.add_argument("--reference", required=True, help="Reference recording of the voice to clone")
+    parser.add_argument("--output-dir", default="output_audio",
+                        help="Output directory (with several SRT files: a subdirectory per file)")
+    parser.add_argument("--language", default="en-us", help="espeak language code of the subtitles")
+    parser.add_argument("--batch-size", type=int, default=4, help="Segments generated at once")
+    parser.add_argument("--aligned-output", action="store_true", help="Also mix all the segments into one timeline-aligned WAV")
+    parser.add_argument("--alignment-data", action="store_true", help="Also save the JSON with segment files and start times")
+    parser.add_argument("--fit-durations", action="store_true", help="Speed up the clips that run over the next cue")
+    parser.add_argument("--max-rate", type=float, default=1.35, help="Maximum speed-up of --fit-durations")
+    args = parser.parse_args()
 
+    engine = TTSEngine(language=args.language, emotion_vector=emotion_vector, batch_size=args.batch_size)
+    for srt_file in args.srt_files:
+        output_dir = args.output_dir
+        if len(args.srt_files) > 1:
+            output_dir = os.path.join(args.output_dir, os.path.splitext(os.path.basename(srt_file))[0])
+        fit_durations = {"max_rate": args.max_rate} if args.fit_durations else False
+        engine.synthesize_srt(srt_file, args.reference, output_dir, args.aligned_output, args.alignment_data, fit_durations)
@@ -16,20 +16,25 @@ def srt_time_to_seconds(srt_time: str) -> float:
     return int(h)*3600 + int(m)*60 + int(s) + int(ms)/1000
 
 
-def get_video_duration(filepath):
+def to_seconds(t) -> float:
+    """
+    Convert a time given as seconds or as a timestamp ("HH:MM:SS,mmm", "HH:MM:SS.mmm" or "MM:SS.mmm") to seconds.
 
-    import subprocess
-    
-    try:
-        result = subprocess.run(
-            [
-                "ffprobe", "-v", "error", "-show_entries",
-                "format=duration", "-of",
-                "default=noprint_wrappers=1:nokey=1", filepath
-            ],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT
-        )
-        return float(result.stdout)
-    except Exception:
-        return 0.0
\ No newline at end of file
+    Example:
+        to_seconds("00:01:23,456")  # returns 83.456
+        to_seconds(12)              # returns 12.0
+    """
+    if isinstance(t, (int, float)):
+        return float(t)
+    if not t:
+        return 0.0
+    seconds = 0.0
+    for part in str(t).replace(',', '.').split(':'):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def get_video_duration(filepath):
+    """Duration of a media file in seconds (0.0 if it can't be read), probed through the cache of `probe.probe_files`."""
+    from .probe import probe_files
+    return probe_files([filepath])[filepath].duration
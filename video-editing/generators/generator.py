@@ -1,10 +1,28 @@
 
 import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 from dataclasses import dataclass
 import generators
-from .common import srt_time_to_seconds, get_video_duration
+from .common import to_seconds
+from .probe import MediaInfo, audio_info, probe_files
+from .timeline import Timeline, TimelineItem, VIDEO, DUBBED_AUDIO, SUBTITLES
+from .project_ir import ProjectIR, compile_project
+from .generators_openshot import render_openshot_project
+from .generators_shotcut_basic import render_shotcut_project
+from .generators_shotcut import render_shotcut_timeline_project
+from .generators_kdenlive import render_kdenlive_project
+
+VIDEO_EXTENSIONS = ['.mp4', '.avi', '.mov', '.mkv', '.webm', '.m4v']
+
+# method -> (editor, renderer of a compiled ProjectIR, output file suffix)
+RENDERERS = {
+    'openshot': ('OpenShot', render_openshot_project, '_openshot.osp'),
+    'shotcut_playlist': ('Shotcut Playlist', render_shotcut_project, '_shotcut.mlt'),
+    'shotcut_timeline': ('Shotcut Timeline', render_shotcut_timeline_project, '_shotcut_timeline.mlt'),
+    'kdenlive': ('Kdenlive', render_kdenlive_project, '_kdenlive.kdenlive'),
+}
 
 @dataclass
 class VideoClip:
@@ -14,6 +32,7 @@ class VideoClip:
     duration: float = 0.0
     start_time: float = 0.0
     title: str = ""
+    media: Optional[MediaInfo] = None  # probed fps, resolution and audio layout, if known
     
     def __post_init__(self):
         if not self.title:
@@ -22,19 +41,30 @@ class VideoClip:
 
 class VideoProjectGenerator:
 
-    """Main class for generating video editor project files"""
+    """
+    Main class for generating video editor project files
+
+    Clips are kept in `clips` in the order they were added and placed on the tracks of `timeline` (video, dubbed audio,
+    original audio, subtitles), which the timeline generators render from.
+    """
     def __init__(self):
         self.clips: List[VideoClip] = []
+        self.timeline = Timeline()
         self.project_name = "Generated Project"
         self.output_dir = Path.cwd()
+        self.compact = False  # write the project files without indentation (smaller, faster for big projects)
 
     def generate(self, method: str):
-        """Generate project files for the specified editors. Returns list of (Editor, OutputFile)"""
+        """
+        Generate project files for the specified editors.
+        'all' renders every editor (see `generate_all`) and returns a list of (Editor, OutputFile), a single method returns its output file.
+        """
         method_map = {
             'openshot': ('OpenShot', self.generate_openshot_project),
             'shotcut_playlist': ('Shotcut Playlist', self.generate_shotcut_project),
             'shotcut_timeline': ('Shotcut Timeline', self.generate_shotcut_timeline_project),
             'kdenlive': ('Kdenlive', self.generate_kdenlive_project),
+            'all': ('All', self.generate_all),
         }
         if method in method_map:
             _, method_func = method_map[method]
@@ -42,19 +72,86 @@ class VideoProjectGenerator:
         else:
             print(f"Unknown method: {method}")
 
-    def add_clip(self, filepath: str, transcription: str = "", duration: float = 0.0, title: str = "", start_time: float = 0.0):
+    def compile(self, fps=None, size=None) -> ProjectIR:
+        """Compiles the clips and the timeline into the frame-accurate `ProjectIR` the generators render from."""
+        return compile_project(self, fps, size)
+
+    def generate_all(self, methods: List[str] = None, workers: int = None):
+        """
+        Generates the projects of all (or the given) editors from one compiled `ProjectIR`, each rendered in its own
+        process at the same time. Returns list of (Editor, OutputFile)
+        """
+        methods = methods or list(RENDERERS)
+        ir = self.compile()
+        with ProcessPoolExecutor(max_workers=workers or len(methods)) as pool:
+            futures = []
+            for method in methods:
+                editor, render, suffix = RENDERERS[method]
+                futures.append((editor, pool.submit(render, ir, self.output_dir / f"{self.project_name}{suffix}", self.compact)))
+            results = [(editor, future.result()) for editor, future in futures]
+        for editor, output_file in results:
+            print(f"  {editor}: {output_file}")
+        return results
+
+    def add_clip(self, filepath: str, transcription: str = "", duration: float = 0.0, title: str = "", start_time=None,
+                 media: Optional[MediaInfo] = None, track_kind: Optional[str] = None):
+        """
+        Adds a clip and places it on the timeline.
+
+        Args:
+            start_time (float | str | None): Position in seconds or as a timestamp; None puts the clip right after the
+                last one on its track.
+            track_kind (str | None): `timeline.VIDEO`, `DUBBED_AUDIO` or `ORIGINAL_AUDIO`; by default video files go to
+                the video track and other media (e.g. TTS clips) to the dubbed audio track.
+        """
+        if track_kind is None:
+            if media is not None and (media.has_video or media.has_audio):
+                has_video = media.has_video
+            else:
+                # not probed, or the probe found no streams (failed): go by the extension
+                has_video = Path(filepath).suffix.lower() in VIDEO_EXTENSIONS
+            track_kind = VIDEO if has_video else DUBBED_AUDIO
+        if start_time is None:
+            start_time = max((track.items.end for track in self.timeline.tracks_of(track_kind)), default=0.0)
+
         clip = VideoClip(
             filepath=os.path.abspath(filepath),
             transcription=transcription,
             duration=duration,
             title=title or Path(filepath).stem,
-            start_time=start_time
+            start_time=to_seconds(start_time),
+            media=media
         )
         self.clips.append(clip)
+        self.timeline.add(TimelineItem(clip.start_time, clip.start_time + (clip.duration or 10.0), clip=clip), track_kind)
+
+    def add_tts_clips(self, clips, track_kind: str = DUBBED_AUDIO):
+        """
+        Adds synthesized speech clips straight from the TTS results, e.g. `tts.TTSEngine.synthesize_srt(..., project=generator)`.
+
+        The lengths of the clips are known from their sample counts, so nothing is probed and no alignment JSON is written
+        or read. Clips overlapping the previous ones go to parallel tracks.
+
+        Args:
+            clips (list): `tts.SynthesizedClip`s or dicts with path (or filepath), start (or start_time), samples,
+                sample_rate and optionally text (or transcription) and channels.
+        """
+        for clip in clips:
+            if not isinstance(clip, dict):
+                clip = vars(clip)
+            filepath = clip.get("path") or clip["filepath"]
+            media = audio_info(filepath, clip["samples"], clip["sample_rate"], clip.get("channels") or 1)
+            self.add_clip(filepath, transcription=clip.get("text") or clip.get("transcription", ""), duration=media.duration,
+                          start_time=clip.get("start", clip.get("start_time", 0.0)), media=media, track_kind=track_kind)
+        print(f"Added {len(clips)} TTS clips, {len(self.timeline.tracks_of(track_kind))} track(s)")
+
+    def add_subtitle(self, text: str, start_time, end_time):
+        """Adds a subtitle text to the subtitles track."""
+        self.timeline.add(TimelineItem(to_seconds(start_time), to_seconds(end_time), text=text), SUBTITLES)
 
     def load_clips_from_directory(self, directory: str, extensions: List[str] = None):
         if extensions is None:
-            extensions = ['.mp4', '.avi', '.mov', '.mkv', '.webm', '.m4v']
+            extensions = VIDEO_EXTENSIONS
         directory = Path(directory)
         for ext in extensions:
             for video_file in directory.glob(f"*{ext}"):
@@ -70,22 +167,29 @@ class VideoProjectGenerator:
             print("No clips data provided!")
             return
 
-        # Compute start_time for a continuous timeline
-        start_pos = 0.0
-        for clip_data in data:
-            start_pos = start_pos + srt_time_to_seconds(clip_data["start_time"])
-            filepath = os.path.join(input_dir, clip_data.get("filepath"))
-            duration = clip_data.get("duration", get_video_duration(filepath)) + 1 # additional second, cause of rounding issues
+        # all the files are probed at once (in parallel, cached), clips with a duration or sample count given in the data aren't probed
+        filepaths = [os.path.join(input_dir or "", clip_data.get("filepath")) for clip_data in data]
+        media = probe_files([path for path, clip_data in zip(filepaths, data) if "duration" not in clip_data and "samples" not in clip_data])
+
+        # clips are placed at their start_time, overlapping ones go to parallel tracks of the timeline
+        for filepath, clip_data in zip(filepaths, data):
+            if "samples" in clip_data:
+                # exact length from the TTS
+                info = audio_info(filepath, clip_data["samples"], clip_data["sample_rate"], clip_data.get("channels", 1))
+                duration = info.duration
+            else:
+                info = media.get(filepath)
+                # no padding: back-to-back clips would overlap and spill onto extra tracks
+                duration = clip_data["duration"] if "duration" in clip_data else info.duration
 
             self.add_clip(
                 filepath=filepath,
                 transcription=clip_data.get("transcription", ""),
                 duration=duration,
                 title=clip_data.get("title", ""),
-                start_time=clip_data.get("start_time", 0.0)
+                start_time=clip_data.get("start_time", 0.0),
+                media=info
             )
-
-            start_pos += duration
         
         print(f"Added {len(self.clips)} demo clips:")
         total_duration = 0.0
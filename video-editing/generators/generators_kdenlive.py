@@ -1,78 +1,44 @@
 # Warning: This generator part I wasn't testing yet
 
 
-import xml.etree.ElementTree as ET
-import xml.dom.minidom
 from pathlib import Path
-def generate_kdenlive_project(self, output_path=None):
-    """Generate Kdenlive project file (.kdenlive)"""
-    if output_path is None:
-        output_path = self.output_dir / f"{self.project_name}_kdenlive.kdenlive"
-
-    mlt = ET.Element('mlt')
-    mlt.set('LC_NUMERIC', 'C')
-    mlt.set('version', '7.0.1')
-    mlt.set('title', self.project_name)
-    mlt.set('profile', 'atsc_720p_30')
-
-    profile = ET.SubElement(mlt, 'profile')
-    profile.set('description', 'HD 720p 30 fps')
-    profile.set('width', '1280')
-    profile.set('height', '720')
-    profile.set('progressive', '1')
-    profile.set('sample_aspect_num', '1')
-    profile.set('sample_aspect_den', '1')
-    profile.set('display_aspect_num', '16')
-    profile.set('display_aspect_den', '9')
-    profile.set('frame_rate_num', '30')
-    profile.set('frame_rate_den', '1')
-    profile.set('colorspace', '709')
-
-    for i, clip in enumerate(self.clips):
-        producer = ET.SubElement(mlt, 'producer')
-        producer.set('id', f'{i+1}')
-        producer.set('in', '0')
-        producer.set('out', str(int((clip.duration or 10.0) * 30 - 1)))
-
-        resource_prop = ET.SubElement(producer, 'property')
-        resource_prop.set('name', 'resource')
-        resource_prop.text = clip.filepath
-
-        length_prop = ET.SubElement(producer, 'property')
-        length_prop.set('name', 'length')
-        length_prop.text = str(int((clip.duration or 10.0) * 30))
+from .mlt_writer import MltWriter
+from .project_ir import mlt_profile
+from .timeline import VIDEO
+
+
+def render_kdenlive_project(ir, output_path, compact=False):
+    """Writes the compiled project (`ProjectIR`) as a Kdenlive project, one playlist per track."""
+    with MltWriter(output_path, {'LC_NUMERIC': 'C', 'version': '7.0.1', 'title': ir.name}, indent=None if compact else '  ') as mlt:
+        mlt.element('profile', mlt_profile(ir))
+
+        for clip in ir.clips:
+            with mlt.start('producer', {'id': clip.producer_id, 'in': '0', 'out': str(clip.out_frame)}):
+                mlt.property('resource', clip.filepath)
+                mlt.property('length', str(clip.length))
+                if clip.transcription:
+                    mlt.property('kdenlive:clipname', f"{clip.title} - {clip.transcription[:50]}...")
+
+        mlt.element('producer', {'id': 'black_track', 'in': '0', 'out': str(ir.total_frames - 1)})
+
+        for n, track in enumerate(ir.tracks):
+            with mlt.start('playlist', {'id': f'playlist{n}'}):
+                for entry in track.entries:
+                    if entry.clip is None:
+                        mlt.element('blank', {'length': str(entry.blank)})
+                    else:
+                        mlt.element('entry', {'producer': entry.clip.producer_id, 'in': '0', 'out': str(entry.clip.out_frame)})
+
+        with mlt.start('tractor', {'id': 'maintractor', 'in': '0', 'out': str(ir.total_frames - 1)}):
+            mlt.element('track', {'producer': 'black_track'})
+            for n, track in enumerate(ir.tracks):
+                mlt.element('track', {'producer': f'playlist{n}'} if track.kind == VIDEO else {'producer': f'playlist{n}', 'hide': 'video'})
 
-        if clip.transcription:
-            comment_prop = ET.SubElement(producer, 'property')
-            comment_prop.set('name', 'kdenlive:clipname')
-            comment_prop.text = f"{clip.title} - {clip.transcription[:50]}..."
-
-    tractor = ET.SubElement(mlt, 'tractor')
-    tractor.set('id', 'maintractor')
-    tractor.set('in', '0')
-    total_duration = sum((clip.duration or 10.0) for clip in self.clips) * 30
-    tractor.set('out', str(int(total_duration - 1)))
-
-    track1 = ET.SubElement(tractor, 'track')
-    track1.set('producer', 'black_track')
-    track2 = ET.SubElement(tractor, 'track')
-    track2.set('producer', 'playlist1')
-
-    playlist = ET.SubElement(mlt, 'playlist')
-    playlist.set('id', 'playlist1')
-    for i, clip in enumerate(self.clips):
-        entry = ET.SubElement(playlist, 'entry')
-        entry.set('producer', str(i+1))
-        entry.set('in', '0')
-        entry.set('out', str(int((clip.duration or 10.0) * 30 - 1)))
+    return str(output_path)
 
-    black_track = ET.SubElement(mlt, 'producer')
-    black_track.set('id', 'black_track')
-    black_track.set('in', '0')
-    black_track.set('out', str(int(total_duration - 1)))
 
-    rough_string = ET.tostring(mlt, 'unicode')
-    reparsed = xml.dom.minidom.parseString(rough_string)
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(reparsed.toprettyxml(indent="  "))
-    return str(output_path)
+def generate_kdenlive_project(self, output_path=None, ir=None):
+    """Generate Kdenlive project file (.kdenlive)"""
+    if output_path is None:
+        output_path = self.output_dir / f"{self.project_name}_kdenlive.kdenlive"
+    return render_kdenlive_project(ir or self.compile(), output_path, self.compact)
@@ -4,10 +4,144 @@
 import json
 import uuid
 from pathlib import Path
-def generate_openshot_project(self, output_path=None):
-    """Generate OpenShot project file (.osp)"""
-    if output_path is None:
-        output_path = self.output_dir / f"{self.project_name}_openshot.osp"
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _keyframe(value: float) -> dict:
+    return {"Points": [{"co": {"X": 1.0, "Y": value}, "interpolation": 0}]}
+
+
+# Constant parts of the entries, built once and shared by all the clips and files. Placeholders (None) keep the keys
+# filled in per entry at their place in the output.
+KEYFRAME_ONE = _keyframe(1.0)
+KEYFRAME_ZERO = _keyframe(0.0)
+KEYFRAME_OFF = _keyframe(-1.0)
+
+CLIP_TEMPLATE = {
+    "alpha": KEYFRAME_ONE,
+    "anchor": 0,
+    "channel_filter": KEYFRAME_OFF,
+    "channel_mapping": KEYFRAME_OFF,
+    "display": 0,
+    "duration": None,
+    "effects": [],
+    "end": None,
+    "file_id": None,
+    "gravity": 4,
+    "has_audio": KEYFRAME_OFF,
+    "has_video": KEYFRAME_OFF,
+    "id": None,
+    "layer": None,
+    "location_x": KEYFRAME_ZERO,
+    "location_y": KEYFRAME_ZERO,
+    "mixing": 0,
+    "position": None,
+    "reader": None,
+    "rotation": KEYFRAME_ZERO,
+    "scale": 1,
+    "scale_x": KEYFRAME_ONE,
+    "scale_y": KEYFRAME_ONE,
+    "shear_x": KEYFRAME_ZERO,
+    "shear_y": KEYFRAME_ZERO,
+    "start": 0.0,
+    "time": KEYFRAME_ONE,
+    "title": None,
+    "volume": KEYFRAME_ONE,
+    "wave_color": {"alpha": 255, "blue": 0, "green": 123, "red": 255},
+    "waveform": False
+}
+
+FILE_TEMPLATE = {
+    "acodec": "",
+    "audio_bit_rate": 0,
+    "audio_stream_index": -1,
+    "audio_timebase": {"den": 1, "num": 1},
+    "channel_layout": 3,
+    "channels": 2,
+    "display_ratio": {"den": 9, "num": 16},
+    "duration": None,
+    "file_size": "0",
+    "fps": None,
+    "has_audio": True,
+    "has_single_image": False,
+    "has_video": True,
+    "height": None,
+    "id": None,
+    "interlaced_frame": False,
+    "media_type": "video",
+    "path": None,
+    "pixel_format": 1,
+    "pixel_ratio": {"den": 1, "num": 1},
+    "sample_rate": 44100,
+    "top_field_first": True,
+    "type": "FFmpegReader",
+    "vcodec": "",
+    "video_bit_rate": 0,
+    "video_length": None,
+    "video_stream_index": -1,
+    "video_timebase": None,
+    "width": None
+}
+
+# ffmpeg channel layout masks
+CHANNEL_LAYOUTS = {1: 4, 2: 3}
+
+
+def _probed_duration(clip):
+    return clip.media.duration if clip.media is not None and clip.media.duration else None
+
+
+def _file_entry(ir, clip, duration) -> dict:
+    """The `files` entry of a media file, from its probed info where known (an audio-only TTS clip isn't a video)."""
+    media = clip.media
+    fps_num, fps_den = ir.fps_num, ir.fps_den
+    if media is not None and media.fps_num:
+        fps_num, fps_den = media.fps_num, media.fps_den
+    entry = dict(
+        FILE_TEMPLATE,
+        duration=duration,
+        fps={"den": fps_den, "num": fps_num},
+        height=ir.height,
+        id=str(uuid.uuid4()),
+        path=clip.filepath,
+        video_length=str(int(round(duration * fps_num / fps_den))),
+        video_timebase={"den": fps_num, "num": fps_den},
+        width=ir.width,
+    )
+    if media is not None:
+        entry.update(has_audio=media.has_audio, has_video=media.has_video, media_type="video" if media.has_video else "audio")
+        if media.has_video and media.width:
+            entry.update(width=media.width, height=media.height)
+        if media.has_audio:
+            entry.update(sample_rate=media.sample_rate or 44100, channels=media.channels or 2,
+                         channel_layout=CHANNEL_LAYOUTS.get(media.channels, 3))
+    return entry
+
+
+def write_json(data, output_path, compact=False):
+    """Writes JSON with orjson when it is installed (several times faster), else with the json module; `compact` leaves out the whitespace."""
+    if orjson is not None:
+        with open(output_path, 'wb') as f:
+            f.write(orjson.dumps(data, option=0 if compact else orjson.OPT_INDENT_2))
+    else:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(data, separators=(',', ':')) if compact else json.dumps(data, indent=2))
+
+
+def render_openshot_project(ir, output_path, compact=False):
+    """
+    Writes the compiled project (`ProjectIR`) as an OpenShot project, one layer per track, clips at their start times.
+
+    Each media file gets one `files` entry, shared by all its clips (a clip's `reader` is that same entry), and the constant
+    keyframes come from `CLIP_TEMPLATE`, so only the per-clip values are built for each clip.
+    """
+    fps = {"den": ir.fps_den, "num": ir.fps_num}
+    # OpenShot draws higher layers on top: the first track (video) gets the highest number
+    layer_numbers = {track.name: (len(ir.tracks) - n) * 1000000 for n, track in enumerate(ir.tracks)}
 
     project = {
         "clips": [],
@@ -17,13 +151,13 @@ def generate_openshot_project(self, output_path=None):
             "audio_codec": "libmp3lame",
             "audio_sample_rate": 44100,
             "channels": 2,
-            "fps": {"den": 1, "num": 30},
-            "height": 720,
+            "fps": fps,
+            "height": ir.height,
             "pixel_format": 1,
             "sample_format": 1,
             "video_bit_rate": 8000000,
             "video_codec": "libx264",
-            "width": 1280
+            "width": ir.width
         },
         "files": [],
         "folder": "",
@@ -31,16 +165,17 @@ def generate_openshot_project(self, output_path=None):
         "layers": [
             {
                 "id": str(uuid.uuid4()),
-                "label": "Track 1",
-                "number": 1000000,
+                "label": track.name,
+                "number": layer_numbers[track.name],
                 "y": 0,
                 "lock": False
             }
+            for track in ir.tracks
         ],
         "markers": [],
         "progress": [],
         "project": {
-            "name": self.project_name,
+            "name": ir.name,
             "version": "2.6.1"
         },
         "scale": 15.0,
@@ -52,83 +187,40 @@ def generate_openshot_project(self, output_path=None):
         }
     }
 
-    current_time = 0.0
+    # one files entry per path, as long as the probed media or else the longest clip using it
+    probed, longest = {}, {}
+    for clip in ir.clips:
+        probed[clip.filepath] = probed.get(clip.filepath) or _probed_duration(clip)
+        longest[clip.filepath] = max(longest.get(clip.filepath, 0.0), clip.duration or 0.0)
 
-    for i, clip in enumerate(self.clips):
-        file_id = str(uuid.uuid4())
-        clip_id = str(uuid.uuid4())
+    files = {}
+    for clip in ir.clips:
+        file_entry = files.get(clip.filepath)
+        if file_entry is None:
+            duration = probed[clip.filepath] or longest[clip.filepath]
+            file_entry = files[clip.filepath] = _file_entry(ir, clip, duration)
+            project["files"].append(file_entry)
 
-        file_entry = {
-            "acodec": "",
-            "audio_bit_rate": 0,
-            "audio_stream_index": -1,
-            "audio_timebase": {"den": 1, "num": 1},
-            "channel_layout": 3,
-            "channels": 2,
-            "display_ratio": {"den": 9, "num": 16},
-            "duration": clip.duration or 10.0,
-            "file_size": "0",
-            "fps": {"den": 1, "num": 30},
-            "has_audio": True,
-            "has_single_image": False,
-            "has_video": True,
-            "height": 720,
-            "id": file_id,
-            "interlaced_frame": False,
-            "media_type": "video",
-            "path": clip.filepath,
-            "pixel_format": 1,
-            "pixel_ratio": {"den": 1, "num": 1},
-            "sample_rate": 44100,
-            "top_field_first": True,
-            "type": "FFmpegReader",
-            "vcodec": "",
-            "video_bit_rate": 0,
-            "video_length": "300",
-            "video_stream_index": -1,
-            "video_timebase": {"den": 30, "num": 1},
-            "width": 1280
-        }
-        project["files"].append(file_entry)
-
-        clip_entry = {
-            "alpha": {"Points": [{"co": {"X": 1.0, "Y": 1.0}, "interpolation": 0}]},
-            "anchor": 0,
-            "channel_filter": {"Points": [{"co": {"X": 1.0, "Y": -1.0}, "interpolation": 0}]},
-            "channel_mapping": {"Points": [{"co": {"X": 1.0, "Y": -1.0}, "interpolation": 0}]},
-            "display": 0,
-            "duration": clip.duration or 10.0,
-            "effects": [],
-            "end": clip.duration or 10.0,
-            "file_id": file_id,
-            "gravity": 4,
-            "has_audio": {"Points": [{"co": {"X": 1.0, "Y": -1.0}, "interpolation": 0}]},
-            "has_video": {"Points": [{"co": {"X": 1.0, "Y": -1.0}, "interpolation": 0}]},
-            "id": clip_id,
-            "layer": 1000000,
-            "location_x": {"Points": [{"co": {"X": 1.0, "Y": 0.0}, "interpolation": 0}]},
-            "location_y": {"Points": [{"co": {"X": 1.0, "Y": 0.0}, "interpolation": 0}]},
-            "mixing": 0,
-            "position": current_time,
-            "reader": file_entry,
-            "rotation": {"Points": [{"co": {"X": 1.0, "Y": 0.0}, "interpolation": 0}]},
-            "scale": 1,
-            "scale_x": {"Points": [{"co": {"X": 1.0, "Y": 1.0}, "interpolation": 0}]},
-            "scale_y": {"Points": [{"co": {"X": 1.0, "Y": 1.0}, "interpolation": 0}]},
-            "shear_x": {"Points": [{"co": {"X": 1.0, "Y": 0.0}, "interpolation": 0}]},
-            "shear_y": {"Points": [{"co": {"X": 1.0, "Y": 0.0}, "interpolation": 0}]},
-            "start": 0.0,
-            "time": {"Points": [{"co": {"X": 1.0, "Y": 1.0}, "interpolation": 0}]},
-            "title": clip.title,
-            "volume": {"Points": [{"co": {"X": 1.0, "Y": 1.0}, "interpolation": 0}]},
-            "wave_color": {"alpha": 255, "blue": 0, "green": 123, "red": 255},
-            "waveform": False
-        }
-        project["clips"].append(clip_entry)
+        # a clip can't play past the end of its file, where that is known from probing
+        end = min(clip.duration, probed[clip.filepath]) if probed[clip.filepath] else clip.duration
+        project["clips"].append(dict(
+            CLIP_TEMPLATE,
+            duration=end,
+            end=end,
+            file_id=file_entry["id"],
+            id=str(uuid.uuid4()),
+            layer=layer_numbers.get(clip.track, 1000000),
+            position=clip.start,
+            reader=file_entry,
+            title=clip.title,
+        ))
 
-        current_time += clip.duration or 10.0
+    write_json(project, output_path, compact)
+    return str(output_path)
 
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(project, f, indent=2)
 
-    return str(output_path)
+def generate_openshot_project(self, output_path=None, ir=None):
+    """Generate OpenShot project file (.osp)"""
+    if output_path is None:
+        output_path = self.output_dir / f"{self.project_name}_openshot.osp"
+    return render_openshot_project(ir or self.compile(), output_path, self.compact)
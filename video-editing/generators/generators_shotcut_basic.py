@@ -1,72 +1,35 @@
 
-import xml.etree.ElementTree as ET
-import xml.dom.minidom
 from pathlib import Path
-def generate_shotcut_project(self, output_path=None):
-    """Generate Shotcut project file (.mlt) - basic playlist version"""
-    if output_path is None:
-        output_path = self.output_dir / f"{self.project_name}_shotcut.mlt"
+from .mlt_writer import MltWriter
+from .project_ir import mlt_profile
 
-    mlt = ET.Element('mlt')
-    mlt.set('LC_NUMERIC', 'C')
-    mlt.set('version', '7.0.1')
-    mlt.set('title', self.project_name)
-    mlt.set('producer', 'main_bin')
 
-    profile = ET.SubElement(mlt, 'profile')
-    profile.set('description', 'HD 720p 30 fps')
-    profile.set('width', '1280')
-    profile.set('height', '720')
-    profile.set('progressive', '1')
-    profile.set('sample_aspect_num', '1')
-    profile.set('sample_aspect_den', '1')
-    profile.set('display_aspect_num', '16')
-    profile.set('display_aspect_den', '9')
-    profile.set('frame_rate_num', '30')
-    profile.set('frame_rate_den', '1')
-    profile.set('colorspace', '709')
+def render_shotcut_project(ir, output_path, compact=False):
+    """Writes the compiled project (`ProjectIR`) as a Shotcut playlist: all the clips one after another."""
+    with MltWriter(output_path, {'LC_NUMERIC': 'C', 'version': '7.0.1', 'title': ir.name, 'producer': 'main_bin'}, indent=None if compact else '  ') as mlt:
+        mlt.element('profile', mlt_profile(ir))
 
-    main_bin = ET.SubElement(mlt, 'producer')
-    main_bin.set('id', 'main_bin')
-    main_bin.set('in', '0')
-    main_bin.set('out', '-1')
-    property_elem = ET.SubElement(main_bin, 'property')
-    property_elem.set('name', 'xml')
-    property_elem.text = 'was here'
+        with mlt.start('producer', {'id': 'main_bin', 'in': '0', 'out': '-1'}):
+            mlt.property('xml', 'was here')
 
-    for i, clip in enumerate(self.clips):
-        producer = ET.SubElement(mlt, 'producer')
-        producer.set('id', f'producer{i}')
-        producer.set('in', '0')
-        producer.set('out', str(int((clip.duration or 10.0) * 30 - 1)))
-        resource_prop = ET.SubElement(producer, 'property')
-        resource_prop.set('name', 'resource')
-        resource_prop.text = clip.filepath
-        if clip.transcription:
-            meta_prop = ET.SubElement(producer, 'property')
-            meta_prop.set('name', 'meta.attr.comment.markup')
-            meta_prop.text = clip.transcription
+        for clip in ir.clips:
+            with mlt.start('producer', {'id': clip.producer_id, 'in': '0', 'out': str(clip.out_frame)}):
+                mlt.property('resource', clip.filepath)
+                if clip.transcription:
+                    mlt.property('meta.attr.comment.markup', clip.transcription)
 
-    playlist = ET.SubElement(mlt, 'playlist')
-    playlist.set('id', 'playlist0')
-    current_frame = 0
-    for i, clip in enumerate(self.clips):
-        entry = ET.SubElement(playlist, 'entry')
-        entry.set('producer', f'producer{i}')
-        entry.set('in', '0')
-        duration_frames = int((clip.duration or 10.0) * 30)
-        entry.set('out', str(duration_frames - 1))
-        current_frame += duration_frames
+        with mlt.start('playlist', {'id': 'playlist0'}):
+            for clip in ir.clips:
+                mlt.element('entry', {'producer': clip.producer_id, 'in': '0', 'out': str(clip.out_frame)})
 
-    tractor = ET.SubElement(mlt, 'tractor')
-    tractor.set('id', 'tractor0')
-    tractor.set('in', '0')
-    tractor.set('out', str(current_frame - 1))
-    track = ET.SubElement(tractor, 'track')
-    track.set('producer', 'playlist0')
+        with mlt.start('tractor', {'id': 'tractor0', 'in': '0', 'out': str(ir.sequence_frames - 1)}):
+            mlt.element('track', {'producer': 'playlist0'})
 
-    rough_string = ET.tostring(mlt, 'unicode')
-    reparsed = xml.dom.minidom.parseString(rough_string)
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(reparsed.toprettyxml(indent="  "))
     return str(output_path)
+
+
+def generate_shotcut_project(self, output_path=None, ir=None):
+    """Generate Shotcut project file (.mlt) - basic playlist version"""
+    if output_path is None:
+        output_path = self.output_dir / f"{self.project_name}_shotcut.mlt"
+    return render_shotcut_project(ir or self.compile(), output_path, self.compact)
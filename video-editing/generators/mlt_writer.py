@@ -0,0 +1,78 @@
+from contextlib import contextmanager
+from xml.sax.saxutils import XMLGenerator
+
+
+class MltWriter:
+    """
+    Writes an MLT XML document straight to a file while it is being generated.
+
+    Elements are emitted as the generator iterates its clips, so no element tree is kept in memory and a project with
+    thousands of clips is written in one pass with bounded memory. The output is indented like the pretty-printed documents,
+    with `indent=None` it is written without any whitespace between the elements.
+
+    Example:
+        with MltWriter(output_path, {'LC_NUMERIC': 'C', 'version': '7.0.1'}) as mlt:
+            mlt.element('profile', mlt_profile(ir))
+            with mlt.start('producer', {'id': 'producer0', 'in': '0', 'out': '299'}):
+                mlt.property('resource', clip.filepath)
+    """
+
+    def __init__(self, path, attrs=None, indent="  "):
+        self._file = open(path, 'w', encoding='utf-8')
+        self._xml = XMLGenerator(self._file, encoding='utf-8', short_empty_elements=True)
+        self._indent = indent
+        self._depth = 0
+        self._xml.startDocument()
+        self._open('mlt', attrs or {})
+
+    def _newline(self):
+        if self._indent is None:
+            return
+        self._xml.ignorableWhitespace("\n" + self._indent * self._depth)
+
+    def _open(self, name, attrs):
+        if self._depth:
+            self._newline()
+        self._xml.startElement(name, {k: str(v) for k, v in attrs.items()})
+        self._depth += 1
+
+    def _close(self, name, inline=False):
+        self._depth -= 1
+        if not inline:
+            self._newline()
+        self._xml.endElement(name)
+
+    @contextmanager
+    def start(self, name, attrs=None):
+        """Opens an element, its children are written inside the `with` block."""
+        self._open(name, attrs or {})
+        try:
+            yield self
+        finally:
+            self._close(name)
+
+    def element(self, name, attrs=None, text=None):
+        """Writes a complete element without children, with optional text."""
+        self._open(name, attrs or {})
+        if text is not None:
+            self._xml.characters(str(text))
+        self._close(name, inline=True)
+
+    def property(self, name, value):
+        self.element('property', {'name': name}, value)
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._close('mlt')
+        if self._indent is not None:
+            self._xml.ignorableWhitespace("\n")
+        self._xml.endDocument()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,220 @@
+import os
+import json
+import struct
+import threading
+import subprocess
+from dataclasses import dataclass, asdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+PROBE_CACHE_FILE = os.path.join(os.path.expanduser("~"), ".cache", "video-project-generator", "probe_cache.json")
+
+
+@dataclass
+class MediaInfo:
+    """What the generators need to know about a media file"""
+    path: str
+    duration: float = 0.0
+    has_video: bool = False
+    width: int = 0
+    height: int = 0
+    fps: Optional[float] = None
+    fps_num: int = 0
+    fps_den: int = 1
+    has_audio: bool = False
+    sample_rate: int = 0
+    channels: int = 0
+    channel_layout: str = ""
+    samples: int = 0  # audio frames, exact for WAV files
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _layout(channels: int) -> str:
+    return {1: "mono", 2: "stereo"}.get(channels, f"{channels}ch" if channels else "")
+
+
+def probe_wav(path: str) -> Optional[MediaInfo]:
+    """
+    Reads the header of a RIFF WAV file directly, without ffprobe. Returns None if the file isn't a WAV it can read.
+    Handles PCM, float and WAVE_FORMAT_EXTENSIBLE files, which the `wave` module doesn't all accept.
+    """
+    try:
+        with open(path, "rb") as f:
+            riff, _, wave_id = struct.unpack("<4sI4s", f.read(12))
+            if riff != b"RIFF" or wave_id != b"WAVE":
+                return None
+            channels = sample_rate = block_align = 0
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    return None
+                chunk_id, size = struct.unpack("<4sI", header)
+                if chunk_id == b"fmt ":
+                    fmt = f.read(size + (size & 1))
+                    _, channels, sample_rate, _, block_align = struct.unpack("<HHIIH", fmt[:14])
+                elif chunk_id == b"data":
+                    if not (channels and sample_rate and block_align):
+                        return None
+                    samples = size // block_align
+                    return MediaInfo(path, duration=samples / sample_rate, has_audio=True, sample_rate=sample_rate,
+                                     channels=channels, channel_layout=_layout(channels), samples=samples)
+                else:
+                    f.seek(size + (size & 1), os.SEEK_CUR)
+    except (OSError, struct.error):
+        return None
+
+
+def audio_info(path: str, samples: int, sample_rate: int, channels: int = 1) -> MediaInfo:
+    """MediaInfo of an audio file whose length is already known (e.g. a clip just generated by TTS), without reading it."""
+    return MediaInfo(path, duration=samples / sample_rate, has_audio=True, sample_rate=sample_rate,
+                     channels=channels, channel_layout=_layout(channels), samples=samples)
+
+
+def _rate(value: str) -> tuple:
+    num, _, den = (value or "0/1").partition("/")
+    try:
+        return int(num), int(den or 1)
+    except ValueError:
+        return 0, 1
+
+
+def probe_ffprobe(path: str) -> Optional[MediaInfo]:
+    """Probes any media file with ffprobe (format and streams). Returns None if ffprobe is missing or can't read the file."""
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries",
+             "format=duration:stream=codec_type,width,height,avg_frame_rate,r_frame_rate,sample_rate,channels,channel_layout",
+             "-of", "json", path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        data = json.loads(result.stdout or "{}")
+    except (OSError, ValueError):
+        return None
+    if result.returncode != 0 or "format" not in data:
+        return None
+
+    info = MediaInfo(path, duration=float(data.get("format", {}).get("duration") or 0.0))
+    for stream in data.get("streams", []):
+        if stream.get("codec_type") == "video" and not info.has_video:
+            info.has_video = True
+            info.width, info.height = int(stream.get("width") or 0), int(stream.get("height") or 0)
+            num, den = _rate(stream.get("avg_frame_rate"))
+            if not num:
+                num, den = _rate(stream.get("r_frame_rate"))
+            if num and den:
+                info.fps_num, info.fps_den, info.fps = num, den, num / den
+        elif stream.get("codec_type") == "audio" and not info.has_audio:
+            info.has_audio = True
+            info.sample_rate = int(stream.get("sample_rate") or 0)
+            info.channels = int(stream.get("channels") or 0)
+            info.channel_layout = stream.get("channel_layout") or _layout(info.channels)
+            info.samples = int(round(info.duration * info.sample_rate))
+    return info
+
+
+def probe_file(path: str) -> Optional[MediaInfo]:
+    """WAV files are read natively, everything else goes through ffprobe. None if the file couldn't be probed."""
+    if path.lower().endswith(".wav"):
+        info = probe_wav(path)
+        if info is not None:
+            return info
+    return probe_ffprobe(path)
+
+
+class ProbeCache:
+    """
+    Probe results kept in a JSON file, keyed by path + mtime + size, so a file is probed again only when it changes.
+    Thread safe; `save()` writes the file atomically.
+    """
+
+    def __init__(self, path: Optional[str] = PROBE_CACHE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = {}
+        self._dirty = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+
+    @staticmethod
+    def key(path: str) -> Optional[str]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return f"{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}"
+
+    def get(self, key: str) -> Optional[MediaInfo]:
+        with self._lock:
+            entry = self._entries.get(key)
+        return MediaInfo(**entry) if entry else None
+
+    def put(self, key: str, info: MediaInfo):
+        with self._lock:
+            self._entries[key] = info.to_dict()
+            self._dirty = True
+
+    def save(self):
+        if not self.path or not self._dirty:
+            return
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+
+_default_cache = None
+
+
+def default_cache() -> ProbeCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ProbeCache()
+    return _default_cache
+
+
+def probe_files(paths: List[str], cache: Optional[ProbeCache] = None, workers: int = 8) -> Dict[str, MediaInfo]:
+    """
+    Probes many files at once: cached results are reused, the rest is probed in a pool of `workers` threads
+    (ffprobe runs as a subprocess, so the threads don't wait for each other) and added to the cache.
+    Missing files and files that couldn't be probed get an empty MediaInfo (duration 0, no streams); failed probes aren't
+    cached, so they are tried again next time (e.g. once ffprobe is installed).
+
+    Example:
+        infos = probe_files([clip.filepath for clip in generator.clips])
+        infos["/media/clip.mp4"].duration, infos["/media/clip.mp4"].fps
+    """
+    cache = cache or default_cache()
+    results, missing = {}, {}
+    for path in dict.fromkeys(paths):
+        key = cache.key(path)
+        info = cache.get(key) if key else MediaInfo(path)
+        if info is not None:
+            results[path] = info
+        else:
+            missing[path] = key
+
+    if missing:
+        failed = 0
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for path, info in zip(missing, pool.map(probe_file, missing)):
+                if info is None:
+                    failed += 1
+                    info = MediaInfo(path)
+                else:
+                    cache.put(missing[path], info)
+                results[path] = info
+        cache.save()
+        print(f"[Probe] {len(missing)} of {len(results)} files probed, the others were cached or don't exist")
+        if failed:
+            print(f"[Probe] {failed} files couldn't be probed (is ffprobe installed?)")
+    return results
@@ -0,0 +1,192 @@
+from dataclasses import dataclass, field
+from math import gcd
+from typing import List, Optional
+
+from .probe import MediaInfo
+from .timeline import SUBTITLES
+
+DEFAULT_DURATION = 10.0  # seconds, for clips of unknown length
+DEFAULT_FPS = (30, 1)
+DEFAULT_SIZE = (1280, 720)
+
+
+def format_time(frames: int, fps_num: int, fps_den: int = 1) -> str:
+    """Frames as an MLT clock value "HH:MM:SS.mmm"."""
+    s, ms = divmod(frames * fps_den * 1000 // fps_num, 1000)
+    m, s = divmod(s, 60)
+    h, m = divmod(m, 60)
+    return f"{h:02d}:{m:02d}:{s:02d}.{ms:03d}"
+
+
+@dataclass
+class IRClip:
+    """A clip with everything the generators write precomputed: frames, ids and formatted times"""
+    index: int                  # order in which the clip was added
+    producer_id: str
+    filepath: str
+    title: str
+    transcription: str
+    track: str
+    kind: str
+    start_frame: int
+    length: int                 # frames
+    start: float                # seconds, frame-aligned
+    duration: float             # seconds, frame-aligned
+    start_time: str
+    length_time: str
+    out_time: str               # time of the last frame (MLT "out" is inclusive)
+    media: Optional[MediaInfo] = None
+
+    @property
+    def out_frame(self) -> int:
+        return self.length - 1
+
+    @property
+    def end_frame(self) -> int:
+        return self.start_frame + self.length
+
+
+@dataclass
+class IREntry:
+    """One entry of a track's playlist: a clip, or a blank of `blank` frames before the next clip"""
+    clip: Optional[IRClip] = None
+    blank: int = 0
+    blank_time: str = ""
+
+
+@dataclass
+class IRTrack:
+    name: str
+    kind: str
+    entries: List[IREntry] = field(default_factory=list)
+
+    @property
+    def clips(self) -> List[IRClip]:
+        return [entry.clip for entry in self.entries if entry.clip is not None]
+
+
+@dataclass
+class ProjectIR:
+    """
+    Frame-accurate intermediate representation of a project, compiled once and rendered by all the generators.
+
+    Times are converted to frames of the project frame rate once, so all the editors get the same cuts, and every value
+    the generators write (producer ids, in/out frames, clock strings, blanks between clips) is precomputed.
+    """
+    name: str
+    fps_num: int
+    fps_den: int
+    width: int
+    height: int
+    clips: List[IRClip]         # in the order they were added
+    tracks: List[IRTrack]       # video and audio tracks with their playlists (subtitles aren't rendered)
+    total_frames: int           # length of the timeline
+    sequence_frames: int        # length of all the clips played one after another
+
+    @property
+    def fps(self) -> float:
+        return self.fps_num / self.fps_den
+
+    def time(self, frames: int) -> str:
+        return format_time(frames, self.fps_num, self.fps_den)
+
+
+def _project_format(clips) -> tuple:
+    """Frame rate and resolution of the first probed video clip, 30 fps 1280x720 if there is none."""
+    for clip in clips:
+        media = clip.media
+        if media is not None and media.has_video and media.fps_num and media.width:
+            return (media.fps_num, media.fps_den), (media.width, media.height)
+    return DEFAULT_FPS, DEFAULT_SIZE
+
+
+def compile_project(generator, fps: Optional[tuple] = None, size: Optional[tuple] = None) -> ProjectIR:
+    """
+    Compiles the clips and timeline of a `VideoProjectGenerator` into a `ProjectIR`.
+
+    Args:
+        fps (tuple | None): (numerator, denominator) of the project frame rate, by default the probed one of the first video clip.
+        size (tuple | None): (width, height) of the project, by default the probed one of the first video clip.
+    """
+    default_fps, default_size = _project_format(generator.clips)
+    fps_num, fps_den = fps or default_fps
+    width, height = size or default_size
+
+    def to_frames(seconds):
+        return int(round(seconds * fps_num / fps_den))
+
+    placed = {}
+    tracks = []
+    for track in generator.timeline.ordered_tracks():
+        if track.kind == SUBTITLES:
+            continue
+        for item in track:
+            placed[id(item.clip)] = (track, to_frames(item.start), to_frames(item.end))
+        tracks.append(track)
+
+    clips = []
+    for index, clip in enumerate(generator.clips):
+        end_time = clip.start_time + (clip.duration or DEFAULT_DURATION)
+        track, start_frame, end_frame = placed.get(id(clip), (None, to_frames(clip.start_time), to_frames(end_time)))
+        # both ends are rounded to frames, not the start and the length, so a clip never overlaps the one after it
+        length = max(end_frame - start_frame, 1)
+        clips.append(IRClip(
+            index=index,
+            producer_id=f"clip{index}",
+            filepath=clip.filepath,
+            title=clip.title,
+            transcription=clip.transcription,
+            track=track.name if track else "",
+            kind=track.kind if track else "",
+            start_frame=start_frame,
+            length=length,
+            start=start_frame * fps_den / fps_num,
+            duration=length * fps_den / fps_num,
+            start_time=format_time(start_frame, fps_num, fps_den),
+            length_time=format_time(length, fps_num, fps_den),
+            out_time=format_time(length - 1, fps_num, fps_den),
+            media=clip.media,
+        ))
+
+    by_clip = {id(clip): ir_clip for clip, ir_clip in zip(generator.clips, clips)}
+    ir_tracks = []
+    for track in tracks:
+        ir_track, cursor = IRTrack(track.name, track.kind), 0
+        for item in track:
+            ir_clip = by_clip[id(item.clip)]
+            if ir_clip.start_frame > cursor:
+                blank = ir_clip.start_frame - cursor
+                ir_track.entries.append(IREntry(blank=blank, blank_time=format_time(blank, fps_num, fps_den)))
+            ir_track.entries.append(IREntry(clip=ir_clip))
+            cursor = max(cursor, ir_clip.start_frame) + ir_clip.length
+        ir_tracks.append(ir_track)
+
+    return ProjectIR(
+        name=generator.project_name,
+        fps_num=fps_num,
+        fps_den=fps_den,
+        width=width,
+        height=height,
+        clips=clips,
+        tracks=ir_tracks,
+        total_frames=max((clip.end_frame for clip in clips), default=0),
+        sequence_frames=sum(clip.length for clip in clips),
+    )
+
+
+def mlt_profile(ir: ProjectIR) -> dict:
+    """MLT <profile> attributes of the project format."""
+    divisor = gcd(ir.width, ir.height) or 1
+    return {
+        'description': f'{ir.width}x{ir.height} {ir.fps:.4g} fps',
+        'width': str(ir.width),
+        'height': str(ir.height),
+        'progressive': '1',
+        'sample_aspect_num': '1',
+        'sample_aspect_den': '1',
+        'display_aspect_num': str(ir.width // divisor),
+        'display_aspect_den': str(ir.height // divisor),
+        'frame_rate_num': str(ir.fps_num),
+        'frame_rate_den': str(ir.fps_den),
+        'colorspace': '709',
+    }
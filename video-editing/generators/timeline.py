@@ -0,0 +1,184 @@
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Kinds of tracks, in the order they are stacked in the editors
+VIDEO = "video"
+DUBBED_AUDIO = "dubbed_audio"
+ORIGINAL_AUDIO = "original_audio"
+SUBTITLES = "subtitles"
+TRACK_KINDS = (VIDEO, DUBBED_AUDIO, ORIGINAL_AUDIO, SUBTITLES)
+TRACK_LABELS = {VIDEO: "V", DUBBED_AUDIO: "Dub", ORIGINAL_AUDIO: "A", SUBTITLES: "Sub"}
+
+
+@dataclass
+class TimelineItem:
+    """A clip (or a subtitle text) placed on a track, times in seconds"""
+    start: float
+    end: float
+    clip: Optional[object] = None  # VideoClip
+    text: str = ""
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+class IntervalTree:
+    """
+    Items of one track indexed by time.
+
+    Items are kept sorted by start (insertion with `bisect`), and an implicit binary tree over that order stores the
+    latest end of each subtree. An overlap query only descends into the subtrees starting before the end of the range
+    and ending after its start, so it costs O(log n + k) for k results. The tree is built with room to spare: items appended
+    in time order update it in O(log n), an insertion in the middle marks it for an O(n) rebuild at the next query.
+    """
+
+    def __init__(self):
+        self._keys: List[Tuple[float, float, int]] = []
+        self._items: List[TimelineItem] = []
+        self._max_end: List[float] = []
+        self._size = 0
+        self._dirty = False
+        self._counter = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[TimelineItem]:
+        return iter(self._items)
+
+    def add(self, item: TimelineItem):
+        key = (item.start, item.end, self._counter)
+        self._counter += 1
+        i = bisect_right(self._keys, key)
+        self._keys.insert(i, key)
+        self._items.insert(i, item)
+        if not self._dirty and i == len(self._items) - 1 and i < self._size:
+            # appended in time order (the usual case when loading a timeline): update the path to the root only
+            node = self._size + i
+            self._max_end[node] = item.end
+            while node > 1 and self._max_end[node // 2] < item.end:
+                node //= 2
+                self._max_end[node] = item.end
+        else:
+            self._dirty = True
+
+    def _build(self):
+        n = len(self._items)
+        size = 1
+        while size < 2 * n:
+            size *= 2
+        tree = [float("-inf")] * (2 * size)
+        tree[size:size + n] = [item.end for item in self._items]
+        for node in range(size - 1, 0, -1):
+            tree[node] = max(tree[2 * node], tree[2 * node + 1])
+        self._max_end, self._size, self._dirty = tree, size, False
+
+    @property
+    def end(self) -> float:
+        """Latest end of all the items (0.0 for an empty track)."""
+        if self._dirty:
+            self._build()
+        return max(self._max_end[1], 0.0) if self._items else 0.0
+
+    def overlapping(self, start: float, end: float) -> List[TimelineItem]:
+        """Items overlapping [start, end) (touching ends don't overlap), in time order."""
+        if not self._items:
+            return []
+        if self._dirty:
+            self._build()
+        limit = bisect_left(self._keys, (end, float("-inf"), -1))  # only items starting before `end`
+        found, stack = [], [(1, 0, self._size)]
+        while stack:
+            node, lo, hi = stack.pop()
+            if lo >= limit or self._max_end[node] <= start:
+                continue
+            if hi - lo == 1:
+                found.append(lo)
+                continue
+            mid = (lo + hi) // 2
+            stack.append((2 * node + 1, mid, hi))
+            stack.append((2 * node, lo, mid))
+        return [self._items[i] for i in found]
+
+    def overlaps(self, start: float, end: float) -> bool:
+        return bool(self.overlapping(start, end))
+
+    def gaps(self, start: float = 0.0, end: Optional[float] = None, min_length: float = 0.0) -> List[Tuple[float, float]]:
+        """Empty (start, end) ranges of the track between `start` and `end` (the end of the track by default), in one pass."""
+        end = self.end if end is None else end
+        gaps, covered = [], start
+        for item in self._items:
+            if item.start >= end:
+                break
+            if item.start > covered and item.start - covered >= min_length:
+                gaps.append((covered, item.start))
+            covered = max(covered, item.end)
+        if end > covered and end - covered >= min_length:
+            gaps.append((covered, end))
+        return gaps
+
+
+class Track:
+    def __init__(self, name: str, kind: str):
+        self.name = name
+        self.kind = kind
+        self.items = IntervalTree()
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self) -> Iterator[TimelineItem]:
+        return iter(self.items)
+
+
+class Timeline:
+    """
+    Tracks of a project (video, dubbed audio, original audio, subtitles), each with its items in an `IntervalTree`.
+
+    `add()` puts an item on the first track of its kind where it doesn't overlap anything and opens a new track of that
+    kind when all of them are busy, so overlapping TTS clips end up on parallel audio tracks instead of being shifted.
+
+    Example:
+        timeline = Timeline()
+        timeline.add(TimelineItem(0.0, 3600.0, clip=movie), VIDEO)
+        for clip in tts_clips:
+            timeline.add(TimelineItem(clip.start_time, clip.start_time + clip.duration, clip=clip), DUBBED_AUDIO)
+        timeline.track("Dub1").items.gaps()  # where nothing is dubbed
+    """
+
+    def __init__(self):
+        self.tracks: Dict[str, Track] = {}
+
+    def track(self, name: str) -> Track:
+        return self.tracks[name]
+
+    def tracks_of(self, kind: str) -> List[Track]:
+        return [track for track in self.tracks.values() if track.kind == kind]
+
+    def ordered_tracks(self) -> List[Track]:
+        """Tracks grouped by kind in `TRACK_KINDS` order."""
+        return [track for kind in TRACK_KINDS for track in self.tracks_of(kind)]
+
+    def add_track(self, kind: str) -> Track:
+        name = f"{TRACK_LABELS.get(kind, kind)}{len(self.tracks_of(kind)) + 1}"
+        self.tracks[name] = Track(name, kind)
+        return self.tracks[name]
+
+    def add(self, item: TimelineItem, kind: str = VIDEO) -> Track:
+        """Places the item on the first free track of `kind` (a new one if needed) and returns that track."""
+        for track in self.tracks_of(kind):
+            if not track.items.overlaps(item.start, item.end):
+                break
+        else:
+            track = self.add_track(kind)
+        track.items.add(item)
+        return track
+
+    @property
+    def duration(self) -> float:
+        return max((track.items.end for track in self.tracks.values()), default=0.0)
+
+    def __len__(self):
+        return sum(len(track) for track in self.tracks.values())
@@ -14,7 +14,7 @@ from generators.generator import VideoProjectGenerator
 def main():
     parser = argparse.ArgumentParser(description='Generate video editor project files')
     parser.add_argument('input_dir', help='Directory containing video files')
-    parser.add_argument('--method', choices=['openshot', 'shotcut_timeline', 'shotcut_playlist', 'kdenlive'], 
+    parser.add_argument('--method', choices=['openshot', 'shotcut_timeline', 'shotcut_playlist', 'kdenlive', 'all'], 
                        default='all', help='Target video editor')
     parser.add_argument('--project-name', default='Generated Project', 
                        help='Name of the project')
@@ -24,12 +24,14 @@ def main():
                        default=['.mp4', '.avi', '.mov', '.mkv', '.webm', '.m4v'],
                        help='Video file extensions to include')
     parser.add_argument('--config', required=False, default=None, help='Project config file')
+    parser.add_argument('--compact', action='store_true', help='Write project files without indentation (smaller, faster)')
 
     args = parser.parse_args()
     
     generator = VideoProjectGenerator()
     generator.project_name = args.project_name
     generator.output_dir = Path(args.output_dir)
+    generator.compact = args.compact
     
     # Load clips
     if args.config: